@@ -0,0 +1,165 @@
+"""
+Асинхронный доступ к RuTracker для asyncio-режима (async_main.py).
+
+AsyncRutrackerClient — надстройка над общим RutrackerClient из реестра clients: использует его
+cookie, предохранитель, ограничитель частоты, кеши страниц и торрентов и разбор страниц,
+а вход выполняет через него в отдельном потоке. Асинхронно выполняются только сами
+HTTP-запросы, поэтому сотни загрузок страниц ждут ответа в одном цикле событий, а не в потоках.
+"""
+import asyncio
+import logging
+from config import RUTRACKER_URL, RUTRACKER_STREAM_PAGES, RUTRACKER_STREAM_CHUNK_SIZE, ASYNC_CHECK_CONCURRENCY
+from circuit_breaker import CircuitOpenError
+from http_transport import create_async_session
+from rutracker_client import (
+    PageHeadReader, SessionExpired, conditional_headers, not_modified_page_info, parse_page_info,
+    is_login_redirect, is_network_error, is_server_error, get_proxy_dict
+)
+from metrics import timed, RUTRACKER_REQUEST_SECONDS, RUTRACKER_ERRORS
+
+logger = logging.getLogger(__name__)
+
+class AsyncRutrackerClient:
+    """Асинхронные get_page_info и download_torrent поверх состояния синхронного клиента."""
+
+    def __init__(self, client, pool_size=ASYNC_CHECK_CONCURRENCY):
+        self.client = client
+        self.breaker = client.breaker
+        self.limiter = client.limiter
+        self.session = create_async_session(client.session.cookies, get_proxy_dict(), pool_size=pool_size)
+        # Одновременные запросы одного ключа объединяются, как в SingleFlightCache
+        self.flights = {}
+
+    async def close(self):
+        await self.session.aclose()
+
+    async def single_flight(self, cache, key, loader, force=False):
+        """Значение из кеша клиента или результат loader(), общий для одновременных запросов ключа."""
+        if not force:
+            value = cache.peek(key)
+            if value is not None:
+                return value
+        task = self.flights.get((id(cache), key))
+        if task is None:
+            task = asyncio.ensure_future(loader())
+            self.flights[(id(cache), key)] = task
+            task.add_done_callback(lambda _: self.flights.pop((id(cache), key), None))
+        value = await asyncio.shield(task)
+        if value is not None:
+            cache.put(key, value)
+        return value
+
+    async def get_page_info(self, url, fingerprint=None, force=False):
+        """То же, что RutrackerClient.get_page_info."""
+        topic_id = self.client.get_topic_id(url)
+        if not topic_id:
+            logger.error(f"Не удалось получить ID темы из URL: {url}")
+            return None
+        if not force:
+            cached = self.client.cached_page_info(topic_id, fingerprint)
+            if cached is not None:
+                return cached
+        page_info = await self.single_flight(
+            self.client.page_cache, self.client.page_cache_key(topic_id, fingerprint),
+            lambda: self.load_page_info(url, topic_id, fingerprint), force
+        )
+        if fingerprint and page_info and not page_info["unchanged"]:
+            self.client.page_cache.put(topic_id, page_info)
+        return page_info
+
+    async def request(self, method, url, **kwargs):
+        """HTTP-запрос через общий предохранитель RuTracker."""
+        return await self.breaker.call_async(
+            self.session.request, method, url,
+            is_failure=is_network_error, is_failed_result=is_server_error,
+            **kwargs
+        )
+
+    async def relogin(self, generation):
+        """Повторная авторизация общим клиентом (блокирующая, поэтому в отдельном потоке)."""
+        return await asyncio.to_thread(self.client.relogin, generation)
+
+    @timed(RUTRACKER_REQUEST_SECONDS, RUTRACKER_ERRORS)
+    async def load_page_info(self, url, topic_id, fingerprint=None):
+        """Загрузить страницу темы с повторной авторизацией при истекшей сессии (без кеша)."""
+        try:
+            for attempt in range(2):
+                generation = self.client.login_generation
+                if not self.client.is_logged_in and not await self.relogin(generation):
+                    return None
+                try:
+                    return await self.fetch_page_info(url, topic_id, fingerprint)
+                except SessionExpired:
+                    if attempt or not await self.relogin(generation):
+                        logger.error(f"На странице {url} не найден заголовок раздачи")
+                        return None
+        except CircuitOpenError as e:
+            logger.debug(f"Страница {url} не запрошена: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"Ошибка получения информации о странице {url}: {e}")
+            return None
+
+    async def fetch_page_info(self, url, topic_id, fingerprint=None):
+        """Загрузить и разобрать страницу темы; SessionExpired, если вместо темы получена страница входа."""
+        self.breaker.check()
+        await self.limiter.acquire_async()
+        response = await self.request(
+            "GET", url, headers=conditional_headers(fingerprint), timeout=20, stream=True
+        )
+        try:
+            if response.status_code == 304:
+                logger.debug(f"Страница {url} не изменилась (304)")
+                return not_modified_page_info(fingerprint, topic_id)
+            response.raise_for_status()
+            if is_login_redirect(response):
+                raise SessionExpired()
+            if RUTRACKER_STREAM_PAGES:
+                reader = PageHeadReader(response.charset_encoding)
+                async for chunk in response.aiter_bytes(RUTRACKER_STREAM_CHUNK_SIZE):
+                    if reader.feed(chunk):
+                        break
+                else:
+                    reader.finish()
+                html, head = reader.html, reader.parser
+            else:
+                await response.aread()
+                html, head = response.text, None
+        finally:
+            await response.aclose()
+        return parse_page_info(url, topic_id, html, head, response.headers, fingerprint)
+
+    async def download_torrent(self, topic_id, force=False):
+        """То же, что RutrackerClient.download_torrent."""
+        topic_id = str(topic_id)
+        return await self.single_flight(
+            self.client.torrent_cache, self.client.torrent_cache_key(topic_id),
+            lambda: self.load_torrent(topic_id), force
+        )
+
+    @timed(RUTRACKER_REQUEST_SECONDS, RUTRACKER_ERRORS)
+    async def load_torrent(self, topic_id):
+        """Скачать торрент-файл без кеша."""
+        try:
+            for attempt in range(2):
+                generation = self.client.login_generation
+                if not self.client.is_logged_in and not await self.relogin(generation):
+                    return None
+
+                self.breaker.check()
+                await self.limiter.acquire_async()
+                response = await self.request("GET", f"{RUTRACKER_URL}/forum/dl.php?t={topic_id}", timeout=30)
+                response.raise_for_status()
+                if "html" not in response.headers.get("content-type", "").lower():
+                    logger.info(f"Торрент успешно скачан: {topic_id}")
+                    return response.content
+                # Вместо торрент-файла пришла HTML-страница — обычно страница входа
+                if attempt or not await self.relogin(generation):
+                    logger.error("Получен HTML вместо торрент-файла")
+                    return None
+        except CircuitOpenError as e:
+            logger.debug(f"Торрент {topic_id} не запрошен: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"Ошибка скачивания торрента {topic_id}: {e}")
+            return None
@@ -0,0 +1,140 @@
+"""
+asyncio-режим: python async_main.py вместо python main.py.
+
+Используется тот же код, что и в main.py: база данных, планировщик и аренда сериалов,
+сохранение результатов и замена торрентов (checker.run_due_checks), общий реестр клиентов
+и обработчики bot.py. Отличаются две вещи:
+- страницы и торренты RuTracker загружаются в цикле событий (AsyncRutrackerClient),
+  до ASYNC_CHECK_CONCURRENCY одновременно, а не в пуле из CHECK_WORKERS потоков;
+- при BOT_MODE=polling обновления Telegram получает AsyncTeleBot, а обработчики bot.py
+  выполняются в пуле из ASYNC_HANDLER_WORKERS потоков (они работают с SQLite и qBittorrent).
+qBittorrent вызывается пакетно, один раз за цикл проверки, поэтому используется общий клиент.
+"""
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import main
+from async_clients import AsyncRutrackerClient
+from checker import has_update, finish_unchanged, finish_update
+from clients import start_health_monitor
+from config import BOT_MODE, TELEGRAM_TOKEN, ASYNC_CHECK_CONCURRENCY, ASYNC_HANDLER_WORKERS
+
+logger = logging.getLogger(__name__)
+
+async def check_series_async(client, series, fingerprint=None, topic_data=None, force=False):
+    """То же, что checker.check_series, с загрузкой страницы и торрента в цикле событий."""
+    series_id, url, title, last_updated, added_by, added_at = series
+    logger.info(f"Проверка сериала: {title}, последнее обновление: {last_updated}")
+
+    page_info = await client.get_page_info(url, fingerprint=None if force else fingerprint, force=force)
+    if not page_info:
+        logger.error(f"Не удалось получить информацию о странице {url}")
+        return None
+    if not has_update(series, page_info, force):
+        return await asyncio.to_thread(finish_unchanged, series, page_info, topic_data)
+    torrent_data = await client.download_torrent(page_info["topic_id"], force=force)
+    return finish_update(series, page_info, torrent_data)
+
+class AsyncPageChecker:
+    """
+    Проверка страниц сериалов для checker.run_check_cycle (аргумент check_pages).
+
+    check_pages вызывается из потока фоновой проверки и ждет, пока страницы
+    проверяются в цикле событий loop.
+    """
+
+    def __init__(self, loop, concurrency=ASYNC_CHECK_CONCURRENCY):
+        self.loop = loop
+        self.concurrency = concurrency
+        self.client = None
+
+    def check_pages(self, checks, rutracker):
+        return asyncio.run_coroutine_threadsafe(self.check_all(checks, rutracker), self.loop).result()
+
+    async def check_all(self, checks, rutracker):
+        # Клиент пересоздается, только если реестр создал новый RutrackerClient
+        if self.client is None or self.client.client is not rutracker:
+            if self.client is not None:
+                await self.client.close()
+            self.client = AsyncRutrackerClient(rutracker, pool_size=self.concurrency)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def check(series, *args):
+            async with semaphore:
+                try:
+                    return await check_series_async(self.client, series, *args)
+                except Exception as e:
+                    logger.error(f"Ошибка при обработке сериала {series[2]}: {e}")
+                    return None
+
+        results = await asyncio.gather(*(check(*item) for item in checks))
+        return [(item[0], result) for item, result in zip(checks, results)]
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.close()
+
+async def poll_updates():
+    """Получать обновления Telegram через AsyncTeleBot и передавать их обработчикам bot.py."""
+    from telebot.async_telebot import AsyncTeleBot
+    from bot import bot
+    # Обработчики выполняются в пуле handlers, собственный пул TeleBot не нужен
+    bot.threaded = False
+    handlers = ThreadPoolExecutor(max_workers=ASYNC_HANDLER_WORKERS, thread_name_prefix="handler")
+    async_bot = AsyncTeleBot(TELEGRAM_TOKEN)
+    loop = asyncio.get_running_loop()
+
+    def process(update):
+        try:
+            bot.process_new_updates([update])
+        except Exception as e:
+            logger.error(f"Ошибка обработки обновления {update.update_id}: {e}")
+
+    logger.info("Запуск бота (asyncio)...")
+    offset = None
+    try:
+        while not main.stop_event.is_set():
+            try:
+                updates = await async_bot.get_updates(offset=offset, timeout=20)
+            except Exception as e:
+                logger.error(f"Ошибка получения обновлений Telegram: {e}")
+                await asyncio.sleep(30)
+                continue
+            for update in updates:
+                offset = update.update_id + 1
+                loop.run_in_executor(handlers, process, update)
+    finally:
+        await async_bot.close_session()
+        handlers.shutdown(wait=False)
+
+async def run():
+    """Основная корутина: те же компоненты, что в main.main, и проверка страниц в цикле событий."""
+    main.start_metrics_server()
+    await asyncio.to_thread(main.init_database)
+    checker = AsyncPageChecker(asyncio.get_running_loop())
+    update_thread = threading.Thread(
+        target=main.check_series_updates, args=(checker.check_pages,), name="checker", daemon=True
+    )
+    update_thread.start()
+    logger.info("Фоновый поток для проверки обновлений запущен (страницы загружаются в цикле событий)")
+    start_health_monitor(main.stop_event)
+    try:
+        if BOT_MODE == "polling":
+            await poll_updates()
+        else:
+            if BOT_MODE == "webhook":
+                threading.Thread(target=main.run_bot, name="webhook", daemon=True).start()
+            else:
+                logger.info("BOT_MODE=none: только проверка обновлений, бот не запускается")
+            await asyncio.to_thread(main.stop_event.wait)
+    finally:
+        # Поток проверки и сервер webhook завершаются по stop_event
+        main.stop_event.set()
+        await checker.close()
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        logger.info("Получен сигнал на остановку")
@@ -0,0 +1,162 @@
+"""
+Нагрузочный тест фоновой проверки обновлений без обращения к настоящему RuTracker.
+
+Поднимает в отдельном процессе заменители RuTracker и qBittorrent (fake_servers.py)
+и прогоняет checker.run_due_checks — итерацию check_series_updates — с настоящими
+RutrackerClient, RutrackerApiClient и QBittorrentClient. Для каждого размера
+выполняются два цикла:
+    cold — первая проверка: все страницы и торренты загружаются и добавляются в qBittorrent;
+    warm — повторная проверка после обновления доли раздач (--change-rate).
+Выводятся время цикла, число запросов к каждому серверу и пиковая память.
+С --async страницы и торренты загружаются так же, как в async_main.py: в цикле событий
+через AsyncPageChecker, до --concurrency одновременно.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_checker.py [--series 10,1000,10000] [--latency 0.02]
+        [--change-rate 0.05] [--workers 4] [--no-api] [--tracemalloc] [--async] [--concurrency 50]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def run_servers(latency, page_size, urls):
+    """Процесс с заменителями серверов: не делит GIL с проверяемым кодом."""
+    from fake_servers import FakeRutracker, FakeQBittorrent
+    rutracker = FakeRutracker(latency=latency, page_size=page_size).start()
+    qbittorrent = FakeQBittorrent(latency=latency).start()
+    urls.put((rutracker.url, qbittorrent.url))
+    while True:
+        time.sleep(3600)
+
+def control(url, path):
+    with urllib.request.urlopen(urllib.request.Request(f"{url}{path}", method="POST"), timeout=60) as response:
+        return response.read().decode("utf-8")
+
+def stats(url):
+    return json.loads(control(url, "/__stats"))
+
+def configure(rutracker_url, qbittorrent_url, workers):
+    """Окружение для config.py: локальные серверы, без ограничения частоты и прокси."""
+    os.environ.update({
+        "TELEGRAM_TOKEN": "bench", "ADMIN_ID": "1",
+        "RUTRACKER_USERNAME": "bench", "RUTRACKER_PASSWORD": "bench",
+        "RUTRACKER_URL": rutracker_url, "RUTRACKER_API_URL": f"{rutracker_url}/v1",
+        "QBITTORRENT_URL": qbittorrent_url, "QBITTORRENT_USERNAME": "bench", "QBITTORRENT_PASSWORD": "bench",
+        "RUTRACKER_RATE": "0", "QBITTORRENT_RATE": "0", "QBITTORRENT_SYNC_INTERVAL": "0",
+        "CHECK_WORKERS": str(workers), "PROXY_URL": "", "PROFILE_CYCLE": "0",
+        # Циклы идут подряд, быстрее TTL кеша страниц: без этого warm-цикл не увидит изменений
+        "PAGE_CACHE_TTL": "0", "TORRENT_CACHE_TTL": "0",
+        # Cookies локального сервера не должны попасть в db/ рабочей копии: по ним бот пропустил бы вход
+        "RUTRACKER_COOKIE_FILE": os.path.join(tempfile.mkdtemp(prefix="telemon-bench-"), "rutracker_cookies.json"),
+    })
+
+def run_cycle(label, series_count, rutracker_url, qbittorrent_url, cycle, measure_memory):
+    before_rt, before_qb = stats(rutracker_url), stats(qbittorrent_url)
+    if measure_memory:
+        tracemalloc.reset_peak()
+    started = time.perf_counter()
+    checked = cycle()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1] / 2 ** 20 if measure_memory else None
+    after_rt, after_qb = stats(rutracker_url), stats(qbittorrent_url)
+    rt = {path: after_rt.get(path, 0) - before_rt.get(path, 0) for path in after_rt}
+    qb = sum(after_qb.values()) - sum(before_qb.values())
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(
+        f"{series_count:>7} {label:<5} {checked:>7} {elapsed:>9.2f} {checked / elapsed if elapsed else 0:>9.0f} "
+        f"{rt.get('/forum/viewtopic.php', 0):>7} {rt.get('/forum/dl.php', 0):>6} "
+        f"{rt.get('/v1/get_tor_topic_data', 0):>5} {rt.get('/forum/login.php', 0):>6} {qb:>6} "
+        f"{rss:>8.0f}" + (f" {peak:>9.1f}" if peak is not None else "")
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--series", default="10,1000,10000", help="размеры списка сериалов через запятую")
+    parser.add_argument("--latency", type=float, default=0.02, help="задержка ответа серверов, с")
+    parser.add_argument("--page-size", type=int, default=60000, help="размер страницы темы, байт")
+    parser.add_argument("--change-rate", type=float, default=0.05, help="доля раздач, обновляемых между циклами")
+    parser.add_argument("--workers", type=int, default=4, help="CHECK_WORKERS")
+    parser.add_argument("--no-api", action="store_true", help="не использовать API RuTracker")
+    parser.add_argument("--tracemalloc", action="store_true", help="измерять пик памяти Python (замедляет)")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="загружать страницы в asyncio")
+    parser.add_argument("--concurrency", type=int, default=50, help="ASYNC_CHECK_CONCURRENCY для --async")
+    args = parser.parse_args()
+
+    urls = multiprocessing.Queue()
+    servers = multiprocessing.Process(target=run_servers, args=(args.latency, args.page_size, urls), daemon=True)
+    servers.start()
+    rutracker_url, qbittorrent_url = urls.get(timeout=30)
+    configure(rutracker_url, qbittorrent_url, args.workers)
+    logging.basicConfig(level=logging.WARNING)
+
+    import database
+    from checker import run_due_checks, check_pages
+    from rutracker_client import RutrackerClient, RutrackerApiClient
+    from qbittorrent_client import QBittorrentClient
+    from scheduler import CheckScheduler
+
+    page_checker = None
+    if args.use_async:
+        from async_main import AsyncPageChecker
+        loop = asyncio.new_event_loop()
+        threading.Thread(target=loop.run_forever, daemon=True).start()
+        page_checker = AsyncPageChecker(loop, args.concurrency)
+        check_pages = page_checker.check_pages
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    print(f"latency={args.latency}s page={args.page_size}B change_rate={args.change_rate} "
+          f"workers={args.workers} api={'off' if args.no_api else 'on'} "
+          f"async={args.concurrency if args.use_async else 'off'}")
+    print(f"{'series':>7} {'cycle':<5} {'checked':>7} {'time, s':>9} {'series/s':>9} "
+          f"{'topic':>7} {'dl':>6} {'api':>5} {'login':>6} {'qb':>6} {'rss, MB':>8}"
+          + (f" {'peak, MB':>9}" if args.tracemalloc else ""))
+    try:
+        for series_count in (int(value) for value in args.series.split(",")):
+            control(rutracker_url, "/__reset")
+            control(qbittorrent_url, "/__reset")
+            with tempfile.TemporaryDirectory() as tmp:
+                database.DB_FILE = os.path.join(tmp, "bench.db")
+                database.init_db()
+                with database.get_connection() as conn:
+                    conn.executemany(
+                        "INSERT INTO series (url, title, last_updated, added_by, added_at) VALUES (?, ?, ?, ?, ?)",
+                        [(f"{rutracker_url}/forum/viewtopic.php?t={i}", f"Series {i}", "", 1, "")
+                         for i in range(1, series_count + 1)]
+                    )
+                rutracker = RutrackerClient()
+                qbittorrent = QBittorrentClient()
+                rutracker_api = None if args.no_api else RutrackerApiClient()
+                scheduler = CheckScheduler()
+
+                def cycle():
+                    return run_due_checks(scheduler, rutracker, qbittorrent, rutracker_api, check_pages)
+
+                run_cycle("cold", series_count, rutracker_url, qbittorrent_url, cycle, args.tracemalloc)
+                control(rutracker_url, f"/__advance?rate={args.change_rate}")
+                # Все сериалы снова подлежат проверке
+                database.execute_query("UPDATE series SET next_check_at = NULL")
+                # Расписание изменено в обход планировщика: очередь нужно перечитать целиком
+                scheduler.stale = True
+                run_cycle("warm", series_count, rutracker_url, qbittorrent_url, cycle, args.tracemalloc)
+                database.close_connection()
+    finally:
+        if page_checker is not None:
+            asyncio.run_coroutine_threadsafe(page_checker.close(), loop).result()
+        servers.terminate()
+
+if __name__ == "__main__":
+    main()
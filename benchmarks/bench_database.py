@@ -0,0 +1,123 @@
+"""
+Микро-бенчмарк слоя базы данных: запросов в секунду до и после постоянных соединений.
+
+"До" — отдельная база, созданная как раньше в database.init_db (журнал отката по умолчанию,
+без PRAGMA), и новое соединение на каждый запрос, как раньше в execute_query;
+"после" — database.execute_query с постоянным соединением потока, WAL и PRAGMA.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_database.py [--series 1000] [--queries 5000] [--threads 4]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# config.py требует обязательные переменные окружения
+for name, value in {
+    "TELEGRAM_TOKEN": "bench", "QBITTORRENT_URL": "http://127.0.0.1:1",
+    "RUTRACKER_USERNAME": "bench", "RUTRACKER_PASSWORD": "bench", "ADMIN_ID": "1",
+}.items():
+    os.environ.setdefault(name, value)
+
+import database  # noqa: E402
+
+READ_QUERY = "SELECT 1 FROM series WHERE url = ?"
+WRITE_QUERY = "UPDATE series SET last_updated = ? WHERE id = ?"
+
+BEFORE_SCHEMA = """
+    CREATE TABLE series (
+        id INTEGER PRIMARY KEY,
+        url TEXT UNIQUE,
+        title TEXT,
+        last_updated TEXT,
+        added_by INTEGER,
+        added_at TEXT
+    )
+"""
+
+def series_rows(series_count):
+    return [(f"https://rutracker.org/forum/viewtopic.php?t={i}", f"Series {i}", "", 1, "")
+            for i in range(1, series_count + 1)]
+
+def create_before_db(path, series_count):
+    """База со старыми настройками: схема и соединение как в исходном database.py."""
+    conn = sqlite3.connect(path)
+    try:
+        with conn:
+            conn.execute(BEFORE_SCHEMA)
+            conn.executemany(
+                "INSERT INTO series (url, title, last_updated, added_by, added_at) VALUES (?, ?, ?, ?, ?)",
+                series_rows(series_count)
+            )
+    finally:
+        conn.close()
+
+def query_per_connection(db_file):
+    """Старый вариант: новое соединение с настройками по умолчанию на каждый запрос."""
+    def query(query, params):
+        conn = sqlite3.connect(db_file)
+        try:
+            with conn:
+                return conn.execute(query, params).fetchone()
+        finally:
+            conn.close()
+    return query
+
+def query_pooled(query, params):
+    return database.execute_query(query, params, fetchone=True)
+
+def run(func, series_count, queries, threads, write_ratio):
+    """Выполнить queries запросов в threads потоках, вернуть запросов в секунду."""
+    per_thread = queries // threads
+
+    def worker(offset):
+        for i in range(per_thread):
+            series_id = (offset + i) % series_count + 1
+            if i % 100 < write_ratio * 100:
+                func(WRITE_QUERY, (f"bench-{i}", series_id))
+            else:
+                func(READ_QUERY, (f"https://rutracker.org/forum/viewtopic.php?t={series_id}",))
+        database.close_connection()
+
+    workers = [threading.Thread(target=worker, args=(n * per_thread,)) for n in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return per_thread * threads / (time.perf_counter() - started)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--series", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_FILE = os.path.join(tmp, "bench.db")
+        database.init_db()
+        with database.get_connection() as conn:
+            conn.executemany(
+                "INSERT INTO series (url, title, last_updated, added_by, added_at) VALUES (?, ?, ?, ?, ?)",
+                series_rows(args.series)
+            )
+        database.close_connection()
+        before_db = os.path.join(tmp, "before.db")
+        create_before_db(before_db, args.series)
+
+        print(f"series={args.series} queries={args.queries} threads={args.threads}")
+        print(f"{'workload':<12}{'before, q/s':>14}{'after, q/s':>14}{'speedup':>10}")
+        for label, write_ratio in (("read", 0.0), ("mixed 10%", 0.1), ("write", 1.0)):
+            before = run(query_per_connection(before_db), args.series, args.queries, args.threads, write_ratio)
+            after = run(query_pooled, args.series, args.queries, args.threads, write_ratio)
+            print(f"{label:<12}{before:>14.0f}{after:>14.0f}{after / before:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
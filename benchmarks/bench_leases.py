@@ -0,0 +1,123 @@
+"""
+Проверка аренды сериалов несколькими процессами проверки с общей базой SQLite.
+
+Процессы-воркеры с разными CHECKER_ID в цикле вызывают CheckScheduler.load/pop_due/leased
+и имитируют проверку сериала задержкой --delay. Перед ними запускается «аварийный» воркер:
+он берет пакет в аренду и завершается, не сняв ее; эти сериалы должны проверить
+другие воркеры после истечения аренды (--lease).
+
+Проверяется, что каждый сериал проверен ровно один раз; выводятся время и распределение
+сериалов по воркерам для 1 и --workers процессов. Код выхода 1, если проверка не прошла.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_leases.py [--series 2000] [--workers 4] [--batch 100] [--delay 0.002] [--lease 2]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.update({
+    "TELEGRAM_TOKEN": "1:bench", "ADMIN_ID": "1", "QBITTORRENT_URL": "http://127.0.0.1:1",
+    "RUTRACKER_USERNAME": "bench", "RUTRACKER_PASSWORD": "bench",
+})
+
+def worker(db_file, owner, batch, lease, delay, crash, results):
+    import database
+    from scheduler import CheckScheduler
+    database.DB_FILE = db_file
+    scheduler = CheckScheduler(owner=owner, lease_seconds=lease, batch_size=batch)
+    checked = []
+    while True:
+        scheduler.load()
+        due = scheduler.pop_due()
+        if crash:
+            # Процесс «падает» с арендованным пакетом: аренда не снимается
+            results.put((owner, [], len(due)))
+            results.close()
+            results.join_thread()
+            os._exit(1)
+        if not due:
+            next_in = scheduler.seconds_until_next()
+            # Все сериалы перепланированы далеко вперед — работа закончена
+            if next_in is None or next_in > lease * 2:
+                break
+            time.sleep(min(next_in, 0.1) or 0.01)
+            continue
+        with scheduler.leased(due):
+            for series_id in due:
+                time.sleep(delay)
+                checked.append(series_id)
+                scheduler.reschedule(series_id, False)
+    results.put((owner, checked, 0))
+
+def run(series_count, workers, batch, delay, lease, crash):
+    import database
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, "leases.db")
+        database.DB_FILE = db_file
+        database.init_db()
+        with database.get_connection() as conn:
+            conn.executemany(
+                "INSERT INTO series (url, title, last_updated, added_by, added_at) VALUES (?, ?, ?, ?, ?)",
+                [(f"https://rutracker.org/forum/viewtopic.php?t={i}", f"Series {i}", "", 1, "")
+                 for i in range(1, series_count + 1)]
+            )
+        database.close_connection()
+
+        results = multiprocessing.Queue()
+        started = time.perf_counter()
+        crashed_claims = 0
+        if crash:
+            process = multiprocessing.Process(
+                target=worker, args=(db_file, "crashed", batch, lease, delay, True, results)
+            )
+            process.start()
+            _, _, crashed_claims = results.get(timeout=60)
+            process.join()
+        processes = [
+            multiprocessing.Process(
+                target=worker, args=(db_file, f"worker-{index}", batch, lease, delay, False, results)
+            )
+            for index in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        reports = [results.get(timeout=600) for _ in processes]
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - started
+
+    counts = Counter(series_id for _, checked, _ in reports for series_id in checked)
+    missing = series_count - len(counts)
+    duplicates = sum(1 for count in counts.values() if count > 1)
+    per_worker = ", ".join(f"{owner}: {len(checked)}" for owner, checked, _ in sorted(reports))
+    ok = missing == 0 and duplicates == 0
+    print(f"{workers:>7} {elapsed:>8.2f} {crashed_claims:>8} {missing:>7} {duplicates:>10}  "
+          f"{'OK' if ok else 'FAIL'}  {per_worker}")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--series", type=int, default=2000, help="число сериалов")
+    parser.add_argument("--workers", type=int, default=4, help="число процессов проверки")
+    parser.add_argument("--batch", type=int, default=100, help="CHECK_BATCH_SIZE")
+    parser.add_argument("--delay", type=float, default=0.002, help="длительность проверки одного сериала, с")
+    parser.add_argument("--lease", type=float, default=2, help="CHECK_LEASE_SECONDS")
+    parser.add_argument("--no-crash", action="store_true", help="без аварийного воркера")
+    args = parser.parse_args()
+
+    print(f"series={args.series} batch={args.batch} delay={args.delay}s lease={args.lease}s")
+    print(f"{'workers':>7} {'time, s':>8} {'orphaned':>8} {'missing':>7} {'duplicates':>10}  result")
+    ok = True
+    for workers in sorted({1, args.workers}):
+        ok = run(args.series, workers, args.batch, args.delay, args.lease, not args.no_crash) and ok
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Время импорта и запуска бота с заменителями RuTracker и qBittorrent (fake_servers.py).
+
+Каждый запуск выполняется в отдельном процессе Python с холодным кешем cookies:
+    lazy   — текущий путь: импорт bot и main, клиенты создаются из реестра clients при первой проверке;
+    legacy — прежний путь: после импорта создаются две пары клиентов (в bot.py и в main.main),
+             и только после этого бот начинает отвечать.
+Выводятся медианы: время импорта, время до готовности бота, время до готовности клиентов,
+число входов на RuTracker и в qBittorrent, загружены ли bs4 и qbittorrentapi к моменту готовности бота.
+С --importtime дополнительно печатаются самые медленные модули по python -X importtime.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_startup.py [--runs 5] [--latency 0.05] [--importtime]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_checker import run_servers, control, stats, configure
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import bot, main
+imported = time.perf_counter() - started
+if sys.argv[1] == "legacy":
+    from rutracker_client import RutrackerClient
+    from qbittorrent_client import QBittorrentClient
+    for _ in range(2):
+        RutrackerClient(), QBittorrentClient()
+ready = time.perf_counter() - started
+heavy = {name: name in sys.modules for name in ("bs4", "qbittorrentapi")}
+if sys.argv[1] == "lazy":
+    from clients import get_rutracker, get_qbittorrent
+    get_rutracker(), get_qbittorrent()
+clients = time.perf_counter() - started
+print(json.dumps({"import": imported, "ready": ready, "clients": clients, "heavy": heavy}))
+"""
+
+def probe(mode, workdir):
+    """Один запуск в отдельном процессе; cookies RuTracker каждый раз отсутствуют."""
+    cookie_file = os.path.join(workdir, "cookies.json")
+    if os.path.exists(cookie_file):
+        os.remove(cookie_file)
+    env = dict(os.environ, PYTHONPATH=ROOT, RUTRACKER_COOKIE_FILE=cookie_file, METRICS_PORT="0")
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE, mode], cwd=workdir, env=env,
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def print_importtime(workdir, top):
+    """Самые медленные модули (накопительное время) при импорте bot и main."""
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import bot, main"], cwd=workdir, env=env,
+        capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), name.rstrip()))
+    rows.sort(reverse=True)
+    print(f"\npython -X importtime -c 'import bot, main': топ-{top} по накопительному времени")
+    for cumulative_us, name in rows[:top]:
+        print(f"{cumulative_us / 1000:>9.1f} мс  {name}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="число запусков на режим")
+    parser.add_argument("--latency", type=float, default=0.05, help="задержка ответа серверов, с")
+    parser.add_argument("--importtime", action="store_true", help="показать медленные модули по -X importtime")
+    parser.add_argument("--top", type=int, default=15, help="сколько модулей показать с --importtime")
+    args = parser.parse_args()
+
+    urls = multiprocessing.Queue()
+    servers = multiprocessing.Process(target=run_servers, args=(args.latency, 1000, urls), daemon=True)
+    servers.start()
+    rutracker_url, qbittorrent_url = urls.get(timeout=30)
+    configure(rutracker_url, qbittorrent_url, 4)
+    # TeleBot проверяет формат токена при создании
+    os.environ["TELEGRAM_TOKEN"] = "1:bench"
+
+    print(f"latency={args.latency}s runs={args.runs}")
+    print(f"{'mode':<7} {'import, s':>9} {'ready, s':>9} {'clients, s':>10} {'rt login':>8} "
+          f"{'qb login':>8} {'bs4':>5} {'qbapi':>5}")
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            for mode in ("lazy", "legacy"):
+                results = []
+                control(rutracker_url, "/__reset")
+                control(qbittorrent_url, "/__reset")
+                for _ in range(args.runs):
+                    results.append(probe(mode, workdir))
+                rt, qb = stats(rutracker_url), stats(qbittorrent_url)
+                heavy = results[-1]["heavy"]
+                print(
+                    f"{mode:<7} {statistics.median(r['import'] for r in results):>9.3f} "
+                    f"{statistics.median(r['ready'] for r in results):>9.3f} "
+                    f"{statistics.median(r['clients'] for r in results):>10.3f} "
+                    f"{rt.get('/forum/login.php', 0) / args.runs:>8.1f} "
+                    f"{qb.get('/api/v2/auth/login', 0) / args.runs:>8.1f} "
+                    f"{'да' if heavy['bs4'] else 'нет':>5} {'да' if heavy['qbittorrentapi'] else 'нет':>5}"
+                )
+            if args.importtime:
+                print_importtime(workdir, args.top)
+    finally:
+        servers.terminate()
+
+if __name__ == "__main__":
+    main()
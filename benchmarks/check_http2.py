@@ -0,0 +1,138 @@
+"""
+Проверка HTTP/2-транспорта RuTracker (RUTRACKER_HTTP2=1, нужны httpx[http2] и openssl).
+
+1. RutrackerClient с Http2Session входит на FakeRutracker за Http2Frontend (TLS, ALPN h2),
+   загружает страницу темы, повторно — условным запросом (304), и торрент-файл;
+   проверяется, что ответы получены по HTTP/2 через одно соединение.
+2. Число попыток соединения с сервером, который принимает и сразу закрывает соединения:
+   для GET и POST должно быть ровно retries + 1 (повторы не перемножаются с повторами httpx).
+
+Код выхода 1, если проверка не прошла.
+
+Запуск из корня репозитория:
+    python benchmarks/check_http2.py [--retries 2]
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def make_certificate(directory):
+    """Самоподписанный сертификат для 127.0.0.1: (certfile, keyfile)."""
+    certfile = os.path.join(directory, "cert.pem")
+    keyfile = os.path.join(directory, "key.pem")
+    subprocess.run(
+        [
+            "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+            "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1",
+            "-keyout", keyfile, "-out", certfile,
+        ],
+        check=True, capture_output=True
+    )
+    return certfile, keyfile
+
+def configure(rutracker_url, certfile, directory):
+    """Окружение для config.py: локальный сервер, HTTP/2, без ограничения частоты и прокси."""
+    os.environ.update({
+        "TELEGRAM_TOKEN": "1:check", "ADMIN_ID": "1",
+        "RUTRACKER_USERNAME": "check", "RUTRACKER_PASSWORD": "check",
+        "RUTRACKER_URL": rutracker_url, "RUTRACKER_API_URL": f"{rutracker_url}/v1",
+        "QBITTORRENT_URL": "http://127.0.0.1:1", "RUTRACKER_HTTP2": "1",
+        "RUTRACKER_RATE": "0", "PROXY_URL": "", "PAGE_CACHE_TTL": "0", "TORRENT_CACHE_TTL": "0",
+        "RUTRACKER_COOKIE_FILE": os.path.join(directory, "rutracker_cookies.json"),
+        # httpx доверяет сертификату из SSL_CERT_FILE
+        "SSL_CERT_FILE": certfile,
+    })
+
+def check_client(rutracker, frontend):
+    """Вход, страница, условный запрос и торрент через Http2Session. Возвращает список ошибок."""
+    from http_transport import Http2Session
+    from rutracker_client import RutrackerClient
+    errors = []
+    client = RutrackerClient()
+    if not isinstance(client.session, Http2Session):
+        return [f"сессия {type(client.session).__name__}, ожидалась Http2Session"]
+    if not client.is_logged_in:
+        return ["не удалось войти"]
+    url = f"{frontend.url}/forum/viewtopic.php?t=7"
+    page_info = client.get_page_info(url, force=True)
+    if not page_info or page_info["title"] != "Series 7 [1-1]":
+        errors.append(f"неверная страница: {page_info}")
+    else:
+        again = client.get_page_info(url, fingerprint=page_info, force=True)
+        if not again or not again["unchanged"]:
+            errors.append("условный запрос не вернул 304")
+    torrent = client.download_torrent("7", force=True)
+    from fake_servers import make_torrent
+    if torrent != make_torrent(7, 0):
+        errors.append("торрент-файл не совпадает")
+    response = client.session.get(f"{frontend.url}/forum/login.php")
+    if response.response.http_version != "HTTP/2":
+        errors.append(f"ответ получен по {response.response.http_version}")
+    if frontend.connections != 1:
+        errors.append(f"соединений: {frontend.connections}, ожидалось 1")
+    print(f"HTTP/2: {response.response.http_version}, соединений: {frontend.connections}, "
+          f"запросы: {dict(rutracker.requests)}")
+    client.session.close()
+    return errors
+
+def count_attempts(method, retries):
+    """Число соединений, которые Http2Session открыла до отказа, с сервером, закрывающим их сразу."""
+    import requests
+    from http_transport import create_session
+    server = socket.create_server(("127.0.0.1", 0))
+    attempts = []
+
+    def accept():
+        while True:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                return
+            attempts.append(1)
+            conn.close()
+
+    threading.Thread(target=accept, daemon=True).start()
+    session = create_session(http2=True, retries=retries, backoff=0)
+    try:
+        session.request(method, f"https://127.0.0.1:{server.getsockname()[1]}/", timeout=5)
+    except requests.ConnectionError:
+        pass
+    finally:
+        session.close()
+        server.close()
+    return len(attempts)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--retries", type=int, default=2)
+    args = parser.parse_args()
+
+    from fake_servers import FakeRutracker, Http2Frontend
+    directory = tempfile.mkdtemp(prefix="telemon-http2-")
+    certfile, keyfile = make_certificate(directory)
+    rutracker = FakeRutracker(page_size=20000)
+    frontend = Http2Frontend(rutracker, certfile, keyfile).start()
+    configure(frontend.url, certfile, directory)
+
+    errors = check_client(rutracker, frontend)
+    for method in ("GET", "POST"):
+        attempts = count_attempts(method, args.retries)
+        print(f"{method}: попыток соединения {attempts}, ожидалось {args.retries + 1}")
+        if attempts != args.retries + 1:
+            errors.append(f"{method}: попыток соединения {attempts} вместо {args.retries + 1}")
+    frontend.close()
+
+    for error in errors:
+        print(f"ОШИБКА: {error}")
+    print("OK" if not errors else "FAIL")
+    sys.exit(1 if errors else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,478 @@
+"""
+Локальные заменители RuTracker и qBittorrent WebUI для нагрузочных тестов.
+
+FakeRutracker отвечает на login.php, viewtopic.php, dl.php и get_tor_topic_data API;
+FakeQBittorrent — на используемую ботом часть WebUI API v2 (auth, app, sync/maindata,
+torrents/*). Http2Frontend отдает запросы к любому из них по HTTP/2 через TLS (нужен h2). Оба сервера считают запросы по эндпоинтам и имеют служебные методы:
+    GET  /__stats             — счетчики запросов (JSON)
+    POST /__reset             — сбросить состояние и счетчики
+    POST /__advance?rate=0.05 — (только RuTracker) обновить долю раздач
+    POST /__expire            — (только RuTracker) завершить все сессии
+
+Запуск отдельно (для ручной проверки):
+    python benchmarks/fake_servers.py [--rutracker-port 8081] [--qbittorrent-port 8082] [--latency 0.02]
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import socket
+import ssl
+import sys
+import threading
+import time
+from collections import Counter
+from email.message import Message
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from torrent_utils import parse_torrent  # noqa: E402
+
+PIECE_SIZE = 262144
+
+def bencode(value):
+    if isinstance(value, int):
+        return b"i%de" % value
+    if isinstance(value, str):
+        value = value.encode("utf-8")
+    if isinstance(value, bytes):
+        return b"%d:%s" % (len(value), value)
+    if isinstance(value, list):
+        return b"l" + b"".join(bencode(item) for item in value) + b"e"
+    if isinstance(value, dict):
+        items = sorted((key.encode("utf-8") if isinstance(key, str) else key, item) for key, item in value.items())
+        return b"d" + b"".join(bencode(key) + bencode(item) for key, item in items) + b"e"
+    raise TypeError(f"Неподдерживаемый тип: {type(value)}")
+
+def make_torrent(topic_id, version):
+    """Детерминированный торрент раздачи: каждая версия добавляет серию (файл)."""
+    files = [{"length": PIECE_SIZE * 4, "path": [f"e{episode:03d}.mkv"]} for episode in range(1, version + 2)]
+    pieces = b"".join(
+        hashlib.sha1(f"{topic_id}-{index}".encode()).digest()
+        for index in range(sum(item["length"] for item in files) // PIECE_SIZE)
+    )
+    info = {"name": f"Series {topic_id}", "piece length": PIECE_SIZE, "pieces": pieces, "files": files}
+    return bencode({"announce": "http://bt.example/announce", "info": info})
+
+class QuietHTTPServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # Клиент закрывает соединение, дочитав начало страницы (потоковый режим) — это не ошибка
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+class FakeServer:
+    """Базовый HTTP-сервер с задержкой ответа и счетчиками запросов."""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.requests = Counter()
+        self.reset()
+        self.httpd = QuietHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self.httpd.request_queue_size = 128
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reset(self):
+        with self.lock:
+            self.requests.clear()
+
+    def control(self, path, params):
+        """Служебные запросы (не учитываются в счетчиках)."""
+        if path == "/__stats":
+            with self.lock:
+                return 200, {"Content-Type": "application/json"}, json.dumps(self.requests)
+        if path == "/__reset":
+            self.reset()
+            return 200, {}, "Ok."
+        return 404, {}, "not found"
+
+    def route(self, method, path, params, headers, body):
+        """Вернуть (статус, заголовки, тело)."""
+        raise NotImplementedError
+
+    def respond(self, method, target, headers, body):
+        """Обработать запрос к target (путь с query): служебный или обычный с задержкой и подсчетом."""
+        parsed = urlparse(target)
+        params = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+        if parsed.path.startswith("/__"):
+            status, response_headers, data = self.control(parsed.path, params)
+        else:
+            with self.lock:
+                self.requests[parsed.path] += 1
+            if self.latency:
+                time.sleep(self.latency)
+            status, response_headers, data = self.route(method, parsed.path, params, headers, body)
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        return status, response_headers, data
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Без этого задержанные ACK добавляют ~40 мс к POST-запросам с телом
+            disable_nagle_algorithm = True
+
+            def handle_any(self, method):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                status, headers, data = server.respond(method, self.path, self.headers, body)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self.handle_any("GET")
+
+            def do_POST(self):
+                self.handle_any("POST")
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def serve_forever(self):
+        self.httpd.serve_forever()
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+class FakeRutracker(FakeServer):
+    """RuTracker: форум (login.php, viewtopic.php, dl.php) и API (/v1/get_tor_topic_data)."""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, page_size=60000):
+        self.page_size = page_size
+        super().__init__(host, port, latency)
+
+    def reset(self):
+        super().reset()
+        with self.lock:
+            self.versions = {}
+            self.sessions = set()
+
+    def logged_in(self, headers):
+        cookies = dict(
+            item.strip().split("=", 1) for item in headers.get("Cookie", "").split(";") if "=" in item
+        )
+        with self.lock:
+            return cookies.get("bb_session") in self.sessions
+
+    def advance(self, rate):
+        """Обновить долю rate известных раздач (новая серия — новые время сообщения и info hash)."""
+        with self.lock:
+            known = sorted(self.versions)
+            changed = random.sample(known, round(len(known) * rate))
+            for topic_id in changed:
+                self.versions[topic_id] += 1
+        return len(changed)
+
+    def version(self, topic_id):
+        with self.lock:
+            return self.versions.setdefault(topic_id, 0)
+
+    def page(self, topic_id, version):
+        head = (
+            f'<html><head><meta charset="windows-1251"><title>Series {topic_id}</title></head><body>'
+            f'<h1 class="maintitle"><a href="viewtopic.php?t={topic_id}">Series {topic_id} [1-{version + 1}]</a></h1>'
+            f'<table><tr><td><p class="post-time"><a href="#">2024-01-{version % 28 + 1:02d} 12:00</a></p></td></tr>'
+        )
+        filler = "<tr><td class='post_body'>" + "Описание раздачи. " * 40 + "</td></tr>"
+        body = head + filler * max(0, (self.page_size - len(head)) // len(filler)) + "</table></body></html>"
+        return body.encode("cp1251")
+
+    def control(self, path, params):
+        if path == "/__advance":
+            return 200, {}, str(self.advance(float(params.get("rate", "0.05"))))
+        if path == "/__expire":
+            with self.lock:
+                self.sessions.clear()
+            return 200, {}, "Ok."
+        return super().control(path, params)
+
+    def route(self, method, path, params, headers, body):
+        if path == "/forum/login.php":
+            if method != "POST":
+                return 200, {"Content-Type": "text/html"}, '<form><input name="login_username"></form>'
+            with self.lock:
+                session = f"fake-session-{len(self.sessions) + 1}-{random.getrandbits(32)}"
+                self.sessions.add(session)
+            return 200, {"Set-Cookie": f"bb_session={session}; Path=/"}, "ok"
+        if path in ("/forum/viewtopic.php", "/forum/dl.php") and not self.logged_in(headers):
+            return 302, {"Location": "/forum/login.php"}, b""
+        if path == "/forum/viewtopic.php":
+            topic_id = int(params.get("t", 0))
+            version = self.version(topic_id)
+            etag = f'"{topic_id}-{version}"'
+            if headers.get("If-None-Match") == etag:
+                return 304, {"ETag": etag}, b""
+            return 200, {"Content-Type": "text/html; charset=windows-1251", "ETag": etag}, self.page(topic_id, version)
+        if path == "/forum/dl.php":
+            topic_id = int(params.get("t", 0))
+            return 200, {"Content-Type": "application/x-bittorrent"}, make_torrent(topic_id, self.version(topic_id))
+        if path == "/v1/get_tor_topic_data":
+            result = {}
+            for topic_id in params.get("val", "").split(","):
+                if topic_id.isdigit():
+                    version = self.version(int(topic_id))
+                    info_hash = parse_torrent(make_torrent(int(topic_id), version))["info_hash"]
+                    result[topic_id] = {"info_hash": info_hash.upper(), "reg_time": 1700000000 + version, "size": 0}
+            return 200, {"Content-Type": "application/json"}, json.dumps({"result": result})
+        return 404, {}, "not found"
+
+class FakeQBittorrent(FakeServer):
+    """qBittorrent WebUI API v2 в памяти."""
+
+    def reset(self):
+        super().reset()
+        with self.lock:
+            self.torrents = {}
+            self.removed = []
+            self.rid = 0
+
+    def changed(self, torrent_hash):
+        self.rid += 1
+        self.torrents[torrent_hash]["rid"] = self.rid
+
+    def add(self, data, fields):
+        torrent = parse_torrent(data)
+        with self.lock:
+            self.torrents[torrent["info_hash"]] = {
+                "hash": torrent["info_hash"],
+                "name": torrent["name"],
+                "tags": fields.get("tags", ""),
+                "category": fields.get("category", ""),
+                "progress": 0.0,
+                "piece_size": torrent["piece_size"],
+                "pieces": torrent["pieces"],
+                "files": torrent["files"],
+            }
+            self.changed(torrent["info_hash"])
+
+    def delete(self, hashes):
+        with self.lock:
+            for torrent_hash in hashes:
+                if self.torrents.pop(torrent_hash, None) is not None:
+                    self.rid += 1
+                    self.removed.append((torrent_hash, self.rid))
+
+    def maindata(self, rid):
+        fields = ("name", "tags", "category", "progress")
+        with self.lock:
+            if rid <= 0:
+                torrents = {h: {f: t[f] for f in fields} for h, t in self.torrents.items()}
+                return {"rid": self.rid, "full_update": True, "torrents": torrents}
+            torrents = {h: {f: t[f] for f in fields} for h, t in self.torrents.items() if t["rid"] > rid}
+            removed = [h for h, removed_rid in self.removed if removed_rid > rid]
+            return {"rid": self.rid, "torrents": torrents, "torrents_removed": removed}
+
+    def route(self, method, path, params, headers, body):
+        content_type = headers.get("Content-Type", "")
+        fields = dict(params)
+        files = []
+        if content_type.startswith("multipart/form-data"):
+            message = BytesParser(policy=HTTP).parsebytes(
+                f"Content-Type: {content_type}\r\n\r\n".encode() + body
+            )
+            for part in message.iter_parts():
+                if part.get_filename():
+                    files.append(part.get_payload(decode=True))
+                else:
+                    fields[part.get_param("name", header="content-disposition")] = part.get_content().strip()
+        elif body:
+            fields.update({key: values[-1] for key, values in parse_qs(body.decode("utf-8")).items()})
+
+        name = path[len("/api/v2/"):] if path.startswith("/api/v2/") else path
+        if name == "auth/login":
+            return 200, {"Set-Cookie": "SID=fake-sid; Path=/"}, "Ok."
+        if name == "app/version":
+            return 200, {}, "v4.6.0"
+        if name == "app/webapiVersion":
+            return 200, {}, "2.9.3"
+        if name == "sync/maindata":
+            return 200, {"Content-Type": "application/json"}, json.dumps(self.maindata(int(fields.get("rid", 0))))
+        if name == "torrents/add":
+            for data in files:
+                self.add(data, fields)
+            return 200, {}, "Ok."
+        if name == "torrents/delete":
+            self.delete(fields.get("hashes", "").split("|"))
+            return 200, {}, ""
+        if name == "torrents/info":
+            with self.lock:
+                torrents = [
+                    {"hash": t["hash"], "name": t["name"], "tags": t["tags"], "category": t["category"]}
+                    for t in self.torrents.values()
+                    if ("tag" not in fields or fields["tag"] in t["tags"].split(","))
+                    and ("category" not in fields or fields["category"] == t["category"])
+                ]
+            return 200, {"Content-Type": "application/json"}, json.dumps(torrents)
+        torrent = self.torrents.get(fields.get("hash", ""))
+        if name in ("torrents/files", "torrents/properties", "torrents/pieceHashes") and torrent is None:
+            return 404, {}, "Torrent hash was not found"
+        if name == "torrents/files":
+            files_info = [{"name": path, "size": size} for path, size in torrent["files"]]
+            return 200, {"Content-Type": "application/json"}, json.dumps(files_info)
+        if name == "torrents/properties":
+            return 200, {"Content-Type": "application/json"}, json.dumps({"piece_size": torrent["piece_size"]})
+        if name == "torrents/pieceHashes":
+            return 200, {"Content-Type": "application/json"}, json.dumps(torrent["pieces"])
+        if name in ("torrents/removeTags", "torrents/setCategory"):
+            with self.lock:
+                for torrent_hash in fields.get("hashes", "").split("|"):
+                    if torrent_hash in self.torrents:
+                        if name == "torrents/removeTags":
+                            self.torrents[torrent_hash]["tags"] = ""
+                        else:
+                            self.torrents[torrent_hash]["category"] = fields.get("category", "")
+                        self.changed(torrent_hash)
+            return 200, {}, ""
+        return 404, {}, "not found"
+
+class Http2Frontend:
+    """
+    HTTP/2 через TLS (ALPN h2) перед FakeServer: запросы обрабатывает server.respond.
+
+    Запросы одного соединения обрабатываются по очереди; ответы отправляются
+    с учетом окна управления потоком, RST_STREAM (клиент дочитал начало страницы) отменяет ответ.
+    """
+
+    def __init__(self, server, certfile, keyfile, host="127.0.0.1", port=0):
+        self.server = server
+        self.context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        self.context.load_cert_chain(certfile, keyfile)
+        self.context.set_alpn_protocols(["h2"])
+        self.sock = socket.create_server((host, port))
+        self.connections = 0
+
+    @property
+    def url(self):
+        host, port = self.sock.getsockname()[:2]
+        return f"https://{host}:{port}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def serve_forever(self):
+        while True:
+            try:
+                raw, _ = self.sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self.serve_connection, args=(raw,), daemon=True).start()
+
+    def close(self):
+        self.sock.close()
+
+    def serve_connection(self, raw):
+        import h2.config
+        import h2.connection
+        import h2.events
+        import h2.exceptions
+        try:
+            tls = self.context.wrap_socket(raw, server_side=True)
+        except (ssl.SSLError, OSError):
+            raw.close()
+            return
+        if tls.selected_alpn_protocol() != "h2":
+            tls.close()
+            return
+        with self.server.lock:
+            self.connections += 1
+        conn = h2.connection.H2Connection(h2.config.H2Configuration(client_side=False, header_encoding="utf-8"))
+        conn.initiate_connection()
+        streams, pending = {}, {}
+        try:
+            tls.sendall(conn.data_to_send())
+            while True:
+                data = tls.recv(65535)
+                if not data:
+                    return
+                for event in conn.receive_data(data):
+                    if isinstance(event, h2.events.RequestReceived):
+                        streams[event.stream_id] = (event.headers, bytearray())
+                    elif isinstance(event, h2.events.DataReceived):
+                        streams[event.stream_id][1].extend(event.data)
+                        conn.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+                    elif isinstance(event, h2.events.StreamEnded):
+                        headers, body = streams.pop(event.stream_id)
+                        pending[event.stream_id] = self.respond(conn, event.stream_id, headers, bytes(body))
+                    elif isinstance(event, h2.events.StreamReset):
+                        pending.pop(event.stream_id, None)
+                    elif isinstance(event, h2.events.ConnectionTerminated):
+                        return
+                for stream_id, data in list(pending.items()):
+                    try:
+                        size = min(len(data), conn.local_flow_control_window(stream_id), conn.max_outbound_frame_size)
+                        while size > 0:
+                            conn.send_data(stream_id, data[:size])
+                            data = data[size:]
+                            size = min(len(data), conn.local_flow_control_window(stream_id),
+                                       conn.max_outbound_frame_size)
+                        if data:
+                            pending[stream_id] = data
+                        else:
+                            conn.end_stream(stream_id)
+                            del pending[stream_id]
+                    except h2.exceptions.StreamClosedError:
+                        del pending[stream_id]
+                tls.sendall(conn.data_to_send())
+        except OSError:
+            pass
+        finally:
+            tls.close()
+
+    def respond(self, conn, stream_id, headers, body):
+        """Отправить заголовки ответа; вернуть тело, которое еще нужно отправить."""
+        pseudo = {name: value for name, value in headers if name.startswith(":")}
+        message = Message()
+        cookies = []
+        for name, value in headers:
+            # HTTP/2 разрешает делить Cookie на несколько заголовков
+            if name == "cookie":
+                cookies.append(value)
+            elif not name.startswith(":"):
+                message[name] = value
+        if cookies:
+            message["Cookie"] = "; ".join(cookies)
+        status, response_headers, data = self.server.respond(pseudo[":method"], pseudo[":path"], message, body)
+        conn.send_headers(stream_id, [
+            (":status", str(status)),
+            *((name.lower(), value) for name, value in response_headers.items()),
+            ("content-length", str(len(data))),
+        ])
+        return data
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rutracker-port", type=int, default=8081)
+    parser.add_argument("--qbittorrent-port", type=int, default=8082)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+    rutracker = FakeRutracker(port=args.rutracker_port, latency=args.latency).start()
+    qbittorrent = FakeQBittorrent(port=args.qbittorrent_port, latency=args.latency).start()
+    print(f"RuTracker: {rutracker.url}, qBittorrent: {qbittorrent.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
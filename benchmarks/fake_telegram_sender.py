@@ -0,0 +1,87 @@
+"""
+Локальный имитатор Telegram для проверки webhook-режима.
+
+Отправляет на webhook-сервер синтетические обновления (текстовые сообщения)
+с секретным токеном и выводит распределение HTTP-статусов и пропускную способность.
+
+Запуск (бот запущен с BOT_MODE=webhook):
+    python benchmarks/fake_telegram_sender.py --url http://127.0.0.1:8080/telegram \
+        --secret <WEBHOOK_SECRET> [--updates 1000] [--threads 8] [--chat-id 1] [--text /start]
+"""
+import argparse
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+def make_update(update_id, chat_id, text):
+    """Минимальное обновление Telegram с текстовым сообщением."""
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Fake"},
+            "text": text,
+        },
+    }
+
+def send(url, secret, payload):
+    """Отправить одно обновление, вернуть HTTP-статус (0 — ошибка соединения)."""
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json", SECRET_HEADER: secret},
+        method="POST"
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", required=True)
+    parser.add_argument("--secret", default="")
+    parser.add_argument("--updates", type=int, default=1000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--chat-id", type=int, default=1)
+    parser.add_argument("--text", default="/start")
+    args = parser.parse_args()
+
+    statuses = Counter()
+    lock = threading.Lock()
+    counter = iter(range(1, args.updates + 1))
+
+    def worker():
+        while True:
+            with lock:
+                update_id = next(counter, None)
+            if update_id is None:
+                return
+            status = send(args.url, args.secret, make_update(update_id, args.chat_id, args.text))
+            with lock:
+                statuses[status] += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    print(f"updates={args.updates} threads={args.threads} time={elapsed:.2f}s rate={args.updates / elapsed:.0f}/s")
+    for status, count in sorted(statuses.items()):
+        print(f"  HTTP {status or 'error'}: {count}")
+
+if __name__ == "__main__":
+    main()
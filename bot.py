@@ -1,33 +1,38 @@
 import logging
+import threading
+import time
+from collections import OrderedDict
 from telebot import TeleBot
 from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
-from config import TELEGRAM_TOKEN, ADMIN_ID
+from config import TELEGRAM_TOKEN, ADMIN_ID, LIST_PAGE_SIZE, LIST_CACHE_SIZE
 from database import (
-    get_all_series, update_series, add_series, remove_series,
+    get_all_series, add_series, remove_series,
     get_all_users, add_user, remove_user, make_admin, series_exists,
-    is_user_allowed, has_admins
+    is_user_allowed, has_admins, get_series_page, get_series_version, get_existing_topic_ids
 )
-from rutracker_client import RutrackerClient
-from qbittorrent_client import QBittorrentClient
+from clients import LazyClient, get_rutracker, get_qbittorrent, is_rutracker_available, is_qbittorrent_available
+from checker import force_check_all, readd_all_series, import_series, check_series, apply_checked_updates, leased_series
+from jobs import JobManager
+from telegram_sender import TelegramSender
+from metrics import timed, HANDLER_SECONDS, HANDLER_ERRORS
+from tracing import traced, format_stage_breakdown
 from functools import wraps
 
 logger = logging.getLogger(__name__)
+# Наибольший размер текстового файла со ссылками для /import
+IMPORT_MAX_FILE_SIZE = 1024 * 1024
 bot = TeleBot(TELEGRAM_TOKEN)
-rutracker = RutrackerClient()
-qbittorrent = QBittorrentClient()
-
-# Проверки доступности клиентов
-def is_rutracker_available():
-    try:
-        return rutracker and getattr(rutracker, "is_logged_in", False)
-    except Exception:
-        return False
-
-def is_qbittorrent_available():
-    try:
-        return qbittorrent and getattr(qbittorrent, "client", None) is not None
-    except Exception:
-        return False
+# Клиенты берутся из общего реестра и создаются при первом обращении
+rutracker = LazyClient("rutracker")
+qbittorrent = LazyClient("qbittorrent")
+sender = TelegramSender(bot)
+jobs = JobManager(sender)
+
+def describe_client(name, client, available):
+    """Строка /status: доступность, состояние предохранителя и задержка последних запросов."""
+    if client is None:
+        return f"{name}: Ошибка (клиент не инициализирован)"
+    return f"{name}: {'Успешно' if available else 'Ошибка'} — {client.breaker.describe()}"
 
 # Словарь для хранения состояний пользователей
 user_states = {}
@@ -40,16 +45,24 @@ class State:
     WAITING_FOR_ADMIN_ID = 3
     WAITING_FOR_USER_ID_TO_DELETE = 4
     WAITING_FOR_SERIES_ID = 5
+    WAITING_FOR_IMPORT = 6
+
+# Длительность обработчиков учитывается в метриках и трассировке; ошибкой считается только исключение
+def handler_timed(func):
+    func = traced(f"handler:{func.__name__}")(func)
+    return timed(HANDLER_SECONDS, HANDLER_ERRORS, failed=lambda result: False)(func)
 
 # Декоратор для проверки доступа пользователя
 def user_access_required(func):
+    func = handler_timed(func)
+
     @wraps(func)
     def wrapper(message, *args, **kwargs):
         user_id = message.from_user.id
         if user_id == ADMIN_ID:
             if not has_admins():
                 add_user(ADMIN_ID, message.from_user.username or str(ADMIN_ID), is_admin=True)
-                bot.send_message(
+                sender.send_message(
                     message.chat.id,
                     "Вы добавлены как главный администратор."
                 )
@@ -57,7 +70,7 @@ def user_access_required(func):
         if is_user_allowed(user_id):
             return func(message, *args, **kwargs)
         else:
-            bot.send_message(
+            sender.send_message(
                 message.chat.id,
                 "У вас нет доступа к этому боту. Обратитесь к администратору для получения доступа."
             )
@@ -67,6 +80,8 @@ def user_access_required(func):
 
 # Декоратор для проверки прав администратора
 def admin_required(func):
+    func = handler_timed(func)
+
     @wraps(func)
     def wrapper(message, *args, **kwargs):
         user_id = message.from_user.id
@@ -75,7 +90,7 @@ def admin_required(func):
         if is_user_allowed(user_id, admin_required=True):
             return func(message, *args, **kwargs)
         else:
-            bot.send_message(
+            sender.send_message(
                 message.chat.id,
                 "У вас нет прав администратора для выполнения этой команды."
             )
@@ -86,12 +101,13 @@ def admin_required(func):
 @bot.message_handler(commands=['start', 'help'])
 @user_access_required
 def handle_start_help(message):
-    bot.send_message(
+    sender.send_message(
         message.chat.id,
         "Привет! Я бот для отслеживания обновлений сериалов на RuTracker.\n"
         "Доступные команды:\n"
         "/list - Показать список отслеживаемых сериалов\n"
         "/add - Добавить сериал для отслеживания\n"
+        "/import - Добавить сериалы списком ссылок или текстовым файлом\n"
         "/del - Удалить сериал\n"
         "/status - Проверить статус подключения\n"
         "/force_chk - Принудительная проверка обновлений\n"
@@ -100,76 +116,141 @@ def handle_start_help(message):
         "/users - Просмотр списка пользователей\n"
         "/adduser - Добавить пользователя\n"
         "/deluser - Удалить пользователя\n"
-        "/addadmin - Сделать пользователя администратором"
+        "/addadmin - Сделать пользователя администратором\n"
+        "/trace [минуты] - Время по этапам проверки и обработчикам"
     )
     user_states[message.from_user.id] = State.IDLE
 
 @bot.message_handler(func=lambda message: message.text and
                      (message.text.startswith('http://') or message.text.startswith('https://')) and
-                     'rutracker.org' in message.text.lower())
+                     'rutracker.org' in message.text.lower() and
+                     user_states.get(message.from_user.id) != State.WAITING_FOR_IMPORT)
 @user_access_required
 def handle_all_links(message):
     if not is_rutracker_available():
-        bot.send_message(message.chat.id, "RuTracker временно недоступен.")
+        sender.send_message(message.chat.id, "RuTracker временно недоступен.")
         return
     if not is_qbittorrent_available():
-        bot.send_message(message.chat.id, "qBittorrent временно недоступен.")
+        sender.send_message(message.chat.id, "qBittorrent временно недоступен.")
         return
     url = message.text.strip()
     user_id = message.from_user.id
     topic_id = rutracker.get_topic_id(url)
     if not topic_id:
-        bot.send_message(
+        sender.send_message(
             message.chat.id,
             "Это не похоже на ссылку на раздачу RuTracker. Пожалуйста, проверьте URL."
         )
         return
     if series_exists(url):
-        bot.send_message(message.chat.id, "Этот сериал уже отслеживается.")
+        sender.send_message(message.chat.id, "Этот сериал уже отслеживается.")
         return
     page_info = rutracker.get_page_info(url)
     if not page_info:
-        bot.send_message(message.chat.id, "Не удалось получить информацию о странице. Проверьте ссылку.")
+        sender.send_message(message.chat.id, "Не удалось получить информацию о странице. Проверьте ссылку.")
         return
     series_id = add_series(url, page_info["title"], page_info["time_text"], user_id)
     if series_id:
-        bot.send_message(message.chat.id, f"Сериал \"{page_info['title']}\" добавлен для отслеживания.")
+        sender.send_message(message.chat.id, f"Сериал \"{page_info['title']}\" добавлен для отслеживания.")
         tag = f"id_{series_id}"
         torrent_data = rutracker.download_torrent(page_info["topic_id"])
         if torrent_data and qbittorrent.add_torrent(torrent_data, page_info["title"], tags=tag):
-            bot.send_message(message.chat.id, "Торрент успешно добавлен в qBittorrent.")
+            sender.send_message(message.chat.id, "Торрент успешно добавлен в qBittorrent.")
         else:
-            bot.send_message(message.chat.id, "Не удалось добавить торрент в qBittorrent.")
+            sender.send_message(message.chat.id, "Не удалось добавить торрент в qBittorrent.")
     else:
-        bot.send_message(message.chat.id, "Не удалось добавить сериал в базу данных.")
-
-@bot.message_handler(commands=['list'])
-@user_access_required
-def handle_list(message):
-    series_list = get_all_series()
+        sender.send_message(message.chat.id, "Не удалось добавить сериал в базу данных.")
+
+# Кеш отрисованных страниц /list (LRU); ключ включает версию списка сериалов из базы данных,
+# поэтому после добавления, изменения или удаления сериала (в том числе другим процессом)
+# страницы отрисовываются заново
+_list_cache = OrderedDict()
+_list_cache_lock = threading.Lock()
+
+def render_series_page(after_id=None, before_id=None):
+    """
+    Отрисовать страницу списка сериалов.
+
+    Returns:
+        tuple: (текст, клавиатура) или None, если сериалов нет
+    """
+    version = get_series_version()
+    # Если версию прочитать не удалось, кеш не используется
+    key = (version, after_id, before_id) if version is not None else None
+    with _list_cache_lock:
+        if key in _list_cache:
+            _list_cache.move_to_end(key)
+            return _list_cache[key]
+    series_list, has_prev, has_next = get_series_page(after_id, before_id, LIST_PAGE_SIZE)
+    if not series_list and before_id is None and after_id is not None:
+        # Страница опустела после удаления — показать последнюю
+        series_list, has_prev, has_next = get_series_page(before_id=after_id + 1, limit=LIST_PAGE_SIZE)
     if not series_list:
-        bot.send_message(message.chat.id, "Нет отслеживаемых сериалов.")
-        return
+        return None
     markup = InlineKeyboardMarkup()
     for series in series_list:
         series_id, url, title, last_updated, added_by, added_at = series
         button_text = f"{title} (Обновлено: {last_updated})"
         markup.add(InlineKeyboardButton(button_text, callback_data=f"series_{series_id}"))
-    bot.send_message(message.chat.id, "Список отслеживаемых сериалов:", reply_markup=markup)
+    navigation = []
+    if has_prev:
+        navigation.append(InlineKeyboardButton("⬅️", callback_data=f"list_before_{series_list[0][0]}"))
+    if has_next:
+        navigation.append(InlineKeyboardButton("➡️", callback_data=f"list_after_{series_list[-1][0]}"))
+    if navigation:
+        markup.row(*navigation)
+    page = ("Список отслеживаемых сериалов:", markup)
+    if key is None:
+        return page
+    with _list_cache_lock:
+        _list_cache[key] = page
+        _list_cache.move_to_end(key)
+        while len(_list_cache) > LIST_CACHE_SIZE:
+            _list_cache.popitem(last=False)
+    return page
+
+@bot.message_handler(commands=['list'])
+@user_access_required
+def handle_list(message):
+    page = render_series_page()
+    if not page:
+        sender.send_message(message.chat.id, "Нет отслеживаемых сериалов.")
+        return
+    text, markup = page
+    sender.send_message(message.chat.id, text, reply_markup=markup)
 
 @bot.message_handler(commands=['add'])
 @user_access_required
 def handle_add(message):
     if not is_rutracker_available():
-        bot.send_message(message.chat.id, "RuTracker временно недоступен.")
+        sender.send_message(message.chat.id, "RuTracker временно недоступен.")
         return
-    bot.send_message(message.chat.id, "Отправьте ссылку на раздачу для добавления.")
+    sender.send_message(message.chat.id, "Отправьте ссылку на раздачу для добавления.")
     user_states[message.from_user.id] = State.WAITING_FOR_URL
 
+@bot.message_handler(commands=['import'])
+@user_access_required
+def handle_import(message):
+    if not is_rutracker_available():
+        sender.send_message(message.chat.id, "RuTracker временно недоступен.")
+        return
+    if not is_qbittorrent_available():
+        sender.send_message(message.chat.id, "qBittorrent временно недоступен.")
+        return
+    parts = message.text.split(maxsplit=1)
+    if len(parts) > 1:
+        start_import(message, parts[1])
+        return
+    sender.send_message(
+        message.chat.id,
+        "Отправьте ссылки на раздачи (по одной в строке) сообщением или текстовым файлом."
+    )
+    user_states[message.from_user.id] = State.WAITING_FOR_IMPORT
+
 @bot.message_handler(commands=['del'])
 @user_access_required
 def handle_del(message):
-    bot.send_message(message.chat.id, "Отправьте ID сериала для удаления.")
+    sender.send_message(message.chat.id, "Отправьте ID сериала для удаления.")
     user_states[message.from_user.id] = State.WAITING_FOR_SERIES_ID
 
 @bot.message_handler(commands=['status'])
@@ -177,121 +258,192 @@ def handle_del(message):
 def handle_status(message):
     status_message = (
         f"Статус подключения:\n"
-        f"RuTracker: {'Успешно' if is_rutracker_available() else 'Ошибка'}\n"
-        f"qBittorrent: {'Успешно' if is_qbittorrent_available() else 'Ошибка'}"
+        f"{describe_client('RuTracker', get_rutracker(), is_rutracker_available())}\n"
+        f"{describe_client('qBittorrent', get_qbittorrent(), is_qbittorrent_available())}"
     )
-    bot.send_message(message.chat.id, status_message)
+    sender.send_message(message.chat.id, status_message)
 
 @bot.message_handler(commands=['force_del'])
 @admin_required
 def handle_force_del(message):
     if not is_qbittorrent_available():
-        bot.send_message(message.chat.id, "qBittorrent временно недоступен.")
+        sender.send_message(message.chat.id, "qBittorrent временно недоступен.")
         return
-    bot.send_message(message.chat.id, "Удаление всех торрентов из категории 'from telegram'...")
+    sender.send_message(message.chat.id, "Удаление всех торрентов из категории 'from telegram'...")
     if qbittorrent.clear_category():
-        bot.send_message(message.chat.id, "Все торренты успешно удалены из qBittorrent.")
+        sender.send_message(message.chat.id, "Все торренты успешно удалены из qBittorrent.")
     else:
-        bot.send_message(message.chat.id, "Не удалось удалить торренты из qBittorrent.")
+        sender.send_message(message.chat.id, "Не удалось удалить торренты из qBittorrent.")
+
+def format_titles(titles, limit=20):
+    """Список названий для итогового сообщения, не длиннее limit строк."""
+    lines = [f"- {title}" for title in titles[:limit]]
+    if len(titles) > limit:
+        lines.append(f"...и еще {len(titles) - limit}")
+    return "\n".join(lines)
+
+def submit_job(message, kind, title, total, func):
+    """Запустить фоновую задачу func(progress) с сообщением о прогрессе."""
+    job_id = jobs.submit(kind, title, message.chat.id, message.from_user.id, total, func)
+    if job_id == 0:
+        sender.send_message(message.chat.id, "Эта задача уже выполняется, дождитесь ее завершения.")
+    elif job_id is None:
+        sender.send_message(message.chat.id, "Не удалось запустить задачу.")
+
+def submit_series_job(message, kind, title, func):
+    """Запустить полный проход по сериалам фоновой задачей с сообщением о прогрессе."""
+    series_list = get_all_series()
+    if not series_list:
+        sender.send_message(message.chat.id, "Нет отслеживаемых сериалов.")
+        return
+    submit_job(message, kind, title, len(series_list), lambda progress: func(series_list, progress))
+
+def all_2qbit_job(series_list, progress):
+    success_count, failed, busy = readd_all_series(series_list, rutracker, qbittorrent, progress.advance)
+    text = f"Добавление торрентов завершено.\nУспешно: {success_count}\nНеудачно: {len(failed)}"
+    if failed:
+        text += f"\n{format_titles(failed)}"
+    if busy:
+        text += f"\nПропущены, так как сейчас проверяются:\n{format_titles(busy)}"
+    return text
+
+def force_chk_job(series_list, progress):
+    updated, failed, busy = force_check_all(series_list, rutracker, qbittorrent, progress.advance)
+    text = f"Проверка завершена.\nОбновлено: {len(updated)}\nОшибок: {len(failed)}"
+    if updated:
+        text += f"\nОбновленные сериалы:\n{format_titles(updated)}"
+    if failed:
+        text += f"\nНе удалось проверить или обновить:\n{format_titles(failed)}"
+    if busy:
+        text += f"\nПропущены, так как сейчас проверяются:\n{format_titles(busy)}"
+    return text
+
+def parse_import_urls(text):
+    """
+    Найти в тексте ссылки на раздачи RuTracker для /import.
+
+    Returns:
+        tuple: (список URL, в котором каждая раздача встречается один раз, число повторов,
+            число ссылок, не похожих на раздачу RuTracker)
+    """
+    urls, topic_ids = [], set()
+    duplicates = invalid = 0
+    for token in text.split():
+        if not token.lower().startswith(('http://', 'https://')):
+            continue
+        topic_id = rutracker.get_topic_id(token) if 'rutracker.org' in token.lower() else None
+        if not topic_id:
+            invalid += 1
+        elif topic_id in topic_ids:
+            duplicates += 1
+        else:
+            topic_ids.add(topic_id)
+            urls.append(token)
+    return urls, duplicates, invalid
+
+def format_import_skipped(skipped):
+    return (
+        f"Уже отслеживаются: {skipped['existing']}\n"
+        f"Повторы в списке: {skipped['duplicates']}\n"
+        f"Не ссылки на раздачи: {skipped['invalid']}"
+    )
+
+def start_import(message, text):
+    """Отобрать из текста новые ссылки одним запросом к базе и запустить их добавление фоновой задачей."""
+    urls, duplicates, invalid = parse_import_urls(text)
+    if not urls:
+        sender.send_message(message.chat.id, "Не найдено ни одной ссылки на раздачу RuTracker.")
+        return
+    topic_ids = {url: rutracker.get_topic_id(url) for url in urls}
+    existing = get_existing_topic_ids(topic_ids.values())
+    new_urls = [url for url in urls if topic_ids[url] not in existing]
+    skipped = {"existing": len(existing), "duplicates": duplicates, "invalid": invalid}
+    if not new_urls:
+        sender.send_message(message.chat.id, f"Новых сериалов нет.\n{format_import_skipped(skipped)}")
+        return
+    submit_job(
+        message, "import", "Импорт сериалов", len(new_urls),
+        lambda progress: import_job(new_urls, message.from_user.id, skipped, progress)
+    )
+
+def import_job(urls, user_id, skipped, progress):
+    result = import_series(urls, rutracker, qbittorrent, user_id, progress.advance)
+    if result is None:
+        return "Импорт не выполнен: не удалось записать сериалы в базу данных."
+    skipped = {**skipped, "existing": skipped["existing"] + result["existing"]}
+    text = (
+        f"Импорт завершен.\nДобавлено: {len(result['added'])}\n"
+        f"Не удалось загрузить: {len(result['failed'])}\n{format_import_skipped(skipped)}"
+    )
+    if result["added"]:
+        text += f"\nДобавленные сериалы:\n{format_titles(result['added'])}"
+    if result["no_torrent"]:
+        text += f"\nНе удалось добавить торрент в qBittorrent:\n{format_titles(result['no_torrent'])}"
+    if result["failed"]:
+        text += f"\nНе удалось загрузить страницу:\n{format_titles(result['failed'])}"
+    return text
 
 @bot.message_handler(commands=['all_2qbit'])
 @admin_required
 def handle_all_2qbit(message):
     if not is_rutracker_available():
-        bot.send_message(message.chat.id, "RuTracker временно недоступен.")
+        sender.send_message(message.chat.id, "RuTracker временно недоступен.")
         return
     if not is_qbittorrent_available():
-        bot.send_message(message.chat.id, "qBittorrent временно недоступен.")
-        return
-    bot.send_message(message.chat.id, "Начинаю добавление всех торрентов в qBittorrent...")
-    series_list = get_all_series()
-    if not series_list:
-        bot.send_message(message.chat.id, "Нет торрентов для добавления.")
+        sender.send_message(message.chat.id, "qBittorrent временно недоступен.")
         return
-    success_count = 0
-    fail_count = 0
-    for series in series_list:
-        series_id, url, title, last_updated, added_by, added_at = series
-        page_info = rutracker.get_page_info(url)
-        if not page_info:
-            bot.send_message(message.chat.id, f"Не удалось получить информацию о странице для {title}")
-            fail_count += 1
-            continue
-        tag = f"id_{series_id}"
-        torrent_data = rutracker.download_torrent(page_info["topic_id"])
-        if torrent_data:
-            qbittorrent.delete_torrent_by_tag(tag, delete_files=False)
-            if qbittorrent.add_torrent(torrent_data, title, tags=tag):
-                success_count += 1
-                logger.info(f"Торрент '{title}' успешно добавлен в qBittorrent")
-            else:
-                fail_count += 1
-                logger.error(f"Не удалось добавить торрент '{title}' в qBittorrent")
-        else:
-            fail_count += 1
-            logger.error(f"Не удалось скачать торрент для {title}")
-    bot.send_message(
-        message.chat.id,
-        f"Добавление торрентов завершено.\nУспешно: {success_count}\nНеудачно: {fail_count}"
-    )
+    submit_series_job(message, "all_2qbit", "Добавление всех торрентов в qBittorrent", all_2qbit_job)
 
 @bot.message_handler(commands=['force_chk'])
 @admin_required
 def handle_force_chk(message):
     if not is_rutracker_available():
-        bot.send_message(message.chat.id, "RuTracker временно недоступен.")
+        sender.send_message(message.chat.id, "RuTracker временно недоступен.")
         return
     if not is_qbittorrent_available():
-        bot.send_message(message.chat.id, "qBittorrent временно недоступен.")
-        return
-    bot.send_message(message.chat.id, "Начинаю проверку всех ссылок на обновления...")
-    series_list = get_all_series()
-    if not series_list:
-        bot.send_message(message.chat.id, "Нет отслеживаемых сериалов.")
+        sender.send_message(message.chat.id, "qBittorrent временно недоступен.")
         return
-    for series in series_list:
-        series_id, url, title, last_updated, added_by, added_at = series
-        page_info = rutracker.get_page_info(url)
-        if not page_info:
-            bot.send_message(message.chat.id, f"Не удалось получить информацию о странице: {title}")
-            continue
-        if page_info["time_text"] != last_updated:
-            tag = f"id_{series_id}"
-            qbittorrent.delete_torrent_by_tag(tag, delete_files=False)
-            update_series(series_id, title=page_info["title"], last_updated=page_info["time_text"])
-            torrent_data = rutracker.download_torrent(page_info["topic_id"])
-            if torrent_data and qbittorrent.add_torrent(torrent_data, page_info["title"], tags=tag):
-                bot.send_message(message.chat.id, f"Сериал обновлен: {title}")
-            else:
-                bot.send_message(message.chat.id, f"Не удалось обновить сериал: {title}")
-    bot.send_message(message.chat.id, "Проверка завершена.")
+    submit_series_job(message, "force_chk", "Проверка обновлений", force_chk_job)
+
+@bot.message_handler(commands=['trace'])
+@admin_required
+def handle_trace(message):
+    parts = message.text.split()
+    since = None
+    if len(parts) > 1:
+        try:
+            since = time.time() - float(parts[1]) * 60
+        except ValueError:
+            sender.send_message(message.chat.id, "Использование: /trace [минуты]")
+            return
+    sender.send_message(message.chat.id, format_stage_breakdown(since))
 
 @bot.message_handler(commands=['users'])
 @admin_required
 def handle_users(message):
     users = get_all_users()
     if not users:
-        bot.send_message(message.chat.id, "Нет зарегистрированных пользователей.")
+        sender.send_message(message.chat.id, "Нет зарегистрированных пользователей.")
         return
     user_list = "\n".join([f"{user[0]}: {user[1]} (Admin: {'Да' if user[2] else 'Нет'})" for user in users])
-    bot.send_message(message.chat.id, f"Список пользователей:\n{user_list}")
+    sender.send_message(message.chat.id, f"Список пользователей:\n{user_list}")
 
 @bot.message_handler(commands=['adduser'])
 @admin_required
 def handle_adduser(message):
-    bot.send_message(message.chat.id, "Отправьте ID и имя пользователя для добавления в формате: ID Имя")
+    sender.send_message(message.chat.id, "Отправьте ID и имя пользователя для добавления в формате: ID Имя")
     user_states[message.from_user.id] = State.WAITING_FOR_USER_ID
 
 @bot.message_handler(commands=['deluser'])
 @admin_required
 def handle_deluser(message):
-    bot.send_message(message.chat.id, "Отправьте ID пользователя для удаления.")
+    sender.send_message(message.chat.id, "Отправьте ID пользователя для удаления.")
     user_states[message.from_user.id] = State.WAITING_FOR_USER_ID_TO_DELETE
 
 @bot.message_handler(commands=['addadmin'])
 @admin_required
 def handle_addadmin(message):
-    bot.send_message(message.chat.id, "Отправьте ID пользователя для назначения администратором.")
+    sender.send_message(message.chat.id, "Отправьте ID пользователя для назначения администратором.")
     user_states[message.from_user.id] = State.WAITING_FOR_ADMIN_ID
 
 @bot.callback_query_handler(func=lambda call: call.data.startswith('series_'))
@@ -300,7 +452,7 @@ def handle_series_callback(call):
     series_id = int(call.data.split('_')[1])
     series = get_all_series(series_id=series_id)
     if not series:
-        bot.send_message(call.message.chat.id, "Сериал не найден.")
+        sender.send_message(call.message.chat.id, "Сериал не найден.")
         return
     series_id, url, title, last_updated, added_by, added_at = series
     markup = InlineKeyboardMarkup()
@@ -309,7 +461,7 @@ def handle_series_callback(call):
     markup.add(InlineKeyboardButton("🗑️ Удалить", callback_data=f"delete_{series_id}"))
     markup.add(InlineKeyboardButton("🔗 Ссылка", url=url))
     markup.add(InlineKeyboardButton("⬅️ Назад", callback_data="back_to_list"))
-    bot.edit_message_text(
+    sender.edit_message_text(
         f"Сериал: {title}\nПоследнее обновление: {last_updated}",
         chat_id=call.message.chat.id,
         message_id=call.message.message_id,
@@ -319,12 +471,12 @@ def handle_series_callback(call):
 @user_access_required
 def handle_untrack_callback(call):
     if not is_qbittorrent_available():
-        bot.answer_callback_query(call.id, "qBittorrent временно недоступен.")
+        sender.answer_callback_query(call.id, "qBittorrent временно недоступен.")
         return
     series_id = int(call.data.split('_')[1])
     series = get_all_series(series_id=series_id)
     if not series:
-        bot.answer_callback_query(call.id, "Сериал не найден.")
+        sender.answer_callback_query(call.id, "Сериал не найден.")
         return
     _, url, title, last_updated, _, _ = series
     tag = f"id_{series_id}"
@@ -335,15 +487,15 @@ def handle_untrack_callback(call):
     # 2. Скачиваем .torrent-файл
     page_info = rutracker.get_page_info(url)
     if not page_info:
-        bot.answer_callback_query(call.id, "Не удалось получить информацию о странице.")
+        sender.answer_callback_query(call.id, "Не удалось получить информацию о странице.")
         return
     torrent_data = rutracker.download_torrent(page_info["topic_id"])
     if torrent_data:
         # 3. Добавляем торрент без тегов и категории
         qbittorrent.add_torrent(torrent_data, title=page_info["title"], tags="")
-        bot.answer_callback_query(call.id, "Сериал больше не отслеживается. Раздача осталась в qBittorrent без метки.")
+        sender.answer_callback_query(call.id, "Сериал больше не отслеживается. Раздача осталась в qBittorrent без метки.")
     else:
-        bot.answer_callback_query(call.id, "Не удалось повторно добавить торрент в qBittorrent.")
+        sender.answer_callback_query(call.id, "Не удалось повторно добавить торрент в qBittorrent.")
 
     # 4. Удаляем сериал из базы
     remove_series(series_id)
@@ -352,68 +504,71 @@ def handle_untrack_callback(call):
 @user_access_required
 def handle_update_callback(call):
     if not is_rutracker_available():
-        bot.answer_callback_query(call.id, "RuTracker временно недоступен.")
+        sender.answer_callback_query(call.id, "RuTracker временно недоступен.")
         return
     if not is_qbittorrent_available():
-        bot.answer_callback_query(call.id, "qBittorrent временно недоступен.")
+        sender.answer_callback_query(call.id, "qBittorrent временно недоступен.")
         return
     series_id = int(call.data.split('_')[1])
     series = get_all_series(series_id=series_id)
     if not series:
-        bot.answer_callback_query(call.id, "Сериал не найден.")
-        return
-    _, url, title, last_updated, _, _ = series
-    page_info = rutracker.get_page_info(url)
-    if not page_info:
-        bot.answer_callback_query(call.id, "Не удалось получить информацию о странице.")
+        sender.answer_callback_query(call.id, "Сериал не найден.")
         return
-    if page_info["time_text"] != last_updated:
-        tag = f"id_{series_id}"
-        qbittorrent.delete_torrent_by_tag(tag, delete_files=False)
-        update_series(series_id, title=page_info["title"], last_updated=page_info["time_text"])
-        torrent_data = rutracker.download_torrent(page_info["topic_id"])
-        if torrent_data and qbittorrent.add_torrent(torrent_data, page_info["title"], tags=tag):
-            bot.answer_callback_query(call.id, "Сериал обновлен и торрент добавлен в qBittorrent.")
-        else:
-            bot.answer_callback_query(call.id, "Сериал обновлен, но не удалось добавить торрент.")
+    # Тот же путь, что у фоновой проверки: обновление сохраняется только после замены торрента,
+    # чтобы при ошибке его нашла следующая проверка
+    with leased_series([series], "update") as (claimed, busy):
+        if busy:
+            sender.answer_callback_query(call.id, "Сериал сейчас проверяется, попробуйте позже.")
+            return
+        # Пользователь явно запросил обновление: кеш страниц и торрентов не используется
+        result = check_series(series, rutracker, refresh=True)
+        changed = apply_checked_updates(qbittorrent, [(series, result)])[series_id]
+    if changed:
+        sender.answer_callback_query(call.id, "Сериал обновлен и торрент добавлен в qBittorrent.")
+    elif changed is False:
+        sender.answer_callback_query(call.id, "Обновлений нет.")
+    elif result:
+        sender.answer_callback_query(call.id, "Найдено обновление, но не удалось добавить торрент.")
     else:
-        bot.answer_callback_query(call.id, "Обновлений нет.")
+        sender.answer_callback_query(call.id, "Не удалось проверить сериал.")
 
 @bot.callback_query_handler(func=lambda call: call.data.startswith('delete_'))
 @user_access_required
 def handle_delete_callback(call):
     if not is_qbittorrent_available():
-        bot.answer_callback_query(call.id, "qBittorrent временно недоступен.")
+        sender.answer_callback_query(call.id, "qBittorrent временно недоступен.")
         return
     series_id = int(call.data.split('_')[1])
     if remove_series(series_id):
         tag = f"id_{series_id}"
         if qbittorrent.delete_torrent_by_tag(tag, delete_files=False):
-            bot.answer_callback_query(call.id, "Сериал и соответствующий торрент удалены.")
+            sender.answer_callback_query(call.id, "Сериал и соответствующий торрент удалены.")
         else:
-            bot.answer_callback_query(call.id, "Сериал удален, но соответствующий торрент не найден.")
+            sender.answer_callback_query(call.id, "Сериал удален, но соответствующий торрент не найден.")
         handle_list_callback(call)
     else:
-        bot.answer_callback_query(call.id, "Не удалось удалить сериал.")
+        sender.answer_callback_query(call.id, "Не удалось удалить сериал.")
 
-@bot.callback_query_handler(func=lambda call: call.data == 'back_to_list')
+@bot.callback_query_handler(func=lambda call: call.data == 'back_to_list' or call.data.startswith('list_'))
 @user_access_required
 def handle_list_callback(call):
-    series_list = get_all_series()
-    if not series_list:
-        bot.edit_message_text(
+    # Также вызывается после удаления сериала — тогда показывается первая страница
+    after_id = before_id = None
+    if call.data.startswith('list_after_'):
+        after_id = int(call.data.rsplit('_', 1)[1])
+    elif call.data.startswith('list_before_'):
+        before_id = int(call.data.rsplit('_', 1)[1])
+    page = render_series_page(after_id, before_id)
+    if not page:
+        sender.edit_message_text(
             "Нет отслеживаемых сериалов.",
             chat_id=call.message.chat.id,
             message_id=call.message.message_id
         )
         return
-    markup = InlineKeyboardMarkup()
-    for series in series_list:
-        series_id, url, title, last_updated, added_by, added_at = series
-        button_text = f"{title} (Обновлено: {last_updated})"
-        markup.add(InlineKeyboardButton(button_text, callback_data=f"series_{series_id}"))
-    bot.edit_message_text(
-        "Список отслеживаемых сериалов:",
+    text, markup = page
+    sender.edit_message_text(
+        text,
         chat_id=call.message.chat.id,
         message_id=call.message.message_id,
         reply_markup=markup
@@ -423,45 +578,82 @@ def handle_list_callback(call):
 @user_access_required
 def handle_url(message):
     if not is_rutracker_available():
-        bot.send_message(message.chat.id, "RuTracker временно недоступен.")
+        sender.send_message(message.chat.id, "RuTracker временно недоступен.")
         return
     if not is_qbittorrent_available():
-        bot.send_message(message.chat.id, "qBittorrent временно недоступен.")
+        sender.send_message(message.chat.id, "qBittorrent временно недоступен.")
         return
     url = message.text.strip()
     user_id = message.from_user.id
     user_states[user_id] = State.IDLE
     topic_id = rutracker.get_topic_id(url)
     if not topic_id:
-        bot.send_message(
+        sender.send_message(
             message.chat.id,
             "Это не похоже на ссылку на раздачу RuTracker. Пожалуйста, проверьте URL."
         )
         return
     if series_exists(url):
-        bot.send_message(message.chat.id, "Этот сериал уже отслеживается.")
+        sender.send_message(message.chat.id, "Этот сериал уже отслеживается.")
         return
     page_info = rutracker.get_page_info(url)
     if not page_info:
-        bot.send_message(message.chat.id, "Не удалось получить информацию о странице. Проверьте ссылку.")
+        sender.send_message(message.chat.id, "Не удалось получить информацию о странице. Проверьте ссылку.")
         return
     series_id = add_series(url, page_info["title"], page_info["time_text"], user_id)
     if series_id:
-        bot.send_message(message.chat.id, f"Сериал \"{page_info['title']}\" добавлен для отслеживания.")
+        sender.send_message(message.chat.id, f"Сериал \"{page_info['title']}\" добавлен для отслеживания.")
         tag = f"id_{series_id}"
         torrent_data = rutracker.download_torrent(page_info["topic_id"])
         if torrent_data and qbittorrent.add_torrent(torrent_data, page_info["title"], tags=tag):
-            bot.send_message(message.chat.id, "Торрент успешно добавлен в qBittorrent.")
+            sender.send_message(message.chat.id, "Торрент успешно добавлен в qBittorrent.")
         else:
-            bot.send_message(message.chat.id, "Не удалось добавить торрент в qBittorrent.")
+            sender.send_message(message.chat.id, "Не удалось добавить торрент в qBittorrent.")
     else:
-        bot.send_message(message.chat.id, "Не удалось добавить сериал в базу данных.")
+        sender.send_message(message.chat.id, "Не удалось добавить сериал в базу данных.")
+
+@bot.message_handler(func=lambda message: message.from_user.id in user_states and user_states[message.from_user.id] == State.WAITING_FOR_IMPORT)
+@user_access_required
+def process_import_text(message):
+    user_states[message.from_user.id] = State.IDLE
+    if not is_rutracker_available():
+        sender.send_message(message.chat.id, "RuTracker временно недоступен.")
+        return
+    if not is_qbittorrent_available():
+        sender.send_message(message.chat.id, "qBittorrent временно недоступен.")
+        return
+    start_import(message, message.text)
+
+# Файл со ссылками принимается после /import или с подписью /import
+@bot.message_handler(content_types=['document'],
+                     func=lambda message: user_states.get(message.from_user.id) == State.WAITING_FOR_IMPORT or
+                     (message.caption or '').startswith('/import'))
+@user_access_required
+def process_import_file(message):
+    user_states[message.from_user.id] = State.IDLE
+    if not is_rutracker_available():
+        sender.send_message(message.chat.id, "RuTracker временно недоступен.")
+        return
+    if not is_qbittorrent_available():
+        sender.send_message(message.chat.id, "qBittorrent временно недоступен.")
+        return
+    if (message.document.file_size or 0) > IMPORT_MAX_FILE_SIZE:
+        sender.send_message(message.chat.id, "Файл слишком большой для импорта.")
+        return
+    try:
+        file_info = sender.call(message.chat.id, bot.get_file, message.document.file_id)
+        data = sender.call(message.chat.id, bot.download_file, file_info.file_path)
+    except Exception as e:
+        logger.error(f"Не удалось скачать файл для импорта: {e}")
+        sender.send_message(message.chat.id, "Не удалось скачать файл.")
+        return
+    start_import(message, data.decode("utf-8", errors="replace"))
 
 @bot.message_handler(func=lambda message: message.from_user.id in user_states and user_states[message.from_user.id] == State.WAITING_FOR_SERIES_ID)
 @user_access_required
 def process_series_id_to_delete(message):
     if not is_qbittorrent_available():
-        bot.send_message(message.chat.id, "qBittorrent временно недоступен.")
+        sender.send_message(message.chat.id, "qBittorrent временно недоступен.")
         return
     try:
         series_id = int(message.text.strip())
@@ -469,13 +661,13 @@ def process_series_id_to_delete(message):
         if remove_series(series_id):
             tag = f"id_{series_id}"
             if qbittorrent.delete_torrent_by_tag(tag, delete_files=False):
-                bot.send_message(message.chat.id, "Сериал и соответствующий торрент удалены.")
+                sender.send_message(message.chat.id, "Сериал и соответствующий торрент удалены.")
             else:
-                bot.send_message(message.chat.id, "Сериал удален, но соответствующий торрент не найден.")
+                sender.send_message(message.chat.id, "Сериал удален, но соответствующий торрент не найден.")
         else:
-            bot.send_message(message.chat.id, "Не удалось удалить сериал. Проверьте ID.")
+            sender.send_message(message.chat.id, "Не удалось удалить сериал. Проверьте ID.")
     except ValueError:
-        bot.send_message(message.chat.id, "ID должен быть числом.")
+        sender.send_message(message.chat.id, "ID должен быть числом.")
 
 @bot.message_handler(func=lambda message: message.from_user.id in user_states and user_states[message.from_user.id] == State.WAITING_FOR_USER_ID)
 @admin_required
@@ -483,17 +675,17 @@ def process_user_id(message):
     try:
         parts = message.text.split(' ', 1)
         if len(parts) != 2:
-            bot.send_message(message.chat.id, "Неверный формат. Используйте: ID Имя")
+            sender.send_message(message.chat.id, "Неверный формат. Используйте: ID Имя")
             return
         user_id = int(parts[0])
         username = parts[1]
         user_states[message.from_user.id] = State.IDLE
         if add_user(user_id, username):
-            bot.send_message(message.chat.id, f"Пользователь {username} (ID: {user_id}) добавлен.")
+            sender.send_message(message.chat.id, f"Пользователь {username} (ID: {user_id}) добавлен.")
         else:
-            bot.send_message(message.chat.id, "Не удалось добавить пользователя.")
+            sender.send_message(message.chat.id, "Не удалось добавить пользователя.")
     except ValueError:
-        bot.send_message(message.chat.id, "ID должен быть числом.")
+        sender.send_message(message.chat.id, "ID должен быть числом.")
 
 @bot.message_handler(func=lambda message: message.from_user.id in user_states and user_states[message.from_user.id] == State.WAITING_FOR_USER_ID_TO_DELETE)
 @admin_required
@@ -502,11 +694,11 @@ def process_user_id_to_delete(message):
         user_id = int(message.text.strip())
         user_states[message.from_user.id] = State.IDLE
         if remove_user(user_id):
-            bot.send_message(message.chat.id, f"Пользователь с ID {user_id} удален.")
+            sender.send_message(message.chat.id, f"Пользователь с ID {user_id} удален.")
         else:
-            bot.send_message(message.chat.id, "Не удалось удалить пользователя. Проверьте ID.")
+            sender.send_message(message.chat.id, "Не удалось удалить пользователя. Проверьте ID.")
     except ValueError:
-        bot.send_message(message.chat.id, "ID должен быть числом.")
+        sender.send_message(message.chat.id, "ID должен быть числом.")
 
 @bot.message_handler(func=lambda message: message.from_user.id in user_states and user_states[message.from_user.id] == State.WAITING_FOR_ADMIN_ID)
 @admin_required
@@ -515,13 +707,13 @@ def process_admin_id(message):
         user_id = int(message.text.strip())
         user_states[message.from_user.id] = State.IDLE
         if make_admin(user_id):
-            bot.send_message(message.chat.id, f"Пользователь с ID {user_id} назначен администратором.")
+            sender.send_message(message.chat.id, f"Пользователь с ID {user_id} назначен администратором.")
         else:
-            bot.send_message(message.chat.id, "Не удалось назначить администратора. Проверьте ID.")
+            sender.send_message(message.chat.id, "Не удалось назначить администратора. Проверьте ID.")
     except ValueError:
-        bot.send_message(message.chat.id, "ID должен быть числом.")
+        sender.send_message(message.chat.id, "ID должен быть числом.")
 
 @bot.message_handler(func=lambda message: True)
 def handle_unknown(message):
     if message.from_user.id == ADMIN_ID or is_user_allowed(message.from_user.id):
-        bot.send_message(message.chat.id, "Неизвестная команда. Используйте /help для получения списка команд.")
+        sender.send_message(message.chat.id, "Неизвестная команда. Используйте /help для получения списка команд.")
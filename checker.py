@@ -0,0 +1,412 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from database import (
+    update_series, add_series_bulk, get_series_by_ids, get_series_fingerprints, update_series_fingerprint,
+    get_series_topic_data, update_series_topic_data
+)
+from scheduler import CheckScheduler
+from torrent_utils import parse_torrent
+from tracing import span, profile_call, profile_once
+from metrics import timed, CHECK_CYCLE_SECONDS, SERIES_CHECKED
+from config import CHECK_WORKERS, CHECKER_ID
+
+logger = logging.getLogger(__name__)
+
+def check_series(series, rutracker, fingerprint=None, topic_data=None, force=False, refresh=False):
+    """
+    Проверка обновления одного сериала.
+
+    Args:
+        fingerprint: сохраненный отпечаток страницы для условного запроса
+        topic_data: актуальные данные API о раздаче, сохраняются после проверки
+        force: раздача изменилась по данным API, торрент нужно обновить в любом случае
+        refresh: не использовать кеш страниц и торрентов (принудительная проверка пользователем)
+
+    Returns:
+        tuple: ((тег, торрент-файл, название) для замены в qBittorrent, page_info), если найдено обновление;
+            False, если изменений нет; None, если проверить сериал не удалось.
+            Данные обновления сохраняет save_series_update только после замены торрента: иначе
+            при ошибке следующая проверка сочла бы раздачу неизменившейся и обновление потерялось бы
+    """
+    series_id, url, title, last_updated, added_by, added_at = series
+    logger.info(f"Проверка сериала: {title}, последнее обновление: {last_updated}")
+
+    # Если раздача изменилась по данным API, страница в кеше может быть устаревшей
+    page_info = rutracker.get_page_info(url, fingerprint=None if force else fingerprint, force=force or refresh)
+    if not page_info:
+        logger.error(f"Не удалось получить информацию о странице {url}")
+        return None
+    if not has_update(series, page_info, force):
+        return finish_unchanged(series, page_info, topic_data)
+    torrent_data = rutracker.download_torrent(page_info["topic_id"], force=force or refresh)
+    return finish_update(series, page_info, torrent_data)
+
+def has_update(series, page_info, force=False):
+    """Нужно ли скачать торрент сериала по загруженной странице."""
+    if force or (not page_info["unchanged"] and page_info["time_text"] != series[3]):
+        logger.info(f"Обнаружено обновление для {series[2]}")
+        return True
+    return False
+
+def finish_unchanged(series, page_info, topic_data=None):
+    """Итог проверки без обновления: сохранить состояние страницы; результат check_series."""
+    if page_info["unchanged"]:
+        logger.info(f"Страница {series[2]} не изменилась")
+    save_series_state(series[0], page_info, topic_data)
+    return False
+
+def finish_update(series, page_info, torrent_data):
+    """Итог проверки с обновлением; результат check_series (None, если торрент не скачан)."""
+    if not torrent_data:
+        logger.error(f"Не удалось скачать торрент для {series[2]}")
+        return None
+    return (f"id_{series[0]}", torrent_data, page_info["title"]), page_info
+
+def save_series_state(series_id, page_info, topic_data=None):
+    """Сохранить данные API о раздаче и отпечаток страницы (если страница загружалась заново)."""
+    with span("db_write"):
+        if topic_data:
+            update_series_topic_data(series_id, topic_data["info_hash"], topic_data["reg_time"])
+        if not page_info["unchanged"]:
+            update_series_fingerprint(
+                series_id,
+                etag=page_info["etag"],
+                last_modified=page_info["last_modified"],
+                fingerprint=page_info["fingerprint"],
+            )
+
+def save_series_update(series_id, page_info, topic_data=None):
+    """Сохранить обновление сериала после успешной замены торрента в qBittorrent."""
+    save_series_state(series_id, page_info, topic_data)
+    with span("db_write"):
+        update_series(series_id, title=page_info["title"], last_updated=page_info["time_text"])
+
+def apply_checked_updates(qbittorrent, checked, topic_data=None):
+    """
+    Заменить торренты обновившихся сериалов и сохранить обновления, торрент которых заменен.
+
+    Args:
+        checked: пары (series, результат check_series)
+        topic_data: {id сериала: данные API о раздаче} для сохранения вместе с обновлением
+
+    Returns:
+        dict: {id сериала: True (обновлен) / False (без изменений) / None (ошибка проверки или замены)}
+    """
+    results = {}
+    updates = []
+    pending = {}
+    for series, result in checked:
+        if result:
+            update, page_info = result
+            updates.append(update)
+            pending[update[0]] = (series[0], page_info)
+        else:
+            results[series[0]] = result
+    decisions = apply_torrent_updates(qbittorrent, updates)
+    for tag, (series_id, page_info) in pending.items():
+        if decisions.get(tag):
+            save_series_update(series_id, page_info, (topic_data or {}).get(series_id))
+            results[series_id] = True
+        else:
+            results[series_id] = None
+    return results
+
+def apply_torrent_updates(qbittorrent, updates):
+    """
+    Заменить торренты обновившихся сериалов в qBittorrent пакетно.
+
+    Returns:
+        dict: {тег: решение (DECISION_*) или None при ошибке}
+    """
+    if not updates:
+        return {}
+    decisions = qbittorrent.replace_torrents(updates)
+    for tag, _, title in updates:
+        if decisions.get(tag):
+            logger.info(f"Торрент для {title} обновлен в qBittorrent ({decisions[tag]})")
+        else:
+            logger.error(f"Не удалось добавить торрент для {title}")
+    return decisions
+
+def select_series_to_check(series_list, rutracker, rutracker_api):
+    """
+    Отобрать сериалы, раздачи которых изменились по данным API RuTracker.
+
+    Returns:
+        tuple: (список кортежей (series, topic_data, force) для сериалов, страницы которых нужно загрузить,
+            список ID сериалов без изменений). Если API недоступно или раздача еще не сопоставлена,
+            сериал проверяется по странице.
+    """
+    topic_ids = {series[0]: rutracker.get_topic_id(series[1]) for series in series_list}
+    remote = rutracker_api.get_topics_data(topic_ids.values()) if rutracker_api else {}
+    with span("db_read"):
+        stored = get_series_topic_data(series[0] for series in series_list)
+
+    selected = []
+    unchanged = []
+    for series in series_list:
+        topic_data = remote.get(topic_ids[series[0]])
+        stored_hash = stored.get(series[0], {}).get("info_hash")
+        if topic_data is None or not topic_data["info_hash"] or not stored_hash:
+            selected.append((series, topic_data, False))
+        elif topic_data["info_hash"] != stored_hash:
+            selected.append((series, topic_data, True))
+        else:
+            unchanged.append(series[0])
+    logger.info(f"Изменившихся или непроверенных раздач: {len(selected)} из {len(series_list)}")
+    return selected, unchanged
+
+def map_series(func, series_list, on_done=None, describe=lambda series: series[2]):
+    """
+    Выполнить func(series) для каждого сериала в пуле из CHECK_WORKERS потоков.
+
+    Args:
+        on_done: вызывается после каждого сериала с флагом успеха (результат не None)
+        describe: название элемента списка для сообщения об ошибке
+
+    Returns:
+        list: пары (series, результат); при исключении результат None
+    """
+    results = []
+    with ThreadPoolExecutor(max_workers=CHECK_WORKERS, thread_name_prefix="checker") as executor:
+        futures = {executor.submit(profile_call, func, series): series for series in series_list}
+        for future in as_completed(futures):
+            series = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"Ошибка при обработке сериала {describe(series)}: {e}")
+                result = None
+            results.append((series, result))
+            if on_done:
+                on_done(result is not None)
+    return results
+
+def check_pages(checks, rutracker):
+    """
+    Проверить страницы сериалов в пуле потоков (map_series).
+
+    Args:
+        checks: кортежи (series, fingerprint, topic_data, force) — аргументы check_series
+
+    Returns:
+        list: пары (series, результат check_series)
+    """
+    checked = map_series(
+        lambda check: check_series(check[0], rutracker, *check[1:]), checks, describe=lambda check: check[0][2]
+    )
+    return [(check[0], result) for check, result in checked]
+
+@timed(CHECK_CYCLE_SECONDS)
+def run_check_cycle(series_list, rutracker, qbittorrent, rutracker_api=None, check_pages=check_pages):
+    """
+    Проверить список сериалов и обновить изменившиеся торренты.
+
+    Args:
+        check_pages: функция (checks, rutracker) -> пары (series, результат check_series);
+            asyncio-режим (async_main.py) проверяет страницы в цикле событий
+
+    Returns:
+        dict: {id сериала: True (обновлен) / False (без изменений) / None (ошибка проверки)}
+    """
+    to_check, unchanged = select_series_to_check(series_list, rutracker, rutracker_api)
+    results = {series_id: False for series_id in unchanged}
+    # Частоту запросов ограничивают rate limiter'ы клиентов,
+    # поэтому сериалы проверяются параллельно без фиксированных пауз
+    with span("db_read"):
+        fingerprints = get_series_fingerprints(series[0] for series, _, _ in to_check)
+    checked = check_pages(
+        [(series, fingerprints.get(series[0]), topic_data, force) for series, topic_data, force in to_check],
+        rutracker
+    )
+    results.update(apply_checked_updates(
+        qbittorrent, checked, {series[0]: topic_data for series, topic_data, _ in to_check}
+    ))
+    for changed in results.values():
+        SERIES_CHECKED.inc(result={True: "updated", False: "unchanged"}.get(changed, "error"))
+    return results
+
+def run_due_checks(scheduler, rutracker, qbittorrent, rutracker_api=None, check_pages=check_pages):
+    """
+    Одна итерация фоновой проверки: взять в аренду сериалы, срок проверки которых наступил,
+    проверить и перепланировать их (check_pages — как у run_check_cycle).
+
+    Returns:
+        int: количество проверенных сериалов
+    """
+    scheduler.load()
+    due_ids = scheduler.pop_due()
+    if not due_ids:
+        logger.debug("Нет сериалов для проверки")
+        return 0
+    logger.info(f"Запуск проверки обновлений сериалов: {len(due_ids)}")
+    # Аренда продлевается до конца проверки; reschedule снимает ее с каждого проверенного сериала
+    with scheduler.leased(due_ids):
+        with span("cycle"):
+            with span("db_read"):
+                series_list = get_series_by_ids(due_ids)
+            results = profile_once(run_check_cycle, series_list, rutracker, qbittorrent, rutracker_api, check_pages)
+        for series_id, changed in results.items():
+            scheduler.reschedule(series_id, changed)
+    logger.info("Проверка обновлений завершена")
+    return len(due_ids)
+
+@contextmanager
+def leased_series(series_list, kind, on_done=None):
+    """
+    Взять в аренду сериалы для фоновой задачи, чтобы их одновременно не обрабатывали
+    цикл проверки (свой или другого процесса) и другие задачи.
+
+    Args:
+        kind: тип задачи; задачи разных типов арендуют сериалы под разными владельцами
+        on_done: вызывается с флагом успеха для каждого пропущенного сериала
+
+    Yields:
+        tuple: (арендованные сериалы, названия сериалов, пропущенных из-за чужой аренды)
+    """
+    scheduler = CheckScheduler(owner=f"{CHECKER_ID}/{kind}")
+    claimed = set(scheduler.claim(series[0] for series in series_list))
+    busy = [series[2] for series in series_list if series[0] not in claimed]
+    if busy:
+        logger.info(f"Задача {kind}: пропущено сериалов, которые сейчас проверяются: {len(busy)}")
+    if on_done:
+        for _ in busy:
+            on_done(True)
+    with scheduler.leased(claimed):
+        yield [series for series in series_list if series[0] in claimed], busy
+
+def force_check_all(series_list, rutracker, qbittorrent, on_done=None):
+    """
+    Принудительная проверка сериалов по страницам, без условных запросов, API и кеша страниц.
+
+    Сериалы, которые в это время проверяет цикл фоновой проверки, пропускаются.
+
+    Returns:
+        tuple: (названия обновленных сериалов, названия сериалов, которые не удалось проверить или обновить,
+            названия пропущенных сериалов)
+    """
+    with leased_series(series_list, "force_chk", on_done) as (series_list, busy):
+        checked = map_series(lambda series: check_series(series, rutracker, refresh=True), series_list, on_done)
+        results = apply_checked_updates(qbittorrent, checked)
+    titles = {series[0]: result[0][2] if result else series[2] for series, result in checked}
+    updated = [titles[series_id] for series_id, changed in results.items() if changed]
+    failed = [titles[series_id] for series_id, changed in results.items() if changed is None]
+    return updated, failed, busy
+
+def fetch_series_torrent(series, rutracker):
+    """Скачать актуальный торрент сериала: (тег, торрент-файл, название) или None."""
+    series_id, url, title, last_updated, added_by, added_at = series
+    page_info = rutracker.get_page_info(url)
+    if not page_info:
+        logger.error(f"Не удалось получить информацию о странице для {title}")
+        return None
+    torrent_data = rutracker.download_torrent(page_info["topic_id"])
+    if not torrent_data:
+        logger.error(f"Не удалось скачать торрент для {title}")
+        return None
+    return (f"id_{series_id}", torrent_data, title)
+
+def readd_all_series(series_list, rutracker, qbittorrent, on_done=None):
+    """
+    Заново добавить торренты всех сериалов в qBittorrent.
+
+    Сериалы, которые в это время проверяет цикл фоновой проверки, пропускаются.
+
+    Returns:
+        tuple: (число успешно добавленных, названия сериалов, которые добавить не удалось,
+            названия пропущенных сериалов)
+    """
+    with leased_series(series_list, "all_2qbit", on_done) as (series_list, busy):
+        fetched = map_series(lambda series: fetch_series_torrent(series, rutracker), series_list, on_done)
+        updates = [update for _, update in fetched if update]
+        failed = [series[2] for series, update in fetched if update is None]
+        decisions = apply_torrent_updates(qbittorrent, updates)
+    success_count = 0
+    for tag, _, title in updates:
+        if decisions.get(tag):
+            success_count += 1
+        else:
+            failed.append(title)
+    return success_count, failed, busy
+
+def fetch_import_page(url, rutracker):
+    """
+    Загрузить страницу и торрент-файл импортируемой раздачи.
+
+    Returns:
+        tuple: (page_info, торрент-файл или None, если его скачать не удалось);
+            None, если не удалось загрузить страницу
+    """
+    page_info = rutracker.get_page_info(url)
+    if not page_info:
+        logger.error(f"Не удалось получить информацию о странице {url}")
+        return None
+    torrent_data = rutracker.download_torrent(page_info["topic_id"])
+    if not torrent_data:
+        logger.error(f"Не удалось скачать торрент для {page_info['title']}")
+    return page_info, torrent_data
+
+def torrent_info_hash(torrent_data):
+    """Info hash торрент-файла; None, если файла нет или его не удалось разобрать."""
+    if not torrent_data:
+        return None
+    try:
+        return parse_torrent(torrent_data)["info_hash"]
+    except Exception as e:
+        logger.warning(f"Не удалось разобрать торрент-файл: {e}")
+        return None
+
+def import_series(urls, rutracker, qbittorrent, added_by, on_done=None):
+    """
+    Массово добавить сериалы по списку URL раздач.
+
+    Страницы и торрент-файлы загружаются параллельно (частоту запросов ограничивает клиент RuTracker),
+    новые сериалы записываются в базу одной транзакцией, торренты добавляются в qBittorrent пакетно.
+
+    Returns:
+        dict: added — названия добавленных сериалов, failed — URL, страницы которых загрузить не удалось,
+            no_torrent — названия добавленных сериалов без торрента в qBittorrent,
+            existing — число сериалов, добавленных в базу другим запросом во время импорта;
+            None при ошибке записи в базу данных
+    """
+    fetched = map_series(lambda url: fetch_import_page(url, rutracker), urls, on_done, describe=lambda url: url)
+    failed = [url for url, result in fetched if result is None]
+    # Сериалы добавляются в порядке исходного списка, а не завершения загрузки
+    order = {url: index for index, url in enumerate(urls)}
+    loaded = sorted(((url, result) for url, result in fetched if result is not None), key=lambda item: order[item[0]])
+    # Страницы только что загружены: сохраняются их отпечатки и info hash торрента, а первая
+    # проверка назначается с разбросом, чтобы импортированные сериалы не проверялись все сразу
+    scheduler = CheckScheduler()
+    items = [
+        {
+            "url": url,
+            "title": page_info["title"],
+            "last_updated": page_info["time_text"],
+            "etag": page_info["etag"],
+            "last_modified": page_info["last_modified"],
+            "fingerprint": page_info["fingerprint"],
+            "info_hash": torrent_info_hash(torrent_data),
+            "next_check_at": scheduler.next_check_time(scheduler.base_interval),
+            "check_interval": scheduler.base_interval,
+        }
+        for url, (page_info, torrent_data) in loaded
+    ]
+    with span("db_write"):
+        series_ids = add_series_bulk(items, added_by)
+    if series_ids is None:
+        return None
+
+    added, no_torrent, updates = [], [], []
+    for url, (page_info, torrent_data) in loaded:
+        series_id = series_ids.get(url)
+        if series_id is None:
+            continue
+        added.append(page_info["title"])
+        if torrent_data:
+            updates.append((f"id_{series_id}", torrent_data, page_info["title"]))
+        else:
+            no_torrent.append(page_info["title"])
+    decisions = apply_torrent_updates(qbittorrent, updates)
+    no_torrent.extend(title for tag, _, title in updates if not decisions.get(tag))
+    return {"added": added, "failed": failed, "no_torrent": no_torrent, "existing": len(loaded) - len(added)}
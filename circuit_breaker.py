@@ -0,0 +1,199 @@
+"""
+Предохранители (circuit breaker) для внешних зависимостей: RuTracker и qBittorrent.
+
+После CIRCUIT_FAILURE_THRESHOLD сетевых ошибок подряд предохранитель размыкается,
+и вызовы сразу завершаются CircuitOpenError вместо ожидания таймаута. Через
+CIRCUIT_RESET_TIMEOUT секунд пропускается один пробный вызов (полуоткрытое состояние);
+кроме того, фоновая проверка (clients.start_health_monitor) переподключает клиентов
+с разомкнутыми предохранителями.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from config import CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+STATE_NAMES = {CLOSED: "замкнут", OPEN: "разомкнут", HALF_OPEN: "пробный вызов"}
+
+class CircuitOpenError(Exception):
+    """Зависимость недоступна: предохранитель разомкнут."""
+
+def any_error(error):
+    return True
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_timeout=CIRCUIT_RESET_TIMEOUT,
+                 latency_window=50):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.last_error = None
+        self.latencies = deque(maxlen=latency_window)
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    @property
+    def state(self):
+        with self.lock:
+            return self._state()
+
+    def _state(self):
+        if self.opened_at is None:
+            return CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return HALF_OPEN
+        return OPEN
+
+    @property
+    def is_open(self):
+        return self.state == OPEN
+
+    def check(self):
+        """
+        Быстрая проверка перед ожиданием лимита запросов: CircuitOpenError, если предохранитель разомкнут.
+
+        В отличие от allow() не занимает пробный вызов полуоткрытого состояния.
+        """
+        if self.is_open and not getattr(self.local, "probing", False):
+            raise CircuitOpenError(f"{self.name} временно недоступен")
+
+    def allow(self):
+        """Можно ли выполнить вызов; в полуоткрытом состоянии пропускается один пробный вызов."""
+        if getattr(self.local, "probing", False):
+            return True
+        with self.lock:
+            state = self._state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self.trial_running:
+                self.trial_running = True
+                return True
+            return False
+
+    def record_success(self, latency=None):
+        with self.lock:
+            if latency is not None:
+                self.latencies.append(latency)
+            if self.opened_at is not None:
+                logger.info(f"{self.name}: соединение восстановлено, предохранитель замкнут")
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self, error=None):
+        with self.lock:
+            self.failures += 1
+            self.last_error = str(error) if error is not None else None
+            self.trial_running = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.warning(f"{self.name}: {self.failures} ошибок подряд, предохранитель разомкнут: {error}")
+                # Неудачный пробный вызов продлевает паузу
+                self.opened_at = time.monotonic()
+
+    def call(self, func, *args, is_failure=any_error, is_failed_result=None, **kwargs):
+        """
+        Выполнить func через предохранитель.
+
+        Args:
+            is_failure: функция (исключение) -> считать ли его недоступностью зависимости
+            is_failed_result: функция (результат) -> считать ли результат недоступностью (например, ответ 5xx)
+
+        Raises:
+            CircuitOpenError: предохранитель разомкнут
+        """
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} временно недоступен")
+        started = time.monotonic()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            if is_failure(e):
+                self.record_failure(e)
+            else:
+                self.record_success()
+            raise
+        if is_failed_result is not None and is_failed_result(result):
+            self.record_failure(result)
+        else:
+            self.record_success(time.monotonic() - started)
+        return result
+
+    async def call_async(self, func, *args, is_failure=any_error, is_failed_result=None, **kwargs):
+        """То же, что call, для корутины func (asyncio-режим)."""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} временно недоступен")
+        started = time.monotonic()
+        try:
+            result = await func(*args, **kwargs)
+        except Exception as e:
+            if is_failure(e):
+                self.record_failure(e)
+            else:
+                self.record_success()
+            raise
+        if is_failed_result is not None and is_failed_result(result):
+            self.record_failure(result)
+        else:
+            self.record_success(time.monotonic() - started)
+        return result
+
+    @contextmanager
+    def probing(self):
+        """Вызовы в этом блоке (в текущем потоке) выполняются даже при разомкнутом предохранителе."""
+        self.local.probing = True
+        try:
+            yield
+        finally:
+            self.local.probing = False
+
+    def snapshot(self):
+        """Состояние для /status: state, failures, last_error, latency_avg и latency_max (с) последних вызовов."""
+        with self.lock:
+            latencies = list(self.latencies)
+            return {
+                "state": self._state(),
+                "failures": self.failures,
+                "last_error": self.last_error,
+                "latency_avg": sum(latencies) / len(latencies) if latencies else None,
+                "latency_max": max(latencies) if latencies else None,
+            }
+
+    def describe(self):
+        """Краткое описание состояния для сообщений бота."""
+        info = self.snapshot()
+        parts = [f"предохранитель {STATE_NAMES[info['state']]}"]
+        if info["latency_avg"] is not None:
+            parts.append(
+                f"задержка {info['latency_avg'] * 1000:.0f} мс (макс. {info['latency_max'] * 1000:.0f} мс)"
+            )
+        if info["state"] != CLOSED and info["last_error"]:
+            parts.append(f"ошибка: {info['last_error'][:200]}")
+        return ", ".join(parts)
+
+class GuardedProxy:
+    """Обертка над объектом клиента: все его методы вызываются через предохранитель."""
+
+    def __init__(self, target, breaker, is_failure=any_error):
+        self._target = target
+        self._breaker = breaker
+        self._is_failure = is_failure
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        def guarded(*args, **kwargs):
+            return self._breaker.call(attr, *args, is_failure=self._is_failure, **kwargs)
+        return guarded
@@ -0,0 +1,133 @@
+"""
+Общий реестр клиентов RuTracker и qBittorrent.
+
+Каждый клиент создается один раз при первом обращении и используется и ботом,
+и фоновой проверкой. Модули клиентов импортируются только при создании клиента
+(bs4 и qbittorrentapi — еще позже, при первом использовании), поэтому запуск бота
+не ждет входа на RuTracker и подключения к qBittorrent.
+"""
+import logging
+import threading
+from circuit_breaker import CLOSED
+from config import HEALTH_PROBE_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+_clients = {}
+_lock = threading.Lock()
+
+def _create_rutracker():
+    from rutracker_client import RutrackerClient
+    return RutrackerClient()
+
+def _create_qbittorrent():
+    from qbittorrent_client import QBittorrentClient
+    return QBittorrentClient()
+
+def _create_rutracker_api():
+    from rutracker_client import RutrackerApiClient
+    return RutrackerApiClient()
+
+_factories = {
+    "rutracker": _create_rutracker,
+    "qbittorrent": _create_qbittorrent,
+    "rutracker_api": _create_rutracker_api,
+}
+
+def get_client(name, create=True):
+    """
+    Получить общий клиент по имени.
+
+    Args:
+        name: "rutracker", "qbittorrent" или "rutracker_api"
+        create: создать клиент, если его еще нет; при False не выполняет сетевых запросов
+
+    Returns:
+        клиент или None, если он еще не создан или создать его не удалось
+    """
+    client = _clients.get(name)
+    if client is not None or not create:
+        return client
+    # Создание под общей блокировкой: при одновременных обращениях вход выполняется один раз
+    with _lock:
+        client = _clients.get(name)
+        if client is None:
+            try:
+                client = _factories[name]()
+            except Exception as e:
+                logger.error(f"Ошибка инициализации клиента {name}: {e}")
+                return None
+            _clients[name] = client
+            logger.info(f"Клиент {name} инициализирован")
+    return client
+
+def get_rutracker(create=True):
+    return get_client("rutracker", create)
+
+def get_qbittorrent(create=True):
+    return get_client("qbittorrent", create)
+
+def get_rutracker_api(create=True):
+    return get_client("rutracker_api", create)
+
+# Проверки доступности клиентов; при create=False клиент не создается (для /healthz).
+# При разомкнутом предохранителе зависимость считается недоступной без сетевых запросов.
+def is_rutracker_available(create=True):
+    try:
+        client = get_rutracker(create)
+        return client is not None and getattr(client, "is_logged_in", False) and not client.breaker.is_open
+    except Exception:
+        return False
+
+def is_qbittorrent_available(create=True):
+    try:
+        client = get_qbittorrent(create)
+        return client is not None and getattr(client, "client", None) is not None and not client.breaker.is_open
+    except Exception:
+        return False
+
+class LazyClient:
+    """Ссылка на клиент из реестра: клиент создается при первом обращении к его атрибутам."""
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attr):
+        client = get_client(self._name)
+        if client is None:
+            raise RuntimeError(f"Клиент {self._name} не инициализирован")
+        return getattr(client, attr)
+
+    def __bool__(self):
+        return get_client(self._name) is not None
+
+def probe_clients():
+    """
+    Переподключить созданные клиенты, у которых разомкнут предохранитель или нет сессии.
+
+    Проверка выполняется в обход предохранителя; удачный вход замыкает его.
+    """
+    rutracker = get_rutracker(create=False)
+    if rutracker is not None and (rutracker.breaker.state != CLOSED or not rutracker.is_logged_in):
+        with rutracker.breaker.probing(), rutracker.login_lock:
+            logger.info("Проверка доступности RuTracker: повторная авторизация")
+            rutracker.is_logged_in = rutracker.login()
+            rutracker.login_generation += 1
+    qbittorrent = get_qbittorrent(create=False)
+    if qbittorrent is not None and (qbittorrent.breaker.state != CLOSED or qbittorrent.client is None):
+        with qbittorrent.breaker.probing():
+            logger.info("Проверка доступности qBittorrent: повторное подключение")
+            qbittorrent.connect()
+
+def start_health_monitor(stop_event, interval=HEALTH_PROBE_INTERVAL):
+    """Запустить фоновый поток, который раз в interval секунд вызывает probe_clients."""
+    def run():
+        while not stop_event.wait(interval):
+            try:
+                probe_clients()
+            except Exception as e:
+                logger.error(f"Ошибка фоновой проверки клиентов: {e}")
+
+    thread = threading.Thread(target=run, name="health-monitor", daemon=True)
+    thread.start()
+    return thread
@@ -1,4 +1,6 @@
 import os
+import socket
+import re
 from dotenv import load_dotenv
 
 # Загрузка переменных окружения
@@ -20,11 +22,138 @@ TIMEZONE = os.getenv("TIMEZONE", "Europe/Moscow")
 QBITTORRENT_SAVE_PATH = os.getenv("QBITTORRENT_SAVE_PATH", "")
 ADMIN_ID = int(os.getenv("ADMIN_ID", "0"))  # ID главного администратора
 
+# Адаптивное расписание: интервал проверки сериала меняется в этих пределах (сек)
+CHECK_MIN_INTERVAL = int(os.getenv("CHECK_MIN_INTERVAL", "900"))
+CHECK_MAX_INTERVAL = int(os.getenv("CHECK_MAX_INTERVAL", str(CHECK_INTERVAL * 24)))
+CHECK_JITTER = float(os.getenv("CHECK_JITTER", "0.1"))  # доля случайного разброса времени проверки
+
+# Параллельная проверка обновлений и ограничение частоты запросов
+CHECK_WORKERS = int(os.getenv("CHECK_WORKERS", "4"))
+# asyncio-режим (async_main.py): одновременные загрузки страниц в цикле событий
+# и потоки, в которых выполняются обработчики бота
+ASYNC_CHECK_CONCURRENCY = int(os.getenv("ASYNC_CHECK_CONCURRENCY", "50"))
+ASYNC_HANDLER_WORKERS = int(os.getenv("ASYNC_HANDLER_WORKERS", "4"))
+RUTRACKER_RATE = float(os.getenv("RUTRACKER_RATE", "1"))  # запросов в секунду
+RUTRACKER_BURST = int(os.getenv("RUTRACKER_BURST", "2"))
+QBITTORRENT_RATE = float(os.getenv("QBITTORRENT_RATE", "10"))  # запросов в секунду
+QBITTORRENT_BURST = int(os.getenv("QBITTORRENT_BURST", "10"))
+# Минимальный интервал (сек) между синхронизациями локального зеркала торрентов qBittorrent
+QBITTORRENT_SYNC_INTERVAL = float(os.getenv("QBITTORRENT_SYNC_INTERVAL", "5"))
+
+# Несколько процессов проверки с общей базой: каждый арендует непересекающиеся пакеты сериалов.
+# CHECKER_ID — имя процесса (по умолчанию хост и PID), срок аренды в секундах
+# (продлевается во время проверки) и наибольший размер пакета (0 — без ограничения)
+CHECKER_ID = os.getenv("CHECKER_ID") or f"{socket.gethostname()}-{os.getpid()}"
+CHECK_LEASE_SECONDS = float(os.getenv("CHECK_LEASE_SECONDS", "600"))
+CHECK_BATCH_SIZE = int(os.getenv("CHECK_BATCH_SIZE", "500"))
+
+# Потоковое чтение страниц темы: загрузка прекращается после заголовка и времени сообщения
+RUTRACKER_STREAM_PAGES = os.getenv("RUTRACKER_STREAM_PAGES", "1") == "1"
+RUTRACKER_STREAM_CHUNK_SIZE = int(os.getenv("RUTRACKER_STREAM_CHUNK_SIZE", "16384"))
+
+# Настройки SQLite
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "8192"))
+DB_CACHED_STATEMENTS = int(os.getenv("DB_CACHED_STATEMENTS", "256"))
+DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL").upper()
+# WAL работает только для процессов на одном хосте: его индекс в разделяемой памяти не виден
+# через сетевую файловую систему. Если процессы проверки на разных хостах используют общий
+# том с базой, нужен журнал отката (DELETE)
+DB_JOURNAL_MODE = os.getenv("DB_JOURNAL_MODE", "WAL").upper()
+
+# Адрес форума RuTracker (для зеркал и локальных тестовых серверов)
+RUTRACKER_URL = os.getenv("RUTRACKER_URL", "https://rutracker.org").rstrip("/")
+
+# API RuTracker для пакетного получения данных о раздачах
+RUTRACKER_API_URL = os.getenv("RUTRACKER_API_URL", "https://api.rutracker.cc/v1").rstrip("/")
+RUTRACKER_API_CHUNK_SIZE = int(os.getenv("RUTRACKER_API_CHUNK_SIZE", "100"))
+
+# HTTP-транспорт RuTracker: размер пула соединений (по умолчанию — по числу потоков проверки),
+# повторы при ошибках соединения и ответах 5xx с начальной паузой (с, удваивается),
+# HTTP/2 через httpx (требует pip install "httpx[http2]")
+RUTRACKER_POOL_SIZE = int(os.getenv("RUTRACKER_POOL_SIZE", str(CHECK_WORKERS + 2)))
+RUTRACKER_RETRIES = int(os.getenv("RUTRACKER_RETRIES", "2"))
+RUTRACKER_RETRY_BACKOFF = float(os.getenv("RUTRACKER_RETRY_BACKOFF", "0.5"))
+RUTRACKER_HTTP2 = os.getenv("RUTRACKER_HTTP2", "0") == "1"
+
+# Файл с cookie сессии RuTracker (пустое значение — не сохранять) и минимальный интервал
+# между повторными авторизациями при подозрении на истекшую сессию, в секундах
+RUTRACKER_COOKIE_FILE = os.getenv("RUTRACKER_COOKIE_FILE", "db/rutracker_cookies.json")
+RUTRACKER_RELOGIN_MIN_INTERVAL = float(os.getenv("RUTRACKER_RELOGIN_MIN_INTERVAL", "60"))
+
+# Кеш страниц тем и торрент-файлов RuTracker: время жизни (с) и число записей.
+# Торренты живут меньше страниц, чтобы не пережить запись о версии страницы
+PAGE_CACHE_TTL = float(os.getenv("PAGE_CACHE_TTL", "60"))
+PAGE_CACHE_SIZE = int(os.getenv("PAGE_CACHE_SIZE", "1024"))
+TORRENT_CACHE_TTL = float(os.getenv("TORRENT_CACHE_TTL", "30"))
+TORRENT_CACHE_SIZE = int(os.getenv("TORRENT_CACHE_SIZE", "64"))
+
+# Режим получения обновлений Telegram: polling (по умолчанию) или webhook.
+# none — только проверка обновлений, без бота: для дополнительных процессов проверки
+# с общей базой (получать обновления Telegram может только один процесс)
+BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")  # публичный HTTPS-адрес, например https://example.com/telegram
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "4"))
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))
+
+# Фоновые задачи (/force_chk, /all_2qbit): число одновременно выполняемых задач
+# и минимальный интервал между обновлениями сообщения о прогрессе, в секундах
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_PROGRESS_INTERVAL = float(os.getenv("JOB_PROGRESS_INTERVAL", "5"))
+
+# Постраничный /list: сериалов на странице и число закешированных страниц
+LIST_PAGE_SIZE = int(os.getenv("LIST_PAGE_SIZE", "20"))
+LIST_CACHE_SIZE = int(os.getenv("LIST_CACHE_SIZE", "64"))
+
+# Исходящие запросы к Telegram: общий лимит бота (в секунду), лимит на чат,
+# число потоков отправки и повторов при ответе 429
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", "30"))
+TELEGRAM_CHAT_RATE = float(os.getenv("TELEGRAM_CHAT_RATE", "1"))
+TELEGRAM_CHAT_BURST = int(os.getenv("TELEGRAM_CHAT_BURST", "3"))
+TELEGRAM_SENDER_WORKERS = int(os.getenv("TELEGRAM_SENDER_WORKERS", "4"))
+TELEGRAM_MAX_RETRIES = int(os.getenv("TELEGRAM_MAX_RETRIES", "5"))
+
+# Сервер метрик Prometheus (/metrics) и проверки состояния (/healthz); 0 — выключен
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_LISTEN = os.getenv("METRICS_LISTEN", "0.0.0.0")
+
+# Трассировка этапов (размер кольцевого буфера спанов) и профилирование одного цикла проверки
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "10000"))
+PROFILE_CYCLE = os.getenv("PROFILE_CYCLE", "0") == "1"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+# Предохранители RuTracker и qBittorrent: число сетевых ошибок подряд до размыкания,
+# пауза до пробного вызова и интервал фоновой проверки/переподключения, в секундах
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "60"))
+HEALTH_PROBE_INTERVAL = float(os.getenv("HEALTH_PROBE_INTERVAL", "30"))
+
 # Проверка обязательных переменных
 REQUIRED_VARS = [
     "TELEGRAM_TOKEN", "QBITTORRENT_URL", "RUTRACKER_USERNAME", "RUTRACKER_PASSWORD", "ADMIN_ID"
 ]
+if BOT_MODE == "none":
+    REQUIRED_VARS = [var for var in REQUIRED_VARS if var not in ("TELEGRAM_TOKEN", "ADMIN_ID")]
+
+if BOT_MODE not in ("polling", "webhook", "none"):
+    raise EnvironmentError("BOT_MODE должен быть polling, webhook или none. Проверьте файл .env.")
 
 for var in REQUIRED_VARS:
     if not os.getenv(var):
         raise EnvironmentError(f"Переменная окружения {var} не задана. Проверьте файл .env.")
+
+if BOT_MODE == "webhook" and not WEBHOOK_URL:
+    raise EnvironmentError("Для BOT_MODE=webhook необходимо задать WEBHOOK_URL. Проверьте файл .env.")
+
+if DB_JOURNAL_MODE not in ("WAL", "DELETE", "TRUNCATE", "PERSIST"):
+    raise EnvironmentError("DB_JOURNAL_MODE должен быть WAL, DELETE, TRUNCATE или PERSIST. Проверьте файл .env.")
+
+# Без секрета любой, кто может обратиться к порту, подделал бы обновления от имени администратора
+if BOT_MODE == "webhook" and not re.fullmatch(r"[A-Za-z0-9_-]{1,256}", WEBHOOK_SECRET):
+    raise EnvironmentError(
+        "Для BOT_MODE=webhook необходимо задать WEBHOOK_SECRET: 1-256 символов A-Z, a-z, 0-9, _ и -. "
+        "Проверьте файл .env."
+    )
@@ -1,13 +1,82 @@
 import sqlite3
+import json
 import logging
+import re
+import threading
+import time
 from datetime import datetime
+from metrics import timed, DB_QUERY_SECONDS
+from config import DB_BUSY_TIMEOUT_MS, DB_CACHE_SIZE_KB, DB_CACHED_STATEMENTS, DB_SYNCHRONOUS, DB_JOURNAL_MODE, CHECKER_ID
 
 logger = logging.getLogger(__name__)
 DB_FILE = "db/telemon_bot.db"
 
+# Статусы фоновых задач
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_INTERRUPTED = "interrupted"
+
+def topic_id_from_url(url):
+    """ID темы RuTracker из URL раздачи (как RutrackerClient.get_topic_id); None, если его нет."""
+    match = re.search(r't=(\d+)', url or "")
+    return match.group(1) if match else None
+
+# Постоянные соединения: по одному на поток (sqlite3.Connection нельзя делить между потоками)
+_local = threading.local()
+
+def get_connection():
+    """
+    Получить постоянное соединение с базой данных для текущего потока.
+
+    Соединение открывается один раз с журналом DB_JOURNAL_MODE (по умолчанию WAL) и настроенными PRAGMA,
+    подготовленные запросы кешируются sqlite3 (cached_statements).
+    Использование `with get_connection() as conn:` фиксирует транзакцию, но не закрывает соединение.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.db_file == DB_FILE:
+        return conn
+    if conn is not None:
+        conn.close()
+    conn = sqlite3.connect(
+        DB_FILE,
+        timeout=DB_BUSY_TIMEOUT_MS / 1000,
+        cached_statements=DB_CACHED_STATEMENTS
+    )
+    conn.execute(f"PRAGMA journal_mode={DB_JOURNAL_MODE}")
+    conn.execute(f"PRAGMA synchronous={DB_SYNCHRONOUS}")
+    conn.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    _local.conn = conn
+    _local.db_file = DB_FILE
+    return conn
+
+def close_connection():
+    """Закрыть соединение текущего потока."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+def get_series_version():
+    """
+    Текущая версия списка сериалов: по ней сбрасываются закешированные страницы /list.
+
+    Версию увеличивают триггеры series_version_* в той же транзакции, что и добавление,
+    изменение названия или даты обновления и удаление сериала, поэтому изменения,
+    сделанные другими процессами проверки, тоже ее меняют.
+
+    Returns:
+        int: версия; None при ошибке
+    """
+    row = execute_query("SELECT version FROM series_version", fetchone=True)
+    return row[0] if row else None
+
 def init_db():
     """Инициализация базы данных."""
-    with sqlite3.connect(DB_FILE) as conn:
+    with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS users (
@@ -25,16 +94,105 @@ def init_db():
                 last_updated TEXT,
                 added_by INTEGER,
                 added_at TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                fingerprint TEXT,
+                info_hash TEXT,
+                reg_time INTEGER,
+                next_check_at REAL,
+                check_interval INTEGER,
+                last_checked_at REAL,
+                last_change_at REAL,
+                update_count INTEGER DEFAULT 0,
+                lease_owner TEXT,
+                lease_expires_at REAL,
+                topic_id TEXT,
                 FOREIGN KEY (added_by) REFERENCES users(user_id)
             )
         """)
+        # Миграция баз, созданных до появления новых колонок
+        ensure_columns(cursor, "series", {
+            "etag": "TEXT",
+            "last_modified": "TEXT",
+            "fingerprint": "TEXT",
+            "info_hash": "TEXT",
+            "reg_time": "INTEGER",
+            "next_check_at": "REAL",
+            "check_interval": "INTEGER",
+            "last_checked_at": "REAL",
+            "last_change_at": "REAL",
+            "update_count": "INTEGER DEFAULT 0",
+            "lease_owner": "TEXT",
+            "lease_expires_at": "REAL",
+            "topic_id": "TEXT",
+        })
+        # ID темы сериалов, добавленных до появления колонки topic_id
+        cursor.execute("SELECT id, url FROM series WHERE topic_id IS NULL")
+        topic_ids = [(topic_id_from_url(url), series_id) for series_id, url in cursor.fetchall()]
+        cursor.executemany("UPDATE series SET topic_id = ? WHERE id = ?", [row for row in topic_ids if row[0]])
+        cursor.execute("CREATE TABLE IF NOT EXISTS series_version (version INTEGER NOT NULL)")
+        cursor.execute("INSERT INTO series_version (version) SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM series_version)")
+        for name, event in (
+            ("insert", "INSERT"),
+            ("update", "UPDATE OF title, last_updated"),
+            ("delete", "DELETE"),
+        ):
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS series_version_{name} AFTER {event} ON series
+                BEGIN
+                    UPDATE series_version SET version = version + 1;
+                END
+            """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY,
+                kind TEXT,
+                status TEXT,
+                created_by INTEGER,
+                chat_id INTEGER,
+                message_id INTEGER,
+                total INTEGER DEFAULT 0,
+                done INTEGER DEFAULT 0,
+                failed INTEGER DEFAULT 0,
+                result TEXT,
+                created_at TEXT,
+                finished_at TEXT,
+                owner TEXT,
+                lease_expires_at REAL
+            )
+        """)
+        ensure_columns(cursor, "jobs", {
+            "owner": "TEXT",
+            "lease_expires_at": "REAL",
+        })
+        # Задачи этого процесса, прерванные перезапуском бота, больше не выполняются.
+        # Задачи других процессов не трогаем: они продлевают аренду, пока выполняются,
+        # а задачи остановившихся процессов считаются прерванными после истечения аренды
+        cursor.execute(
+            "UPDATE jobs SET status = ?, finished_at = ? WHERE status IN (?, ?) AND (owner IS NULL OR owner = ?)",
+            (JOB_INTERRUPTED, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), JOB_QUEUED, JOB_RUNNING, CHECKER_ID)
+        )
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_series_next_check_at ON series(next_check_at)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_series_topic_id ON series(topic_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_kind_status ON jobs(kind, status)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_is_admin ON users(is_admin)")
         conn.commit()
+    invalidate_access_cache()
     logger.info("База данных инициализирована")
 
+def ensure_columns(cursor, table, columns):
+    """Добавить в таблицу отсутствующие колонки."""
+    cursor.execute(f"PRAGMA table_info({table})")
+    existing = {row[1] for row in cursor.fetchall()}
+    for name, definition in columns.items():
+        if name not in existing:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+            logger.info(f"Добавлена колонка {table}.{name}")
+
 def execute_query(query, params=(), fetchone=False, fetchall=False):
     """Универсальный метод для выполнения SQL-запросов."""
     try:
-        with sqlite3.connect(DB_FILE) as conn:
+        with get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(query, params)
             conn.commit()
@@ -47,15 +205,16 @@ def execute_query(query, params=(), fetchone=False, fetchall=False):
         logger.error(f"Ошибка выполнения запроса: {e}")
         return None
 
+@timed(DB_QUERY_SECONDS)
 def add_series(url, title, last_updated, added_by):
     """Добавить сериал в базу данных."""
     query = """
-        INSERT OR REPLACE INTO series (url, title, last_updated, added_by, added_at)
-        VALUES (?, ?, ?, ?, ?)
+        INSERT OR REPLACE INTO series (url, title, last_updated, added_by, added_at, topic_id)
+        VALUES (?, ?, ?, ?, ?, ?)
     """
-    params = (url, title, last_updated, added_by, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    params = (url, title, last_updated, added_by, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), topic_id_from_url(url))
     try:
-        with sqlite3.connect(DB_FILE) as conn:
+        with get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(query, params)
             conn.commit()
@@ -64,6 +223,7 @@ def add_series(url, title, last_updated, added_by):
         logger.error(f"Ошибка добавления сериала: {e}")
         return None
 
+@timed(DB_QUERY_SECONDS)
 def update_series(series_id, title=None, last_updated=None):
     """Обновить информацию о сериале."""
     query = "UPDATE series SET "
@@ -78,6 +238,7 @@ def update_series(series_id, title=None, last_updated=None):
     params.append(series_id)
     return execute_query(query, params)
 
+@timed(DB_QUERY_SECONDS)
 def get_all_series(series_id=None):
     """Получить список всех сериалов или конкретный сериал по ID."""
     if series_id is not None:
@@ -87,21 +248,444 @@ def get_all_series(series_id=None):
         query = "SELECT id, url, title, last_updated, added_by, added_at FROM series"
         return execute_query(query, fetchall=True)
 
+@timed(DB_QUERY_SECONDS)
+def get_series_page(after_id=None, before_id=None, limit=20):
+    """
+    Получить страницу сериалов по ключу (keyset-пагинация по id).
+
+    Args:
+        after_id: страница сериалов с id больше указанного (по умолчанию — первая страница)
+        before_id: страница сериалов с id меньше указанного (переход назад)
+
+    Returns:
+        tuple: (список сериалов по возрастанию id, есть ли предыдущая страница, есть ли следующая страница)
+    """
+    columns = "id, url, title, last_updated, added_by, added_at"
+    if before_id is not None:
+        query = f"SELECT {columns} FROM series WHERE id < ? ORDER BY id DESC LIMIT ?"
+        rows = execute_query(query, (before_id, limit), fetchall=True) or []
+        rows.reverse()
+    else:
+        query = f"SELECT {columns} FROM series WHERE id > ? ORDER BY id LIMIT ?"
+        rows = execute_query(query, (after_id if after_id is not None else -1, limit), fetchall=True) or []
+    if not rows:
+        return rows, False, False
+    has_prev = execute_query("SELECT 1 FROM series WHERE id < ? LIMIT 1", (rows[0][0],), fetchone=True) is not None
+    has_next = execute_query("SELECT 1 FROM series WHERE id > ? LIMIT 1", (rows[-1][0],), fetchone=True) is not None
+    return rows, has_prev, has_next
+
+@timed(DB_QUERY_SECONDS)
+def get_series_by_ids(series_ids):
+    """Получить сериалы по списку ID."""
+    series_ids = list(series_ids)
+    result = []
+    # Ограничение SQLite на количество параметров в запросе
+    for start in range(0, len(series_ids), 500):
+        chunk = series_ids[start:start + 500]
+        placeholders = ", ".join("?" * len(chunk))
+        query = f"SELECT id, url, title, last_updated, added_by, added_at FROM series WHERE id IN ({placeholders})"
+        result.extend(execute_query(query, chunk, fetchall=True) or [])
+    return result
+
+@timed(DB_QUERY_SECONDS)
+def get_check_schedule(after_id=None):
+    """
+    Получить расписание проверок: список (id, next_check_at, check_interval, lease_owner, lease_expires_at).
+
+    Args:
+        after_id: только сериалы с ID больше указанного (добавленные после предыдущей загрузки)
+    """
+    query = "SELECT id, next_check_at, check_interval, lease_owner, lease_expires_at FROM series"
+    if after_id is None:
+        return execute_query(query, fetchall=True) or []
+    return execute_query(query + " WHERE id > ?", (after_id,), fetchall=True) or []
+
+@timed(DB_QUERY_SECONDS)
+def update_series_schedule(series_id, next_check_at, check_interval, owner, changed=False, checked_at=None):
+    """
+    Сохранить время следующей проверки сериала и историю обновлений; аренда сериала снимается.
+
+    Запись меняется, только если сериал не арендован или арендован owner: если аренда истекла
+    и ее уже взял другой процесс, его расписание не перезаписывается.
+    """
+    if changed:
+        query = """
+            UPDATE series SET next_check_at = ?, check_interval = ?, last_checked_at = ?,
+                last_change_at = ?, update_count = COALESCE(update_count, 0) + 1,
+                lease_owner = NULL, lease_expires_at = NULL
+            WHERE id = ? AND (lease_owner IS NULL OR lease_owner = ?)
+        """
+        params = (next_check_at, check_interval, checked_at, checked_at, series_id, owner)
+    else:
+        query = """
+            UPDATE series SET next_check_at = ?, check_interval = ?, last_checked_at = ?,
+                lease_owner = NULL, lease_expires_at = NULL
+            WHERE id = ? AND (lease_owner IS NULL OR lease_owner = ?)
+        """
+        params = (next_check_at, check_interval, checked_at, series_id, owner)
+    return execute_query(query, params)
+
+@timed(DB_QUERY_SECONDS)
+def claim_due_series(owner, now, lease_seconds, limit=None):
+    """
+    Взять в аренду сериалы, срок проверки которых наступил и которые не арендованы другим процессом.
+
+    Аренда с истекшим сроком (процесс остановился, не закончив проверку) может быть взята заново.
+
+    Args:
+        owner: идентификатор процесса проверки (CHECKER_ID)
+        limit: наибольшее число сериалов (None — все)
+
+    Returns:
+        list: ID арендованных сериалов в порядке срока проверки; пустой список при ошибке
+    """
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            # BEGIN IMMEDIATE: выборка и захват выполняются одной транзакцией записи,
+            # поэтому процессы получают непересекающиеся наборы сериалов
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute(
+                """
+                SELECT id FROM series
+                WHERE (next_check_at IS NULL OR next_check_at <= ?)
+                    AND (lease_owner IS NULL OR lease_owner = ? OR lease_expires_at < ?)
+                ORDER BY next_check_at, id
+                LIMIT ?
+                """,
+                (now, owner, now, -1 if limit is None else limit)
+            )
+            series_ids = [row[0] for row in cursor.fetchall()]
+            for start in range(0, len(series_ids), 500):
+                chunk = series_ids[start:start + 500]
+                placeholders = ", ".join("?" * len(chunk))
+                cursor.execute(
+                    f"UPDATE series SET lease_owner = ?, lease_expires_at = ? WHERE id IN ({placeholders})",
+                    (owner, now + lease_seconds, *chunk)
+                )
+            return series_ids
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка аренды сериалов для проверки: {e}")
+        return []
+
+@timed(DB_QUERY_SECONDS)
+def claim_series_leases(owner, series_ids, now, lease_seconds):
+    """
+    Взять в аренду указанные сериалы независимо от срока проверки, если они не арендованы другим процессом.
+
+    Returns:
+        list: ID арендованных сериалов; пустой список при ошибке
+    """
+    series_ids = list(series_ids)
+    claimed = []
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            for start in range(0, len(series_ids), 500):
+                chunk = series_ids[start:start + 500]
+                placeholders = ", ".join("?" * len(chunk))
+                cursor.execute(
+                    f"UPDATE series SET lease_owner = ?, lease_expires_at = ? "
+                    f"WHERE id IN ({placeholders}) AND (lease_owner IS NULL OR lease_owner = ? OR lease_expires_at < ?)",
+                    (owner, now + lease_seconds, *chunk, owner, now)
+                )
+                cursor.execute(
+                    f"SELECT id FROM series WHERE lease_owner = ? AND id IN ({placeholders})",
+                    (owner, *chunk)
+                )
+                claimed.extend(row[0] for row in cursor.fetchall())
+        return claimed
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка аренды сериалов: {e}")
+        return []
+
+@timed(DB_QUERY_SECONDS)
+def renew_series_leases(owner, series_ids, expires_at):
+    """
+    Продлить аренду сериалов, которые все еще принадлежат owner.
+
+    Returns:
+        int: число продленных аренд (меньше числа сериалов, если часть аренд уже перехвачена)
+    """
+    series_ids = list(series_ids)
+    renewed = 0
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            for start in range(0, len(series_ids), 500):
+                chunk = series_ids[start:start + 500]
+                placeholders = ", ".join("?" * len(chunk))
+                cursor.execute(
+                    f"UPDATE series SET lease_expires_at = ? WHERE lease_owner = ? AND id IN ({placeholders})",
+                    (expires_at, owner, *chunk)
+                )
+                renewed += cursor.rowcount
+        return renewed
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка продления аренды сериалов: {e}")
+        return 0
+
+@timed(DB_QUERY_SECONDS)
+def release_series_leases(owner, series_ids):
+    """Снять аренду owner с сериалов (например, если проверка не состоялась)."""
+    series_ids = list(series_ids)
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            for start in range(0, len(series_ids), 500):
+                chunk = series_ids[start:start + 500]
+                placeholders = ", ".join("?" * len(chunk))
+                cursor.execute(
+                    f"UPDATE series SET lease_owner = NULL, lease_expires_at = NULL "
+                    f"WHERE lease_owner = ? AND id IN ({placeholders})",
+                    (owner, *chunk)
+                )
+        return True
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка снятия аренды сериалов: {e}")
+        return False
+
+@timed(DB_QUERY_SECONDS)
+def get_series_fingerprints(series_ids):
+    """Получить сохраненные отпечатки страниц сериалов: {id: {etag, last_modified, fingerprint}}."""
+    series_ids = list(series_ids)
+    rows = []
+    for start in range(0, len(series_ids), 500):
+        chunk = series_ids[start:start + 500]
+        placeholders = ", ".join("?" * len(chunk))
+        query = f"SELECT id, etag, last_modified, fingerprint FROM series WHERE id IN ({placeholders})"
+        rows.extend(execute_query(query, chunk, fetchall=True) or [])
+    return {
+        row[0]: {"etag": row[1], "last_modified": row[2], "fingerprint": row[3]}
+        for row in rows
+    }
+
+@timed(DB_QUERY_SECONDS)
+def update_series_fingerprint(series_id, etag=None, last_modified=None, fingerprint=None):
+    """Сохранить отпечаток страницы сериала."""
+    query = "UPDATE series SET etag = ?, last_modified = ?, fingerprint = ? WHERE id = ?"
+    return execute_query(query, (etag, last_modified, fingerprint, series_id))
+
+@timed(DB_QUERY_SECONDS)
+def get_series_topic_data(series_ids):
+    """Получить сохраненные данные о раздачах сериалов: {id: {info_hash, reg_time}}."""
+    series_ids = list(series_ids)
+    rows = []
+    for start in range(0, len(series_ids), 500):
+        chunk = series_ids[start:start + 500]
+        placeholders = ", ".join("?" * len(chunk))
+        query = f"SELECT id, info_hash, reg_time FROM series WHERE id IN ({placeholders})"
+        rows.extend(execute_query(query, chunk, fetchall=True) or [])
+    return {row[0]: {"info_hash": row[1], "reg_time": row[2]} for row in rows}
+
+@timed(DB_QUERY_SECONDS)
+def update_series_topic_data(series_id, info_hash=None, reg_time=None):
+    """Сохранить info hash и время регистрации раздачи сериала."""
+    query = "UPDATE series SET info_hash = ?, reg_time = ? WHERE id = ?"
+    return execute_query(query, (info_hash, reg_time, series_id))
+
+@timed(DB_QUERY_SECONDS)
 def remove_series(series_id):
     """Удалить сериал из базы данных."""
     query = "DELETE FROM series WHERE id = ?"
     return execute_query(query, (series_id,))
 
+@timed(DB_QUERY_SECONDS)
 def series_exists(url):
     """Проверить, существует ли сериал в базе данных."""
     query = "SELECT 1 FROM series WHERE url = ?"
     return execute_query(query, (url,), fetchone=True) is not None
 
+@timed(DB_QUERY_SECONDS)
+def get_existing_topic_ids(topic_ids):
+    """
+    Отобрать из списка ID тем те, раздачи которых уже отслеживаются (одним запросом).
+
+    Сравнение по ID темы, а не по URL: разные ссылки на одну раздачу считаются одним сериалом.
+    """
+    topic_ids = list(topic_ids)
+    if not topic_ids:
+        return set()
+    # Список передается одним параметром JSON, поэтому ограничение на число параметров не действует
+    query = "SELECT DISTINCT topic_id FROM series WHERE topic_id IN (SELECT value FROM json_each(?))"
+    rows = execute_query(query, (json.dumps(topic_ids),), fetchall=True)
+    return {row[0] for row in rows or []}
+
+@timed(DB_QUERY_SECONDS)
+def add_series_bulk(items, added_by):
+    """
+    Добавить несколько сериалов одной транзакцией; раздачи, которые уже есть в базе
+    (по URL или ID темы), пропускаются.
+
+    Args:
+        items: список словарей с ключами url, title, last_updated и необязательными
+            etag, last_modified, fingerprint, info_hash, next_check_at, check_interval
+
+    Returns:
+        dict: {url: ID} добавленных сериалов; None при ошибке (ни один сериал не добавлен)
+    """
+    added_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    added = {}
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            for item in items:
+                topic_id = topic_id_from_url(item["url"])
+                cursor.execute(
+                    """
+                    INSERT OR IGNORE INTO series (
+                        url, title, last_updated, added_by, added_at, topic_id,
+                        etag, last_modified, fingerprint, info_hash, next_check_at, check_interval
+                    )
+                    SELECT ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?
+                    WHERE NOT EXISTS (SELECT 1 FROM series WHERE topic_id = ?)
+                    """,
+                    (
+                        item["url"], item["title"], item["last_updated"], added_by, added_at, topic_id,
+                        item.get("etag"), item.get("last_modified"), item.get("fingerprint"),
+                        item.get("info_hash"), item.get("next_check_at"), item.get("check_interval"),
+                        topic_id
+                    )
+                )
+                if cursor.rowcount:
+                    added[item["url"]] = cursor.lastrowid
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка массового добавления сериалов: {e}")
+        return None
+    return added
+
+@timed(DB_QUERY_SECONDS)
+def create_job(kind, created_by, chat_id, owner, lease_seconds):
+    """
+    Создать фоновую задачу, если задача того же типа еще не выполняется.
+
+    Задача арендуется процессом owner на lease_seconds секунд; процесс продлевает аренду,
+    пока задача в очереди или выполняется. Задача с истекшей арендой (процесс остановился)
+    помечается прерванной и не мешает создать новую.
+
+    Returns:
+        int: ID новой задачи; 0, если задача такого типа уже в очереди или выполняется; None при ошибке
+    """
+    now = time.time()
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            # BEGIN IMMEDIATE исключает гонку между проверкой и вставкой
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute(
+                """
+                UPDATE jobs SET status = ?, finished_at = ?
+                WHERE kind = ? AND status IN (?, ?) AND (lease_expires_at IS NULL OR lease_expires_at < ?)
+                """,
+                (JOB_INTERRUPTED, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), kind, JOB_QUEUED, JOB_RUNNING, now)
+            )
+            if cursor.rowcount:
+                logger.warning(f"Задачи {kind} остановившихся процессов помечены прерванными: {cursor.rowcount}")
+            cursor.execute(
+                "SELECT 1 FROM jobs WHERE kind = ? AND status IN (?, ?)",
+                (kind, JOB_QUEUED, JOB_RUNNING)
+            )
+            if cursor.fetchone():
+                return 0
+            cursor.execute(
+                """
+                INSERT INTO jobs (kind, status, created_by, chat_id, created_at, owner, lease_expires_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (kind, JOB_QUEUED, created_by, chat_id, datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                 owner, now + lease_seconds)
+            )
+            return cursor.lastrowid
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка создания задачи {kind}: {e}")
+        return None
+
+@timed(DB_QUERY_SECONDS)
+def renew_job_leases(owner, expires_at):
+    """Продлить аренду задач owner, которые в очереди или выполняются."""
+    query = "UPDATE jobs SET lease_expires_at = ? WHERE owner = ? AND status IN (?, ?)"
+    return execute_query(query, (expires_at, owner, JOB_QUEUED, JOB_RUNNING))
+
+@timed(DB_QUERY_SECONDS)
+def update_job(job_id, status=None, message_id=None, total=None, done=None, failed=None):
+    """Обновить статус и прогресс фоновой задачи."""
+    fields = {"status": status, "message_id": message_id, "total": total, "done": done, "failed": failed}
+    fields = {name: value for name, value in fields.items() if value is not None}
+    if not fields:
+        return True
+    query = "UPDATE jobs SET " + ", ".join(f"{name} = ?" for name in fields) + " WHERE id = ?"
+    return execute_query(query, (*fields.values(), job_id))
+
+@timed(DB_QUERY_SECONDS)
+def finish_job(job_id, status, result=None):
+    """Завершить фоновую задачу с итоговым статусом и текстом результата."""
+    query = "UPDATE jobs SET status = ?, result = ?, finished_at = ? WHERE id = ?"
+    return execute_query(query, (status, result, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), job_id))
+
+@timed(DB_QUERY_SECONDS)
+def get_active_jobs():
+    """Получить задачи в очереди и выполняющиеся: список (id, kind, status, total, done, failed)."""
+    query = """
+        SELECT id, kind, status, total, done, failed FROM jobs
+        WHERE status IN (?, ?) AND lease_expires_at >= ? ORDER BY id
+    """
+    return execute_query(query, (JOB_QUEUED, JOB_RUNNING, time.time()), fetchall=True) or []
+
+@timed(DB_QUERY_SECONDS)
 def get_all_users():
     """Получить список всех пользователей."""
     query = "SELECT user_id, username, is_admin FROM users"
     return execute_query(query, fetchall=True)
 
+# Кеш прав доступа: множества ID пользователей и администраторов.
+# Загружается один раз и сбрасывается при изменении таблицы users.
+_access_cache = None
+_access_generation = 0
+_access_lock = threading.Lock()
+
+def invalidate_access_cache():
+    """Сбросить кеш прав доступа (после изменения пользователей)."""
+    global _access_cache, _access_generation
+    _access_generation += 1
+    _access_cache = None
+
+@timed(DB_QUERY_SECONDS)
+def load_access_rows():
+    return execute_query("SELECT user_id, is_admin FROM users", fetchall=True)
+
+def get_access_cache():
+    """
+    Получить кеш прав доступа, загрузив его из базы при необходимости.
+
+    Returns:
+        tuple: (множество ID пользователей, множество ID администраторов) или None при ошибке базы
+    """
+    global _access_cache
+    cache = _access_cache
+    if cache is not None:
+        return cache
+    with _access_lock:
+        cache = _access_cache
+        if cache is not None:
+            return cache
+        generation = _access_generation
+        rows = load_access_rows()
+        if rows is None:
+            return None
+        cache = (
+            frozenset(row[0] for row in rows),
+            frozenset(row[0] for row in rows if row[1]),
+        )
+        # Не сохранять кеш, если пользователи изменились во время загрузки
+        if generation == _access_generation:
+            _access_cache = cache
+        logger.debug(f"Кеш прав доступа загружен: пользователей {len(rows)}")
+        return cache
+
+@timed(DB_QUERY_SECONDS)
 def add_user(user_id, username, is_admin=False):
     """Добавить пользователя в базу данных."""
     query = """
@@ -109,17 +693,25 @@ def add_user(user_id, username, is_admin=False):
         VALUES (?, ?, ?, ?)
     """
     params = (user_id, username, 1 if is_admin else 0, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-    return execute_query(query, params)
+    result = execute_query(query, params)
+    invalidate_access_cache()
+    return result
 
+@timed(DB_QUERY_SECONDS)
 def remove_user(user_id):
     """Удалить пользователя из базы данных."""
     query = "DELETE FROM users WHERE user_id = ?"
-    return execute_query(query, (user_id,))
+    result = execute_query(query, (user_id,))
+    invalidate_access_cache()
+    return result
 
+@timed(DB_QUERY_SECONDS)
 def make_admin(user_id):
     """Сделать пользователя администратором."""
     query = "UPDATE users SET is_admin = 1 WHERE user_id = ?"
-    return execute_query(query, (user_id,))
+    result = execute_query(query, (user_id,))
+    invalidate_access_cache()
+    return result
 
 def is_user_allowed(user_id, admin_required=False):
     """
@@ -132,26 +724,17 @@ def is_user_allowed(user_id, admin_required=False):
     Returns:
         bool: True, если пользователь имеет доступ, False в противном случае
     """
-    try:
-        with sqlite3.connect(DB_FILE) as conn:
-            cursor = conn.cursor()
-            if admin_required:
-                cursor.execute("SELECT 1 FROM users WHERE user_id = ? AND is_admin = 1", (user_id,))
-            else:
-                cursor.execute("SELECT 1 FROM users WHERE user_id = ?", (user_id,))
-            return cursor.fetchone() is not None
-    except sqlite3.Error as e:
-        logger.error(f"Ошибка проверки пользователя: {e}")
+    cache = get_access_cache()
+    if cache is None:
+        logger.error("Ошибка проверки пользователя: не удалось загрузить список пользователей")
         return False
+    users, admins = cache
+    return user_id in (admins if admin_required else users)
 
 def has_admins():
     """Проверить наличие администраторов в базе данных."""
-    try:
-        with sqlite3.connect(DB_FILE) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM users WHERE is_admin = 1")
-            count = cursor.fetchone()[0]
-            return count > 0
-    except sqlite3.Error as e:
-        logger.error(f"Ошибка проверки наличия администраторов: {e}")
+    cache = get_access_cache()
+    if cache is None:
+        logger.error("Ошибка проверки наличия администраторов: не удалось загрузить список пользователей")
         return False
+    return bool(cache[1])
@@ -0,0 +1,98 @@
+"""
+Кеш результатов запросов к RuTracker с объединением одновременных запросов (single-flight).
+
+Если несколько потоков одновременно запрашивают один и тот же ключ, запрос к серверу
+выполняет только первый, остальные ждут его результат. Удачные результаты хранятся
+ограниченное время (ttl) в LRU-кеше ограниченного размера; None (ошибка) не кешируется.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+class Flight:
+    """Выполняющийся запрос, результат которого ждут другие потоки."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+class SingleFlightCache:
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.entries = OrderedDict()  # ключ -> (время сохранения, значение)
+        self.flights = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+
+    def _fresh(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    def peek(self, key):
+        """Значение из кеша, если оно еще действительно, без запроса."""
+        with self.lock:
+            return self._fresh(key)
+
+    def put(self, key, value):
+        if self.ttl <= 0 or self.max_size <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def get(self, key, loader, force=False):
+        """
+        Получить значение по ключу: из кеша, из уже выполняющегося запроса или вызвав loader().
+
+        Args:
+            force: не брать значение из кеша; одновременный запрос того же ключа все равно
+                объединяется — он начат не раньше текущего и дает свежий результат
+        """
+        with self.lock:
+            if not force:
+                value = self._fresh(key)
+                if value is not None:
+                    self.hits += 1
+                    return value
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = Flight()
+                self.misses += 1
+            else:
+                self.shared += 1
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        try:
+            flight.value = loader()
+            if flight.value is not None:
+                self.put(key, flight.value)
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.event.set()
+
+    def stats(self):
+        """Счетчики: hits — из кеша, misses — запросы к серверу, shared — ожидания чужого запроса."""
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "shared": self.shared, "size": len(self.entries)}
@@ -0,0 +1,231 @@
+"""
+HTTP-транспорт клиентов RuTracker.
+
+create_session() возвращает requests.Session с пулом соединений под число потоков проверки,
+повторами с экспоненциальной паузой при ошибках соединения и ответах 5xx, сжатием gzip/br
+и прокси, заданным один раз для всей сессии. При RUTRACKER_HTTP2=1 и установленном
+httpx[http2] вместо нее используется Http2Session: параллельные проверки делят
+несколько HTTP/2-соединений через прокси. create_async_session() — то же для asyncio-режима
+(async_main.py) поверх httpx.AsyncClient.
+"""
+import asyncio
+import logging
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry, make_headers
+from config import RUTRACKER_POOL_SIZE, RUTRACKER_RETRIES, RUTRACKER_RETRY_BACKOFF, RUTRACKER_HTTP2
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = (500, 502, 503, 504)
+
+# Методы, которые можно безопасно повторить; POST (вход) не повторяется
+RETRY_METHODS = frozenset(["GET", "HEAD", "OPTIONS"])
+
+def retryable(method, error=None):
+    """
+    Можно ли повторить запрос method: после ошибки установки соединения (запрос не отправлен) —
+    при любом методе, после других ошибок и ответов 5xx — только для RETRY_METHODS, как Retry у requests.
+    """
+    if method.upper() in RETRY_METHODS:
+        return True
+    import httpx
+    return isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout))
+
+def httpx_transport_options(httpx, proxies, pool_size):
+    """Общие параметры транспортов httpx: прокси и размер пула (повторы выполняют сессии)."""
+    return {
+        "proxy": (proxies or {}).get("https") or (proxies or {}).get("http"),
+        "retries": 0,
+        "limits": httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+    }
+
+def accept_encoding():
+    """Поддерживаемые методы сжатия: gzip и deflate всегда, br — если установлен brotli."""
+    return make_headers(accept_encoding=True)["accept-encoding"]
+
+def create_session(proxies=None, pool_size=RUTRACKER_POOL_SIZE, retries=RUTRACKER_RETRIES,
+                   backoff=RUTRACKER_RETRY_BACKOFF, http2=RUTRACKER_HTTP2):
+    """
+    Создать HTTP-сессию для запросов к RuTracker.
+
+    Args:
+        proxies: словарь прокси в формате requests ({"http": url, "https": url})
+        pool_size: число соединений, которые сессия держит открытыми для одного хоста
+        retries: число повторов при ошибках соединения и ответах 5xx
+        backoff: начальная пауза между повторами, с (удваивается с каждым повтором)
+        http2: использовать httpx с HTTP/2, если он установлен
+    """
+    if http2:
+        try:
+            return Http2Session(proxies, pool_size, retries, backoff)
+        except ImportError:
+            logger.warning("RUTRACKER_HTTP2=1, но httpx[http2] не установлен; используется requests")
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=2,
+        pool_maxsize=pool_size,
+        max_retries=Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=RETRY_METHODS,
+            # После последнего повтора возвращается сам ответ 5xx, чтобы его учел предохранитель
+            raise_on_status=False
+        )
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["Accept-Encoding"] = accept_encoding()
+    if proxies:
+        session.proxies.update(proxies)
+    return session
+
+class Http2Response:
+    """Ответ httpx с интерфейсом requests.Response в объеме, который использует RutrackerClient."""
+
+    def __init__(self, response):
+        self.response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.url = str(response.url)
+        self.cookies = response.cookies
+        self.history = [Http2Response(item) for item in response.history]
+
+    @property
+    def encoding(self):
+        return self.response.charset_encoding
+
+    @property
+    def content(self):
+        return self.response.read()
+
+    @property
+    def text(self):
+        self.response.read()
+        return self.response.text
+
+    def json(self):
+        self.response.read()
+        return self.response.json()
+
+    def iter_content(self, chunk_size=None):
+        return self.response.iter_bytes(chunk_size)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+
+    def close(self):
+        self.response.close()
+
+class Http2Session:
+    """
+    Замена requests.Session поверх httpx.Client(http2=True).
+
+    Cookie хранятся в том же RequestsCookieJar, что и у requests, поэтому сохранение
+    и загрузка сессии RuTracker работают без изменений. Ошибки соединения httpx
+    преобразуются в requests.ConnectionError.
+
+    Повторы выполняет только request(), как Retry у requests: ошибка установки соединения
+    повторяется для любого метода, остальные ошибки и ответы 5xx — только для RETRY_METHODS.
+    Транспорт httpx создается без собственных повторов, иначе их число перемножалось бы.
+    """
+
+    def __init__(self, proxies, pool_size, retries, backoff):
+        import httpx
+        import h2  # noqa: F401 — без него httpx молча использует HTTP/1.1
+        self.httpx = httpx
+        self.retries = retries
+        self.backoff = backoff
+        self.cookies = requests.cookies.RequestsCookieJar()
+        self.client = httpx.Client(
+            transport=httpx.HTTPTransport(http2=True, **httpx_transport_options(httpx, proxies, pool_size)),
+            cookies=self.cookies,
+            headers={"Accept-Encoding": accept_encoding()},
+            follow_redirects=True
+        )
+
+    def request(self, method, url, params=None, data=None, headers=None, timeout=None, stream=False):
+        for attempt in range(self.retries + 1):
+            last = attempt == self.retries
+            try:
+                request = self.client.build_request(
+                    method, url, params=params, data=data, headers=headers, timeout=timeout
+                )
+                response = self.client.send(request, stream=stream)
+            except self.httpx.TransportError as e:
+                if last or not retryable(method, e):
+                    raise requests.ConnectionError(str(e)) from e
+            else:
+                if last or response.status_code not in RETRY_STATUSES or not retryable(method):
+                    return Http2Response(response)
+                response.close()
+            time.sleep(self.backoff * 2 ** attempt)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def close(self):
+        self.client.close()
+
+def create_async_session(cookies, proxies=None, pool_size=RUTRACKER_POOL_SIZE, retries=RUTRACKER_RETRIES,
+                         backoff=RUTRACKER_RETRY_BACKOFF, http2=RUTRACKER_HTTP2):
+    """
+    Создать асинхронную HTTP-сессию для запросов к RuTracker (нужен httpx).
+
+    Args:
+        cookies: CookieJar, общий с синхронной сессией клиента: вход выполняет синхронный клиент
+        остальные: как у create_session
+    """
+    return AsyncHttpSession(cookies, proxies, pool_size, retries, backoff, http2)
+
+class AsyncHttpSession:
+    """
+    Сессия httpx.AsyncClient с теми же повторами, что у Http2Session.
+
+    request() возвращает httpx.Response; ошибки соединения преобразуются в requests.ConnectionError,
+    чтобы их одинаково учитывал предохранитель клиента.
+    """
+
+    def __init__(self, cookies, proxies, pool_size, retries, backoff, http2):
+        import httpx
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("RUTRACKER_HTTP2=1, но h2 не установлен; используется HTTP/1.1")
+                http2 = False
+        self.httpx = httpx
+        self.retries = retries
+        self.backoff = backoff
+        self.client = httpx.AsyncClient(
+            transport=httpx.AsyncHTTPTransport(http2=http2, **httpx_transport_options(httpx, proxies, pool_size)),
+            cookies=cookies,
+            headers={"Accept-Encoding": accept_encoding()},
+            follow_redirects=True
+        )
+
+    async def request(self, method, url, params=None, data=None, headers=None, timeout=None, stream=False):
+        for attempt in range(self.retries + 1):
+            last = attempt == self.retries
+            try:
+                request = self.client.build_request(
+                    method, url, params=params, data=data, headers=headers, timeout=timeout
+                )
+                response = await self.client.send(request, stream=stream)
+            except self.httpx.TransportError as e:
+                if last or not retryable(method, e):
+                    raise requests.ConnectionError(str(e)) from e
+            else:
+                if last or response.status_code not in RETRY_STATUSES or not retryable(method):
+                    return response
+                await response.aclose()
+            await asyncio.sleep(self.backoff * 2 ** attempt)
+
+    async def aclose(self):
+        await self.client.aclose()
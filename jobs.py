@@ -0,0 +1,133 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from database import (
+    create_job, update_job, finish_job, renew_job_leases,
+    JOB_RUNNING, JOB_DONE, JOB_FAILED
+)
+from config import JOB_WORKERS, JOB_PROGRESS_INTERVAL, CHECKER_ID, CHECK_LEASE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+class JobProgress:
+    """Прогресс фоновой задачи: одно сообщение в чате, редактируемое не чаще раза в interval секунд."""
+
+    def __init__(self, sender, job_id, title, chat_id, message_id, total, interval):
+        self.sender = sender
+        self.job_id = job_id
+        self.title = title
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self.failed = 0
+        self.last_edit = 0.0
+        self.lock = threading.Lock()
+
+    def text(self):
+        return f"{self.title}: обработано {self.done} из {self.total}, ошибок: {self.failed}"
+
+    def advance(self, ok=True):
+        """Отметить обработку одного элемента; вызывается из рабочих потоков."""
+        with self.lock:
+            self.done += 1
+            if not ok:
+                self.failed += 1
+            if time.monotonic() - self.last_edit < self.interval:
+                return
+            self.last_edit = time.monotonic()
+            text = self.text()
+            done, failed = self.done, self.failed
+        update_job(self.job_id, done=done, failed=failed)
+        self.edit(text)
+
+    def edit(self, text):
+        """Заменить текст сообщения о прогрессе."""
+        if self.message_id is None:
+            return
+        try:
+            self.sender.edit_message_text(text, chat_id=self.chat_id, message_id=self.message_id)
+        except Exception as e:
+            # В том числе "message is not modified", если прогресс не изменился
+            logger.debug(f"Не удалось обновить сообщение о прогрессе задачи {self.job_id}: {e}")
+
+    def finish(self, text):
+        """Показать итог задачи: в сообщении о прогрессе или отдельным сообщением."""
+        if self.message_id is not None:
+            self.edit(text)
+            return
+        try:
+            self.sender.send_message(self.chat_id, text)
+        except Exception as e:
+            logger.error(f"Не удалось отправить итог задачи {self.job_id}: {e}")
+
+class JobManager:
+    """
+    Фоновые задачи бота (полные проходы по сериалам).
+
+    Сообщения о прогрессе отправляются через TelegramSender.
+    Задачи сохраняются в таблицу jobs и выполняются в ограниченном пуле потоков,
+    поэтому обработчик Telegram возвращается сразу. Задача того же типа,
+    пока предыдущая в очереди или выполняется, отклоняется.
+    Задачи принадлежат процессу owner, который продлевает их аренду, пока работает.
+    """
+
+    def __init__(self, sender, workers=JOB_WORKERS, progress_interval=JOB_PROGRESS_INTERVAL,
+                 owner=CHECKER_ID, lease_seconds=CHECK_LEASE_SECONDS):
+        self.sender = sender
+        self.progress_interval = progress_interval
+        self.owner = owner
+        self.lease_seconds = lease_seconds
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        threading.Thread(target=self._renew_leases, name="job-lease-renewer", daemon=True).start()
+
+    def _renew_leases(self):
+        while True:
+            time.sleep(self.lease_seconds / 3)
+            renew_job_leases(self.owner, time.time() + self.lease_seconds)
+
+    def submit(self, kind, title, chat_id, user_id, total, func):
+        """
+        Поставить задачу в очередь.
+
+        Args:
+            kind: тип задачи; одновременно выполняется не более одной задачи каждого типа
+            title: название задачи для сообщения о прогрессе
+            total: число обрабатываемых элементов
+            func: функция func(progress), возвращающая итоговый текст для пользователя
+
+        Returns:
+            int: ID задачи; 0, если задача этого типа уже выполняется; None при ошибке
+        """
+        job_id = create_job(kind, user_id, chat_id, self.owner, self.lease_seconds)
+        if not job_id:
+            return job_id
+        message_id = None
+        try:
+            message = self.sender.send_message(chat_id, f"{title}: в очереди", wait=True)
+            message_id = message.message_id
+        except Exception as e:
+            logger.error(f"Не удалось отправить сообщение о задаче {job_id}: {e}")
+        update_job(job_id, message_id=message_id, total=total)
+        progress = JobProgress(self.sender, job_id, title, chat_id, message_id, total, self.progress_interval)
+        self.executor.submit(self._run, job_id, kind, progress, func)
+        logger.info(f"Задача {kind} #{job_id} поставлена в очередь")
+        return job_id
+
+    def _run(self, job_id, kind, progress, func):
+        update_job(job_id, status=JOB_RUNNING)
+        progress.edit(progress.text())
+        started = time.monotonic()
+        try:
+            result = func(progress)
+        except Exception as e:
+            logger.error(f"Ошибка выполнения задачи {kind} #{job_id}: {e}")
+            finish_job(job_id, JOB_FAILED, str(e))
+            progress.finish(f"{progress.title}: ошибка выполнения задачи.")
+            return
+        update_job(job_id, done=progress.done, failed=progress.failed)
+        finish_job(job_id, JOB_DONE, result)
+        logger.info(f"Задача {kind} #{job_id} завершена за {time.monotonic() - started:.1f} с")
+        progress.finish(result)
@@ -0,0 +1,20 @@
+import logging
+from logging.handlers import RotatingFileHandler
+import os
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FILE = "bot.log"
+
+def setup_logging():
+    """Настройка логирования в файл и консоль."""
+    formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    file_handler = RotatingFileHandler(LOG_FILE, maxBytes=5*1024*1024, backupCount=5, encoding='utf-8')
+    file_handler.setFormatter(formatter)
+    file_handler.setLevel(LOG_LEVEL)
+
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(formatter)
+    console_handler.setLevel(LOG_LEVEL)
+
+    logging.basicConfig(level=LOG_LEVEL, handlers=[file_handler, console_handler])
@@ -1,116 +1,155 @@
 import logging
-from logging.handlers import RotatingFileHandler
-import os
 import threading
 import time
-from bot import bot
-from database import init_db, get_all_series, update_series
-from rutracker_client import RutrackerClient
-from qbittorrent_client import QBittorrentClient
-from config import CHECK_INTERVAL
-
-# --- Настройка логирования ---
-LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
-LOG_FILE = "bot.log"
-
-formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-
-file_handler = RotatingFileHandler(LOG_FILE, maxBytes=5*1024*1024, backupCount=5, encoding='utf-8')
-file_handler.setFormatter(formatter)
-file_handler.setLevel(LOG_LEVEL)
-
-console_handler = logging.StreamHandler()
-console_handler.setFormatter(formatter)
-console_handler.setLevel(LOG_LEVEL)
-
-logging.basicConfig(level=LOG_LEVEL, handlers=[file_handler, console_handler])
+from urllib.parse import urlparse
+from checker import run_due_checks, check_pages
+from database import init_db
+from clients import (
+    get_rutracker, get_qbittorrent, get_rutracker_api, start_health_monitor,
+    is_rutracker_available, is_qbittorrent_available
+)
+from scheduler import CheckScheduler
+from webhook_server import WebhookServer
+from metrics import MetricsServer
+from config import (
+    CHECK_INTERVAL, BOT_MODE, WEBHOOK_URL, WEBHOOK_LISTEN, WEBHOOK_PORT,
+    WEBHOOK_SECRET, WEBHOOK_WORKERS, WEBHOOK_QUEUE_SIZE, METRICS_PORT, METRICS_LISTEN, HEALTH_PROBE_INTERVAL
+)
+from log_config import setup_logging
+
+setup_logging()
 
 logger = logging.getLogger(__name__)
 
 # Флаг для остановки фоновых потоков
 stop_event = threading.Event()
 
-def check_series_updates(rutracker, qbittorrent):
-    """Проверка обновлений сериалов."""
+def check_series_updates(check_pages=check_pages):
+    """
+    Проверка обновлений сериалов по адаптивному расписанию.
+
+    Args:
+        check_pages: проверка страниц сериалов (см. checker.run_check_cycle)
+    """
+    scheduler = CheckScheduler()
     while not stop_event.is_set():
+        wait = CHECK_INTERVAL
         try:
-            logger.info("Запуск проверки обновлений сериалов...")
-            series_list = get_all_series()
-            if not series_list:
-                logger.info("Нет сериалов для проверки")
-                time.sleep(CHECK_INTERVAL)
+            # Клиенты общие с ботом; неудачная инициализация повторяется на следующей итерации
+            rutracker = get_rutracker()
+            qbittorrent = get_qbittorrent()
+            if rutracker is None:
+                logger.error("RutrackerClient не инициализирован")
+                stop_event.wait(wait)
+                continue
+            if qbittorrent is None:
+                logger.error("QBittorrentClient не инициализирован")
+                stop_event.wait(wait)
+                continue
+            if rutracker.breaker.is_open:
+                # Проверка отложена до восстановления связи (см. clients.probe_clients)
+                logger.warning("RuTracker недоступен, проверка обновлений отложена")
+                stop_event.wait(min(wait, HEALTH_PROBE_INTERVAL))
                 continue
 
-            for series in series_list:
-                series_id, url, title, last_updated, added_by, added_at = series
-                logger.info(f"Проверка сериала: {title}, последнее обновление: {last_updated}")
-
-                if rutracker is None:
-                    logger.error("RutrackerClient не инициализирован")
-                    continue
-                if qbittorrent is None:
-                    logger.error("QBittorrentClient не инициализирован")
-                    continue
-
-                page_info = rutracker.get_page_info(url)
-                if not page_info:
-                    logger.error(f"Не удалось получить информацию о странице {url}")
-                    continue
-
-                if page_info["time_text"] != last_updated:
-                    logger.info(f"Обнаружено обновление для {title}")
-                    tag = f"id_{series_id}"
-                    qbittorrent.delete_torrent_by_tag(tag, delete_files=False)
-                    update_series(series_id, title=page_info["title"], last_updated=page_info["time_text"])
-                    torrent_data = rutracker.download_torrent(page_info["topic_id"])
-                    if torrent_data and qbittorrent.add_torrent(torrent_data, page_info["title"], tags=tag):
-                        logger.info(f"Торрент для {title} добавлен в qBittorrent")
-                    else:
-                        logger.error(f"Не удалось добавить торрент для {title}")
-
-                time.sleep(5)
-
-            logger.info("Проверка обновлений завершена")
+            run_due_checks(scheduler, rutracker, qbittorrent, get_rutracker_api(), check_pages)
+            next_in = scheduler.seconds_until_next()
+            if next_in is not None:
+                wait = min(wait, next_in)
         except Exception as e:
             logger.error(f"Ошибка при проверке обновлений: {e}")
-            time.sleep(30)  # Задержка при ошибке
-        time.sleep(CHECK_INTERVAL)
-
-def main():
-    """Основная функция."""
+            wait = 30  # Задержка при ошибке
+        stop_event.wait(max(1.0, wait))
+
+def run_webhook(bot):
+    """Получение обновлений через webhook со встроенным HTTP-сервером."""
+    # Обработчики выполняются в рабочих потоках сервера, размер очереди ограничен
+    bot.threaded = False
+    server = WebhookServer(
+        bot,
+        host=WEBHOOK_LISTEN,
+        port=WEBHOOK_PORT,
+        path=urlparse(WEBHOOK_URL).path or "/",
+        secret=WEBHOOK_SECRET,
+        workers=WEBHOOK_WORKERS,
+        queue_size=WEBHOOK_QUEUE_SIZE
+    )
+    server.start()
+    try:
+        bot.remove_webhook()
+        bot.set_webhook(url=WEBHOOK_URL, secret_token=WEBHOOK_SECRET)
+        logger.info(f"Webhook установлен: {WEBHOOK_URL}")
+        while not stop_event.wait(3600):
+            pass
+    finally:
+        server.stop()
+
+def start_metrics_server():
+    """Запустить сервер метрик и /healthz, если задан METRICS_PORT."""
+    if not METRICS_PORT:
+        return None
+    try:
+        server = MetricsServer(
+            METRICS_LISTEN,
+            METRICS_PORT,
+            lambda: {
+                "rutracker": is_rutracker_available(create=False),
+                "qbittorrent": is_qbittorrent_available(create=False)
+            }
+        )
+        server.start()
+        return server
+    except OSError as e:
+        logger.error(f"Не удалось запустить сервер метрик на порту {METRICS_PORT}: {e}")
+        return None
+
+def init_database():
+    """Инициализировать базу данных, повторяя попытки до успеха."""
     while True:
         try:
             init_db()
             logger.info("База данных инициализирована")
+            return
+        except Exception as e:
+            logger.error(f"Ошибка инициализации базы данных: {e}")
+            time.sleep(30)
 
-            try:
-                rutracker = RutrackerClient()
-            except Exception as e:
-                logger.error(f"Ошибка инициализации RutrackerClient: {e}")
-                rutracker = None
-
-            try:
-                qbittorrent = QBittorrentClient()
-            except Exception as e:
-                logger.error(f"Ошибка инициализации QBittorrentClient: {e}")
-                qbittorrent = None
-
-            if rutracker is None or qbittorrent is None:
-                logger.error("Один из клиентов не инициализирован. Бот будет работать только с доступными функциями.")
-
-            update_thread = threading.Thread(target=check_series_updates, args=(rutracker, qbittorrent), daemon=True)
-            update_thread.start()
-            logger.info("Фоновый поток для проверки обновлений запущен")
-
-            logger.info("Запуск бота...")
-            bot.polling(none_stop=True, interval=0)
-        except KeyboardInterrupt:
-            logger.info("Получен сигнал на остановку")
-            stop_event.set()
-            break
+def run_bot():
+    """Получение обновлений Telegram (polling или webhook) с перезапуском при ошибках."""
+    # Бот импортируется только здесь: при BOT_MODE=none токен Telegram не нужен
+    from bot import bot
+    while not stop_event.is_set():
+        try:
+            if BOT_MODE == "webhook":
+                run_webhook(bot)
+            else:
+                logger.info("Запуск бота...")
+                bot.polling(none_stop=True, interval=0)
         except Exception as e:
             logger.error(f"Ошибка в главном цикле: {e}")
-            time.sleep(30)  # Задержка перед повторным запуском
+            stop_event.wait(30)  # Задержка перед повторным запуском
+
+def main():
+    """Основная функция."""
+    start_metrics_server()
+    init_database()
+    # Клиенты создаются в фоновом потоке при первой проверке, бот отвечает сразу
+    update_thread = threading.Thread(target=check_series_updates, daemon=True)
+    update_thread.start()
+    logger.info("Фоновый поток для проверки обновлений запущен")
+    # Монитор переподключает клиенты этого процесса, в том числе при BOT_MODE=none:
+    # без него цикл проверки не дождется замыкания предохранителя RuTracker
+    start_health_monitor(stop_event)
+    try:
+        if BOT_MODE == "none":
+            logger.info("BOT_MODE=none: только проверка обновлений, бот не запускается")
+            while not stop_event.wait(3600):
+                pass
+        else:
+            run_bot()
+    except KeyboardInterrupt:
+        logger.info("Получен сигнал на остановку")
+        stop_event.set()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
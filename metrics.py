@@ -0,0 +1,244 @@
+"""
+Встроенные метрики в формате Prometheus и HTTP-сервер с /metrics и /healthz.
+
+Сервер включается переменной METRICS_PORT (0 — выключен).
+"""
+import inspect
+import json
+import logging
+import threading
+import time
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+CYCLE_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600, 1200, 3600)
+
+_registry = []
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in zip(names, values)) + "}"
+
+class Counter:
+    """Счетчик с метками."""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def collect(self):
+        with self.lock:
+            values = dict(self.values)
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{format_labels(self.labelnames, key)} {value}")
+        return lines
+
+class Histogram:
+    """Гистограмма длительностей с метками."""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.values = {}
+        self.lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [[0] * len(self.buckets), 0, 0.0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][index] += 1
+            state[1] += 1
+            state[2] += value
+
+    def collect(self):
+        with self.lock:
+            values = {key: (list(state[0]), state[1], state[2]) for key, state in self.values.items()}
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ("le",)
+        for key, (buckets, count, total) in sorted(values.items()):
+            for bound, bucket_count in zip(self.buckets, buckets):
+                lines.append(f"{self.name}_bucket{format_labels(names, key + (bound,))} {bucket_count}")
+            lines.append(f"{self.name}_bucket{format_labels(names, key + ('+Inf',))} {count}")
+            lines.append(f"{self.name}_sum{format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{format_labels(self.labelnames, key)} {count}")
+        return lines
+
+class CallbackCounter:
+    """Счетчик, значения которого при каждом запросе /metrics берутся из функции {метка: значение}."""
+
+    def __init__(self, name, documentation, labelname, func):
+        self.name = name
+        self.documentation = documentation
+        self.labelname = labelname
+        self.func = func
+        _registry.append(self)
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for label, value in sorted(self.func().items()):
+            lines.append(f"{self.name}{format_labels((self.labelname,), (label,))} {value}")
+        return lines
+
+def is_none(result):
+    return result is None
+
+def is_false(result):
+    return result is False
+
+def timed(histogram, errors=None, failed=is_none):
+    """
+    Декоратор: записать длительность вызова в histogram с меткой method=имя функции.
+
+    Если задан счетчик errors, он увеличивается при исключении или если failed(результат) истинно.
+    Корутины (asyncio-режим) измеряются до завершения, а не до создания корутины.
+    """
+    def decorator(func):
+        method = func.__name__
+
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                ok = False
+                try:
+                    result = await func(*args, **kwargs)
+                    ok = not failed(result)
+                    return result
+                finally:
+                    histogram.observe(time.perf_counter() - started, method=method)
+                    if errors is not None and not ok:
+                        errors.inc(method=method)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            ok = False
+            try:
+                result = func(*args, **kwargs)
+                ok = not failed(result)
+                return result
+            finally:
+                histogram.observe(time.perf_counter() - started, method=method)
+                if errors is not None and not ok:
+                    errors.inc(method=method)
+        return wrapper
+    return decorator
+
+def render():
+    """Все метрики в текстовом формате Prometheus."""
+    lines = []
+    for metric in _registry:
+        try:
+            lines.extend(metric.collect())
+        except Exception as e:
+            logger.error(f"Ошибка сбора метрики {metric.name}: {e}")
+    return "\n".join(lines) + "\n"
+
+RUTRACKER_REQUEST_SECONDS = Histogram(
+    "telemon_rutracker_request_seconds", "Длительность запросов к RuTracker", ("method",)
+)
+RUTRACKER_ERRORS = Counter(
+    "telemon_rutracker_errors_total", "Неудачные запросы к RuTracker", ("method",)
+)
+QBITTORRENT_REQUEST_SECONDS = Histogram(
+    "telemon_qbittorrent_request_seconds", "Длительность вызовов QBittorrentClient", ("method",)
+)
+QBITTORRENT_ERRORS = Counter(
+    "telemon_qbittorrent_errors_total", "Неудачные вызовы QBittorrentClient", ("method",)
+)
+DB_QUERY_SECONDS = Histogram(
+    "telemon_db_query_seconds", "Длительность запросов к базе данных", ("method",)
+)
+CHECK_CYCLE_SECONDS = Histogram(
+    "telemon_check_cycle_seconds", "Длительность цикла проверки обновлений", buckets=CYCLE_BUCKETS
+)
+SERIES_CHECKED = Counter(
+    "telemon_series_checked_total", "Проверенные сериалы по результату", ("result",)
+)
+HANDLER_SECONDS = Histogram(
+    "telemon_telegram_handler_seconds", "Длительность обработчиков Telegram", ("method",)
+)
+HANDLER_ERRORS = Counter(
+    "telemon_telegram_handler_errors_total", "Исключения в обработчиках Telegram", ("method",)
+)
+
+class MetricsServer:
+    """HTTP-сервер с /metrics (Prometheus) и /healthz (без сетевых запросов)."""
+
+    def __init__(self, host, port, health_check):
+        """
+        Args:
+            health_check: функция, возвращающая {имя зависимости: доступна ли}; не должна обращаться к сети
+        """
+        self.health_check = health_check
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+
+    def _handler_class(self):
+        server = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split("?", 1)[0]
+                if path == "/metrics":
+                    status, content_type, body = 200, "text/plain; version=0.0.4", render()
+                elif path == "/healthz":
+                    status, content_type, body = server.health()
+                else:
+                    status, content_type, body = 404, "text/plain", "not found\n"
+                data = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                logger.debug(f"Metrics {self.address_string()}: {format % args}")
+
+        return MetricsHandler
+
+    def health(self):
+        try:
+            checks = {name: bool(ok) for name, ok in self.health_check().items()}
+        except Exception as e:
+            logger.error(f"Ошибка проверки состояния: {e}")
+            checks = {}
+        healthy = bool(checks) and all(checks.values())
+        body = json.dumps({"status": "ok" if healthy else "fail", "checks": checks})
+        return (200 if healthy else 503), "application/json", body + "\n"
+
+    def start(self):
+        thread = threading.Thread(target=self.httpd.serve_forever, name="metrics-server", daemon=True)
+        thread.start()
+        host, port = self.httpd.server_address[:2]
+        logger.info(f"Сервер метрик запущен на {host}:{port}")
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -1,15 +1,137 @@
 import logging
-import qbittorrentapi
+import threading
+import time
+from collections import Counter, defaultdict, namedtuple
 from config import (
     QBITTORRENT_URL,
     QBITTORRENT_USERNAME,
     QBITTORRENT_PASSWORD,
     QBITTORRENT_SAVE_PATH,
     QBITTORRENT_CATEGORY,  # добавлено для поддержки категории
+    QBITTORRENT_SYNC_INTERVAL,
 )
+from rate_limiter import qbittorrent_limiter
+from circuit_breaker import CircuitBreaker, GuardedProxy
+from tracing import traced
+from metrics import timed, is_false, CallbackCounter, QBITTORRENT_REQUEST_SECONDS, QBITTORRENT_ERRORS
+from torrent_utils import parse_torrent, compare_torrents, DECISION_SKIP, DECISION_FAST, DECISION_FULL
 
 logger = logging.getLogger(__name__)
 
+# Статистика решений при обновлении торрентов (для метрик)
+update_decisions = Counter()
+update_decisions_lock = threading.Lock()
+
+def record_update_decision(decision):
+    with update_decisions_lock:
+        update_decisions[decision] += 1
+
+def get_update_decisions():
+    """Получить количество принятых решений при обновлении торрентов по типам."""
+    with update_decisions_lock:
+        return dict(update_decisions)
+
+CallbackCounter(
+    "telemon_torrent_update_decisions_total", "Решения при обновлении торрентов", "decision",
+    get_update_decisions
+)
+
+TorrentRecord = namedtuple("TorrentRecord", "hash name tags category progress")
+
+def is_connection_failure(error):
+    """Ошибка связи с qBittorrent (сеть, 5xx, вход), а не отказ в конкретном запросе (4xx)."""
+    import qbittorrentapi
+    return isinstance(error, qbittorrentapi.APIConnectionError) and not isinstance(error, qbittorrentapi.HTTP4XXError)
+
+def split_tags(tags):
+    return [tag.strip() for tag in (tags or "").split(",") if tag.strip()]
+
+class TorrentIndex:
+    """
+    Локальное зеркало списка торрентов qBittorrent с индексами по тегу, категории и хешу.
+
+    Обновляется через sync/maindata: qBittorrent возвращает только изменения
+    с момента предыдущего запроса (rid), поэтому опрос почти ничего не передает.
+    """
+
+    def __init__(self, min_interval=QBITTORRENT_SYNC_INTERVAL):
+        self.min_interval = min_interval
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Сбросить зеркало: следующий запрос получит полный список торрентов."""
+        self.rid = 0
+        self.torrents = {}
+        self.by_tag = defaultdict(set)
+        self.by_category = defaultdict(set)
+        self.synced_at = 0.0
+        self.stale = True
+
+    def invalidate(self):
+        """Пометить зеркало устаревшим (после собственных изменений в qBittorrent)."""
+        self.stale = True
+
+    def refresh(self, client, limiter, force=False):
+        """Получить изменения через sync/maindata, если зеркало устарело."""
+        with self.lock:
+            if not force and not self.stale and time.monotonic() - self.synced_at < self.min_interval:
+                return
+            limiter.acquire()
+            data = client.sync_maindata(rid=self.rid)
+            if data.get("full_update"):
+                rid = self.rid
+                self.reset()
+                self.rid = rid
+            for torrent_hash, fields in (data.get("torrents") or {}).items():
+                self._update(torrent_hash, fields)
+            for torrent_hash in data.get("torrents_removed") or []:
+                self._remove(torrent_hash)
+            self.rid = data.get("rid", self.rid)
+            self.synced_at = time.monotonic()
+            self.stale = False
+
+    def _unindex(self, torrent_hash, entry):
+        for tag in split_tags(entry.get("tags")):
+            self.by_tag[tag].discard(torrent_hash)
+        self.by_category[entry.get("category") or ""].discard(torrent_hash)
+
+    def _update(self, torrent_hash, fields):
+        entry = self.torrents.get(torrent_hash)
+        if entry is None:
+            entry = self.torrents[torrent_hash] = {}
+        else:
+            self._unindex(torrent_hash, entry)
+        entry.update(fields)
+        for tag in split_tags(entry.get("tags")):
+            self.by_tag[tag].add(torrent_hash)
+        self.by_category[entry.get("category") or ""].add(torrent_hash)
+
+    def _remove(self, torrent_hash):
+        entry = self.torrents.pop(torrent_hash, None)
+        if entry is not None:
+            self._unindex(torrent_hash, entry)
+
+    def _record(self, torrent_hash):
+        entry = self.torrents[torrent_hash]
+        return TorrentRecord(
+            torrent_hash, entry.get("name", ""), entry.get("tags", ""),
+            entry.get("category", ""), entry.get("progress", 0)
+        )
+
+    def by_tags(self, tags):
+        """Получить торренты по тегам: {тег: [TorrentRecord]} (только найденные)."""
+        with self.lock:
+            return {
+                tag: [self._record(torrent_hash) for torrent_hash in self.by_tag[tag]]
+                for tag in tags if self.by_tag.get(tag)
+            }
+
+    def by_category_name(self, category):
+        """Получить торренты категории."""
+        with self.lock:
+            return [self._record(torrent_hash) for torrent_hash in self.by_category.get(category, ())]
+
 class QBittorrentClient:
     def __init__(self):
         self.url = QBITTORRENT_URL
@@ -18,18 +140,29 @@ class QBittorrentClient:
         self.save_path = QBITTORRENT_SAVE_PATH
         self.category = QBITTORRENT_CATEGORY if 'QBITTORRENT_CATEGORY' in globals() else ""
         self.client = None
+        self.limiter = qbittorrent_limiter
+        self.breaker = CircuitBreaker("qBittorrent")
+        self.index = TorrentIndex()
         self.connect()
 
+    @timed(QBITTORRENT_REQUEST_SECONDS, QBITTORRENT_ERRORS, failed=is_false)
     def connect(self):
         """Подключение к qBittorrent."""
         try:
-            self.client = qbittorrentapi.Client(
-                host=self.url,
-                username=self.username,
-                password=self.password
+            # Импорт qbittorrentapi заметно замедляет запуск, поэтому он выполняется при подключении
+            import qbittorrentapi
+            self.breaker.check()
+            self.limiter.acquire()
+            # Все вызовы API идут через предохранитель
+            self.client = GuardedProxy(
+                qbittorrentapi.Client(host=self.url, username=self.username, password=self.password),
+                self.breaker,
+                is_connection_failure
             )
             self.client.auth_log_in()
-            version = self.client.app.version
+            with self.index.lock:
+                self.index.reset()
+            version = self.client.app_version()
             logger.info(f"Успешное подключение к qBittorrent. Версия: {version}")
             return True
         except Exception as e:
@@ -37,9 +170,13 @@ class QBittorrentClient:
             self.client = None
             return False
 
-    def add_torrent(self, torrent_data, title="", tags="", category=None):
+    @traced("qb_add")
+    @timed(QBITTORRENT_REQUEST_SECONDS, QBITTORRENT_ERRORS, failed=is_false)
+    def add_torrent(self, torrent_data, title="", tags="", category=None, skip_checking=False):
         """
         Добавление торрента в qBittorrent.
+
+        skip_checking: не проверять уже скачанные данные (только если они заведомо совпадают).
         """
         try:
             if self.client is None:
@@ -56,89 +193,219 @@ class QBittorrentClient:
                 category = self.category
             if category:
                 options['category'] = category
+            if skip_checking:
+                options['is_skip_checking'] = True
 
+            self.limiter.acquire()
             self.client.torrents_add(
                 torrent_files=torrent_data,
                 **options
             )
+            self.index.invalidate()
             logger.info(f"Торрент '{title}' добавлен в qBittorrent с тегами: {tags}, категорией: {category}")
             return True
         except Exception as e:
             logger.error(f"Ошибка добавления торрента в qBittorrent: {e}")
             return False
 
+    @traced("qb_lookup")
+    @timed(QBITTORRENT_REQUEST_SECONDS)
+    def get_torrents_by_tags(self, tags):
+        """
+        Получить торренты для нескольких тегов из локального зеркала qBittorrent.
+
+        Returns:
+            dict: {тег: [торренты]} (только для тегов, у которых есть торренты)
+        """
+        self.index.refresh(self.client, self.limiter)
+        return self.index.by_tags(list(dict.fromkeys(tags)))
+
+    @traced("qb_delete")
+    @timed(QBITTORRENT_REQUEST_SECONDS)
+    def delete_hashes(self, hashes, delete_files=False):
+        """Удалить торренты по списку хешей одним запросом."""
+        if not hashes:
+            return
+        self.limiter.acquire()
+        self.client.torrents_delete(delete_files=delete_files, torrent_hashes=list(hashes))
+        self.index.invalidate()
+
     def delete_torrent_by_tag(self, tag, delete_files=False):
         """
         Удаляет все торренты с указанным тегом.
         """
+        return bool(self.delete_torrents_by_tags([tag], delete_files=delete_files))
+
+    @timed(QBITTORRENT_REQUEST_SECONDS)
+    def delete_torrents_by_tags(self, tags, delete_files=False):
+        """
+        Удаляет все торренты с указанными тегами (один запрос на поиск и один на удаление).
+
+        Returns:
+            list: теги, для которых были найдены и удалены торренты
+        """
         try:
             if self.client is None:
                 if not self.connect():
-                    return False
+                    return []
 
-            torrents = self.client.torrents_info(tag=tag)
-            if not torrents:
-                logger.info(f"Торренты с тегом '{tag}' не найдены")
-                return False
+            by_tag = self.get_torrents_by_tags(tags)
+            if not by_tag:
+                logger.info(f"Торренты с тегами {', '.join(tags)} не найдены")
+                return []
 
-            for torrent in torrents:
-                logger.info(f"Удаляю торрент: {torrent.name}")
-                self.client.torrents_delete(delete_files=delete_files, hashes=torrent.hash)
-
-            logger.info(f"Торрент(ы) с тегом '{tag}' успешно удалены")
-            return True
+            hashes = {torrent.hash for torrents in by_tag.values() for torrent in torrents}
+            self.delete_hashes(hashes, delete_files=delete_files)
+            logger.info(f"Удалено торрентов: {len(hashes)}, теги: {', '.join(by_tag)}")
+            return list(by_tag)
         except Exception as e:
             logger.error(f"Ошибка удаления торрентов по тегу: {e}")
-            return False
+            return []
+
+    @traced("qb_layout")
+    @timed(QBITTORRENT_REQUEST_SECONDS)
+    def get_torrent_layout(self, torrent):
+        """
+        Получить info hash, список файлов и хеши частей торрента.
+        """
+        self.limiter.acquire(3)
+        files = self.client.torrents_files(torrent_hash=torrent.hash)
+        properties = self.client.torrents_properties(torrent_hash=torrent.hash)
+        pieces = self.client.torrents_piece_hashes(torrent_hash=torrent.hash)
+        return {
+            "info_hash": torrent.hash,
+            "progress": torrent.progress,
+            "piece_size": properties.piece_size,
+            "pieces": list(pieces),
+            "files": [(item.name, item.size) for item in files],
+        }
+
+    def replace_torrent(self, tag, torrent_data, title="", category=None):
+        """
+        Обновить торрент с указанным тегом, по возможности без перехеширования.
+
+        Если info hash не изменился, торрент не трогается. Если изменились только
+        метаданные, а данные совпадают, новый торрент добавляется без проверки файлов.
+
+        Returns:
+            str: принятое решение (DECISION_*) или None при ошибке
+        """
+        return self.replace_torrents([(tag, torrent_data, title)], category=category).get(tag)
+
+    @timed(QBITTORRENT_REQUEST_SECONDS)
+    def replace_torrents(self, items, category=None):
+        """
+        Обновить несколько торрентов: один запрос на поиск старых торрентов,
+        один запрос на удаление и добавление только тех, что действительно изменились.
+
+        Args:
+            items: список кортежей (тег, данные торрент-файла, название)
+
+        Returns:
+            dict: {тег: решение DECISION_* или None при ошибке}
+        """
+        if not items:
+            return {}
+        try:
+            if self.client is None:
+                if not self.connect():
+                    return {tag: None for tag, _, _ in items}
+            by_tag = self.get_torrents_by_tags([tag for tag, _, _ in items])
+        except Exception as e:
+            logger.error(f"Ошибка получения списка торрентов из qBittorrent: {e}")
+            return {tag: None for tag, _, _ in items}
+
+        decisions = {}
+        for tag, torrent_data, title in items:
+            try:
+                new = parse_torrent(torrent_data)
+                old_torrents = by_tag.get(tag)
+                if not old_torrents:
+                    old = None
+                elif old_torrents[0].hash.lower() == new["info_hash"]:
+                    # Совпадение info hash видно без дополнительных запросов
+                    old = {"info_hash": old_torrents[0].hash, "files": []}
+                else:
+                    old = self.get_torrent_layout(old_torrents[0])
+                decision, reused = compare_torrents(old, new)
+            except Exception as e:
+                logger.error(f"Не удалось сравнить торренты с тегом '{tag}', торрент будет добавлен заново: {e}")
+                decision, reused = DECISION_FULL, 0
+            record_update_decision(decision)
+            logger.info(f"Обновление торрента '{title}' ({tag}): решение {decision}, совпадает данных: {reused} байт")
+            decisions[tag] = decision
+
+        to_delete = {
+            torrent.hash
+            for tag, decision in decisions.items() if decision != DECISION_SKIP
+            for torrent in by_tag.get(tag, [])
+        }
+        try:
+            self.delete_hashes(to_delete, delete_files=False)
+        except Exception as e:
+            logger.error(f"Ошибка удаления старых торрентов: {e}")
+            return {tag: None for tag in decisions}
+
+        for tag, torrent_data, title in items:
+            decision = decisions[tag]
+            if decision == DECISION_SKIP:
+                continue
+            if not self.add_torrent(torrent_data, title, tags=tag, category=category,
+                                    skip_checking=decision == DECISION_FAST):
+                decisions[tag] = None
+        return decisions
 
     def remove_tag_and_category_by_tag(self, tag):
         """
         Удаляет тег и категорию у всех торрентов с указанным тегом.
         """
+        return self.remove_tags_and_category_by_tags([tag])
+
+    @timed(QBITTORRENT_REQUEST_SECONDS)
+    def remove_tags_and_category_by_tags(self, tags):
+        """
+        Удаляет теги и категорию у всех торрентов с указанными тегами (по одному запросу на операцию).
+        """
         try:
             if self.client is None:
                 if not self.connect():
                     return False
 
-            torrents = self.client.torrents_info(tag=tag)
-            if not torrents:
-                logger.info(f"Торренты с тегом '{tag}' не найдены")
+            by_tag = self.get_torrents_by_tags(tags)
+            if not by_tag:
+                logger.info(f"Торренты с тегами {', '.join(tags)} не найдены")
                 return False
 
-            success = True
-            for torrent in torrents:
-                try:
-                    self.client.torrents.add_tags(torrent.hash, "")      # Удалить все теги
-                    self.client.torrents.set_category(torrent.hash, "")  # Удалить категорию
-                    logger.info(f"Сброшены тег и категория для торрента: {torrent.name}")
-                except Exception as e:
-                    logger.error(f"Ошибка при сбросе тега/категории для {torrent.name}: {e}")
-                    success = False
-            return success
+            hashes = list({torrent.hash for torrents in by_tag.values() for torrent in torrents})
+            self.limiter.acquire(2)
+            self.client.torrents_remove_tags(torrent_hashes=hashes)            # Удалить все теги
+            self.client.torrents_set_category(category="", torrent_hashes=hashes)  # Удалить категорию
+            self.index.invalidate()
+            logger.info(f"Сброшены теги и категория для торрентов: {len(hashes)}")
+            return True
         except Exception as e:
             logger.error(f"Ошибка при удалении тегов и категории по тегу: {e}")
             return False
 
+    @timed(QBITTORRENT_REQUEST_SECONDS, QBITTORRENT_ERRORS, failed=is_false)
     def clear_category(self, category='from telegram', delete_files=False):
         """
-        Удаляет все торренты из указанной категории.
+        Удаляет все торренты из указанной категории одним запросом.
         """
         try:
             if self.client is None:
                 if not self.connect():
                     return False
 
-            torrents = self.client.torrents_info(category=category)
+            self.index.refresh(self.client, self.limiter)
+            torrents = self.index.by_category_name(category)
             if not torrents:
                 logger.info(f"Торренты в категории '{category}' не найдены")
                 return True  # Нет торрентов — значит, всё удалено
 
-            for torrent in torrents:
-                logger.info(f"Удаляю торрент: {torrent.name}")
-                self.client.torrents_delete(delete_files=delete_files, hashes=torrent.hash)
-
-            logger.info(f"Все торренты из категории '{category}' успешно удалены")
+            self.delete_hashes([torrent.hash for torrent in torrents], delete_files=delete_files)
+            logger.info(f"Все торренты из категории '{category}' успешно удалены ({len(torrents)})")
             return True
         except Exception as e:
             logger.error(f"Ошибка при удалении торрентов из категории '{category}': {e}")
-            return False
\ No newline at end of file
+            return False
@@ -0,0 +1,65 @@
+import asyncio
+import threading
+import time
+from config import RUTRACKER_RATE, RUTRACKER_BURST, QBITTORRENT_RATE, QBITTORRENT_BURST
+
+class TokenBucket:
+    """Потокобезопасный ограничитель частоты запросов (token bucket)."""
+
+    def __init__(self, rate, burst=1):
+        """
+        Args:
+            rate: количество запросов в секунду (0 или меньше — без ограничения)
+            burst: максимальное количество запросов подряд без ожидания
+        """
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(burst))
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated_at = now
+
+    def acquire(self, tokens=1):
+        """Дождаться разрешения на выполнение запроса."""
+        if self.rate <= 0:
+            return
+        tokens = min(tokens, self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def reserve(self, tokens=1):
+        """
+        Зарезервировать токены без ожидания.
+
+        Returns:
+            float: сколько секунд нужно подождать перед запросом
+        """
+        if self.rate <= 0:
+            return 0.0
+        tokens = min(tokens, self.capacity)
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens -= tokens
+            return max(0.0, -self.tokens / self.rate)
+
+    async def acquire_async(self, tokens=1):
+        """Асинхронно дождаться разрешения на выполнение запроса (для asyncio-режима)."""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+# Общие ограничители для каждого хоста: их используют все экземпляры клиентов
+rutracker_limiter = TokenBucket(RUTRACKER_RATE, RUTRACKER_BURST)
+qbittorrent_limiter = TokenBucket(QBITTORRENT_RATE, QBITTORRENT_BURST)
@@ -1,11 +1,182 @@
+import codecs
+import hashlib
+import json
 import logging
+import os
 import re
+import threading
+import time
+from html.parser import HTMLParser
 import requests
-from bs4 import BeautifulSoup
-from config import RUTRACKER_USERNAME, RUTRACKER_PASSWORD, PROXY_URL, PROXY_USERNAME, PROXY_PASSWORD
+from config import (
+    RUTRACKER_URL, RUTRACKER_USERNAME, RUTRACKER_PASSWORD, PROXY_URL, PROXY_USERNAME, PROXY_PASSWORD,
+    RUTRACKER_STREAM_PAGES, RUTRACKER_STREAM_CHUNK_SIZE,
+    RUTRACKER_API_URL, RUTRACKER_API_CHUNK_SIZE, RUTRACKER_COOKIE_FILE, RUTRACKER_RELOGIN_MIN_INTERVAL,
+    PAGE_CACHE_TTL, PAGE_CACHE_SIZE, TORRENT_CACHE_TTL, TORRENT_CACHE_SIZE,
+)
+from rate_limiter import rutracker_limiter
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from http_transport import create_session
+from fetch_cache import SingleFlightCache
+from tracing import span, traced
+from metrics import timed, is_false, RUTRACKER_REQUEST_SECONDS, RUTRACKER_ERRORS
 
 logger = logging.getLogger(__name__)
 
+# Фрагменты страницы, по которым определяется изменение раздачи
+TITLE_BLOCK_RE = re.compile(r'<h1[^>]*class="[^"]*\bmaintitle\b[^"]*"[^>]*>.*?</h1>', re.S)
+POST_TIME_BLOCK_RE = re.compile(r'<p[^>]*class="[^"]*\bpost-time\b[^"]*"[^>]*>.*?</p>', re.S)
+
+def page_fingerprint(html):
+    """Хеш заголовка и времени первого сообщения темы (без разбора всей страницы)."""
+    title_match = TITLE_BLOCK_RE.search(html)
+    if not title_match:
+        return None
+    time_match = POST_TIME_BLOCK_RE.search(html, title_match.end())
+    block = title_match.group(0) + (time_match.group(0) if time_match else "")
+    return hashlib.sha1(block.encode("utf-8")).hexdigest()
+
+class TopicHeadParser(HTMLParser):
+    """
+    Инкрементальный парсер начала страницы темы.
+
+    Извлекает текст h1.maintitle и первого p.post-time; после этого
+    свойство done становится True и дальнейшее чтение страницы не нужно.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.title = None
+        self.time_text = None
+        self._current = None
+        self._parts = []
+
+    @property
+    def done(self):
+        return self.title is not None and self.time_text is not None
+
+    def handle_starttag(self, tag, attrs):
+        if self._current:
+            return
+        classes = (dict(attrs).get("class") or "").split()
+        if tag == "h1" and "maintitle" in classes and self.title is None:
+            self._current = "h1"
+        elif tag == "p" and "post-time" in classes and self.time_text is None:
+            self._current = "p"
+        else:
+            return
+        self._parts = []
+
+    def handle_endtag(self, tag):
+        if tag != self._current:
+            return
+        text = "".join(self._parts).strip()
+        if tag == "h1":
+            self.title = text
+        else:
+            self.time_text = text
+        self._current = None
+
+    def handle_data(self, data):
+        if self._current:
+            self._parts.append(data)
+
+class PageHeadReader:
+    """Декодирование и разбор начала страницы темы по мере получения частей ответа."""
+
+    def __init__(self, encoding):
+        self.decoder = codecs.getincrementaldecoder(encoding or "cp1251")(errors="replace")
+        self.parser = TopicHeadParser()
+        self.parts = []
+        self.received = 0
+
+    def feed(self, chunk):
+        """Обработать часть ответа; True, если заголовок и время сообщения уже найдены."""
+        self.received += len(chunk)
+        text = self.decoder.decode(chunk)
+        self.parts.append(text)
+        self.parser.feed(text)
+        return self.parser.done
+
+    def finish(self):
+        """Ответ прочитан до конца."""
+        self.parts.append(self.decoder.decode(b"", final=True))
+
+    @property
+    def html(self):
+        return "".join(self.parts)
+
+class SessionExpired(Exception):
+    """Вместо запрошенной страницы RuTracker вернул страницу входа."""
+
+def conditional_headers(fingerprint):
+    """Заголовки условного запроса страницы по сохраненному отпечатку."""
+    headers = {}
+    if fingerprint:
+        if fingerprint.get("etag"):
+            headers["If-None-Match"] = fingerprint["etag"]
+        if fingerprint.get("last_modified"):
+            headers["If-Modified-Since"] = fingerprint["last_modified"]
+    return headers
+
+def not_modified_page_info(fingerprint, topic_id):
+    """Результат условного запроса, на который сервер ответил 304."""
+    return {**fingerprint, "topic_id": topic_id, "unchanged": True}
+
+def parse_page_info(url, topic_id, html, head, headers, fingerprint=None):
+    """
+    Разобрать загруженную страницу темы.
+
+    Args:
+        html: прочитанная часть страницы
+        head: TopicHeadParser потокового чтения или None
+        headers: заголовки ответа
+
+    Raises:
+        SessionExpired: на странице нет заголовка раздачи (страница входа)
+    """
+    if not TITLE_BLOCK_RE.search(html):
+        # Нет h1.maintitle: страница входа или тема недоступна без авторизации
+        raise SessionExpired()
+    page_info = {
+        "topic_id": topic_id,
+        "etag": headers.get("ETag"),
+        "last_modified": headers.get("Last-Modified"),
+        "fingerprint": page_fingerprint(html),
+        "unchanged": False,
+    }
+    if fingerprint and page_info["fingerprint"] and page_info["fingerprint"] == fingerprint.get("fingerprint"):
+        logger.debug(f"Отпечаток страницы {url} не изменился")
+        page_info["unchanged"] = True
+        return page_info
+
+    if head is not None and head.title is not None:
+        title = head.title
+        time_text = head.time_text if head.time_text is not None else "Неизвестно"
+    else:
+        # bs4 нужен только для страниц, которые не разобрал потоковый парсер
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(html, "html.parser")
+
+        title = soup.select_one("h1.maintitle").text.strip()
+        time_text = soup.select_one("p.post-time").text.strip() if soup.select_one("p.post-time") else "Неизвестно"
+
+    logger.info(f"Заголовок: {title}, Время: {time_text}, ID темы: {topic_id}")
+    page_info.update(title=title, time_text=time_text)
+    return page_info
+
+def is_login_redirect(response):
+    """Ответ (requests или httpx) получен после перенаправления на страницу входа."""
+    if "login.php" in str(response.url):
+        return True
+    return any("login.php" in item.headers.get("Location", "") for item in response.history)
+
+def is_network_error(error):
+    return isinstance(error, requests.RequestException)
+
+def is_server_error(response):
+    return response.status_code >= 500
+
 def get_proxy_dict():
     """Формирует словарь прокси для requests на основе переменных окружения."""
     if PROXY_URL:
@@ -27,22 +198,44 @@ class RutrackerClient:
     def __init__(self):
         self.username = RUTRACKER_USERNAME
         self.password = RUTRACKER_PASSWORD
-        self.session = requests.Session()
-        self.proxies = get_proxy_dict()
-        self.is_logged_in = self.login()
+        # Прокси, пул соединений и повторы настраиваются один раз для всей сессии
+        self.session = create_session(get_proxy_dict())
+        self.limiter = rutracker_limiter
+        self.breaker = CircuitBreaker("RuTracker")
+        # Страницы кешируются по ID темы, торренты — по ID темы и отпечатку страницы,
+        # поэтому после изменения страницы старый торрент из кеша не используется
+        self.page_cache = SingleFlightCache(PAGE_CACHE_TTL, PAGE_CACHE_SIZE)
+        self.torrent_cache = SingleFlightCache(TORRENT_CACHE_TTL, TORRENT_CACHE_SIZE)
+        self.cookie_file = RUTRACKER_COOKIE_FILE
+        # Повторная авторизация выполняется одним потоком; поколение показывает,
+        # что сессия уже обновлена, пока поток ждал блокировку
+        self.login_lock = threading.Lock()
+        self.login_generation = 0
+        self.logged_in_at = 0.0
+        if self.load_cookies():
+            logger.info("Сессия RuTracker восстановлена из сохраненных cookie")
+            self.is_logged_in = True
+        else:
+            self.is_logged_in = self.login()
 
+    @timed(RUTRACKER_REQUEST_SECONDS, RUTRACKER_ERRORS, failed=is_false)
     def login(self):
         """Авторизация на RuTracker."""
         try:
-            response = self.session.post(
-                "https://rutracker.org/forum/login.php",
+            self.breaker.check()
+            self.limiter.acquire()
+            response = self.request(
+                "post",
+                f"{RUTRACKER_URL}/forum/login.php",
                 data={"login_username": self.username, "login_password": self.password, "login": "Вход"},
-                proxies=self.proxies if self.proxies else None,
                 timeout=20
             )
             response.raise_for_status()
-            if "bb_session" in self.session.cookies:
+            # Учитывается только cookie, выданная этим входом, а не оставшаяся от прежней сессии
+            if any("bb_session" in item.cookies for item in (*response.history, response)):
                 logger.info("Успешная авторизация на RuTracker")
+                self.logged_in_at = time.monotonic()
+                self.save_cookies()
                 return True
             logger.error("Не удалось авторизоваться на RuTracker")
             return False
@@ -50,52 +243,287 @@ class RutrackerClient:
             logger.error(f"Ошибка авторизации: {e}")
             return False
 
+    def request(self, method, url, **kwargs):
+        """HTTP-запрос к RuTracker через предохранитель: сетевые ошибки и ответы 5xx считаются отказами."""
+        return self.breaker.call(
+            self.session.request, method, url,
+            is_failure=is_network_error, is_failed_result=is_server_error,
+            **kwargs
+        )
+
+    def relogin(self, generation):
+        """
+        Повторная авторизация после истечения сессии.
+
+        Args:
+            generation: значение login_generation, с которым выполнялся неудачный запрос.
+                Если сессию за это время уже обновил другой поток, новая авторизация не выполняется.
+
+        Returns:
+            bool: True, если сессия действительна и запрос можно повторить
+        """
+        with self.login_lock:
+            if generation != self.login_generation:
+                return self.is_logged_in
+            if self.is_logged_in and time.monotonic() - self.logged_in_at < RUTRACKER_RELOGIN_MIN_INTERVAL:
+                # Сессия свежая: страница без заголовка, скорее всего, не связана с авторизацией
+                return False
+            logger.warning("Сессия RuTracker истекла, повторная авторизация")
+            self.is_logged_in = self.login()
+            self.login_generation += 1
+            return self.is_logged_in
+
+    def load_cookies(self):
+        """Загрузить сохраненные cookie сессии. Возвращает True, если есть действующая bb_session."""
+        if not self.cookie_file or not os.path.exists(self.cookie_file):
+            return False
+        try:
+            with open(self.cookie_file, encoding="utf-8") as f:
+                cookies = json.load(f)
+            now = time.time()
+            for cookie in cookies:
+                if cookie.get("expires") and cookie["expires"] < now:
+                    continue
+                self.session.cookies.set(
+                    cookie["name"], cookie["value"],
+                    domain=cookie.get("domain", ""), path=cookie.get("path", "/"),
+                    expires=cookie.get("expires"), secure=cookie.get("secure", False)
+                )
+            return "bb_session" in self.session.cookies
+        except Exception as e:
+            logger.error(f"Ошибка загрузки cookie RuTracker: {e}")
+            return False
+
+    def save_cookies(self):
+        """Сохранить cookie сессии в файл (атомарно, с правами только для владельца)."""
+        if not self.cookie_file:
+            return
+        try:
+            cookies = [
+                {"name": cookie.name, "value": cookie.value, "domain": cookie.domain,
+                 "path": cookie.path, "expires": cookie.expires, "secure": cookie.secure}
+                for cookie in self.session.cookies
+            ]
+            directory = os.path.dirname(self.cookie_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_file = f"{self.cookie_file}.tmp"
+            with open(os.open(temp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w", encoding="utf-8") as f:
+                json.dump(cookies, f)
+            os.replace(temp_file, self.cookie_file)
+        except Exception as e:
+            logger.error(f"Ошибка сохранения cookie RuTracker: {e}")
+
     def get_topic_id(self, url):
         """Получить ID темы из URL."""
         match = re.search(r't=(\d+)', url)
         return match.group(1) if match else None
 
-    def get_page_info(self, url):
-        """Получить информацию о странице раздачи."""
-        try:
-            if not self.is_logged_in and not self.login():
-                return None
+    def get_page_info(self, url, fingerprint=None, force=False):
+        """
+        Получить информацию о странице раздачи.
 
-            topic_id = self.get_topic_id(url)
-            if not topic_id:
-                logger.error(f"Не удалось получить ID темы из URL: {url}")
-                return None
+        Одновременные запросы одной темы объединяются, результат кешируется на PAGE_CACHE_TTL секунд.
+        Возвращаемый словарь общий для всех вызывающих, изменять его нельзя.
 
-            response = self.session.get(url, proxies=self.proxies if self.proxies else None, timeout=20)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, "html.parser")
+        Args:
+            url: ссылка на тему
+            fingerprint: сохраненный отпечаток страницы (etag, last_modified, fingerprint).
+                Если страница не изменилась, возвращается {"unchanged": True, ...} без разбора HTML.
+            force: не использовать кеш (принудительная проверка по запросу пользователя)
+        """
+        topic_id = self.get_topic_id(url)
+        if not topic_id:
+            logger.error(f"Не удалось получить ID темы из URL: {url}")
+            return None
+        if not force:
+            cached = self.cached_page_info(topic_id, fingerprint)
+            if cached is not None:
+                return cached
+        key = self.page_cache_key(topic_id, fingerprint)
+        page_info = self.page_cache.get(key, lambda: self.load_page_info(url, topic_id, fingerprint), force)
+        if fingerprint and page_info and not page_info["unchanged"]:
+            self.page_cache.put(topic_id, page_info)
+        return page_info
+
+    def cached_page_info(self, topic_id, fingerprint=None):
+        """Страница темы из кеша (unchanged, если отпечаток совпадает с сохраненным) или None."""
+        cached = self.page_cache.peek(topic_id)
+        if cached is None or not fingerprint:
+            return cached
+        if cached["fingerprint"] and cached["fingerprint"] == fingerprint.get("fingerprint"):
+            return {**cached, "unchanged": True}
+        return cached
+
+    def page_cache_key(self, topic_id, fingerprint=None):
+        """Ключ кеша страниц: ответ на условный запрос зависит от отпечатка, поэтому он входит в ключ."""
+        if not fingerprint:
+            return topic_id
+        return topic_id, fingerprint.get("etag"), fingerprint.get("last_modified"), fingerprint.get("fingerprint")
 
-            title = soup.select_one("h1.maintitle").text.strip()
-            time_text = soup.select_one("p.post-time").text.strip() if soup.select_one("p.post-time") else "Неизвестно"
+    def torrent_cache_key(self, topic_id):
+        """Ключ кеша торрентов: ID темы и отпечаток страницы из кеша."""
+        page_info = self.page_cache.peek(topic_id)
+        return topic_id, page_info["fingerprint"] if page_info else None
 
-            logger.info(f"Заголовок: {title}, Время: {time_text}, ID темы: {topic_id}")
-            return {"title": title, "time_text": time_text, "topic_id": topic_id}
+    @timed(RUTRACKER_REQUEST_SECONDS, RUTRACKER_ERRORS)
+    def load_page_info(self, url, topic_id, fingerprint=None):
+        """Загрузить страницу темы с повторной авторизацией при истекшей сессии (без кеша)."""
+        try:
+            for attempt in range(2):
+                generation = self.login_generation
+                if not self.is_logged_in and not self.relogin(generation):
+                    return None
+                try:
+                    return self.fetch_page_info(url, topic_id, fingerprint)
+                except SessionExpired:
+                    if attempt or not self.relogin(generation):
+                        logger.error(f"На странице {url} не найден заголовок раздачи")
+                        return None
+        except CircuitOpenError as e:
+            logger.debug(f"Страница {url} не запрошена: {e}")
+            return None
         except Exception as e:
             logger.error(f"Ошибка получения информации о странице {url}: {e}")
             return None
 
-    def download_torrent(self, topic_id):
-        """Скачать торрент-файл."""
+    def fetch_page_info(self, url, topic_id, fingerprint=None):
+        """Загрузить и разобрать страницу темы; SessionExpired, если вместо темы получена страница входа."""
+        self.breaker.check()
+        with span("rutracker_wait"):
+            self.limiter.acquire()
+        # В потоковом режиме разбор заголовка идет во время чтения и входит в fetch
+        with span("fetch"):
+            response = self.request(
+                "get",
+                url,
+                headers=conditional_headers(fingerprint),
+                timeout=20,
+                stream=RUTRACKER_STREAM_PAGES
+            )
+            try:
+                if response.status_code == 304:
+                    logger.debug(f"Страница {url} не изменилась (304)")
+                    return not_modified_page_info(fingerprint, topic_id)
+                response.raise_for_status()
+                if is_login_redirect(response):
+                    raise SessionExpired()
+                if RUTRACKER_STREAM_PAGES:
+                    html, head = self.read_page_head(response)
+                else:
+                    html, head = response.text, None
+            finally:
+                response.close()
+
+        with span("parse"):
+            return parse_page_info(url, topic_id, html, head, response.headers, fingerprint)
+
+    def read_page_head(self, response):
+        """
+        Потоково читать страницу, пока не найдены заголовок и время сообщения.
+
+        Returns:
+            tuple: (прочитанная часть HTML, TopicHeadParser)
+        """
+        reader = PageHeadReader(response.encoding)
+        for chunk in response.iter_content(chunk_size=RUTRACKER_STREAM_CHUNK_SIZE):
+            if reader.feed(chunk):
+                break
+        else:
+            reader.finish()
+        logger.debug(f"Прочитано {reader.received} байт страницы {response.url}")
+        return reader.html, reader.parser
+
+    def download_torrent(self, topic_id, force=False):
+        """
+        Скачать торрент-файл.
+
+        Одновременные запросы объединяются, результат кешируется на TORRENT_CACHE_TTL секунд
+        для текущей версии страницы темы.
+
+        Args:
+            force: не использовать кеш (принудительная проверка по запросу пользователя)
+        """
+        topic_id = str(topic_id)
+        return self.torrent_cache.get(self.torrent_cache_key(topic_id), lambda: self.load_torrent(topic_id), force)
+
+    @timed(RUTRACKER_REQUEST_SECONDS, RUTRACKER_ERRORS)
+    def load_torrent(self, topic_id):
+        """Скачать торрент-файл без кеша."""
         try:
-            if not self.is_logged_in and not self.login():
-                return None
+            for attempt in range(2):
+                generation = self.login_generation
+                if not self.is_logged_in and not self.relogin(generation):
+                    return None
 
-            response = self.session.get(
-                f"https://rutracker.org/forum/dl.php?t={topic_id}",
-                proxies=self.proxies if self.proxies else None,
-                timeout=30
-            )
-            response.raise_for_status()
-            if "html" in response.headers.get("content-type", "").lower():
-                logger.error("Получен HTML вместо торрент-файла")
-                return None
-            logger.info(f"Торрент успешно скачан: {topic_id}")
-            return response.content
+                self.breaker.check()
+                with span("rutracker_wait"):
+                    self.limiter.acquire()
+                with span("download"):
+                    response = self.request("get", f"{RUTRACKER_URL}/forum/dl.php?t={topic_id}", timeout=30)
+                response.raise_for_status()
+                if "html" not in response.headers.get("content-type", "").lower():
+                    logger.info(f"Торрент успешно скачан: {topic_id}")
+                    return response.content
+                # Вместо торрент-файла пришла HTML-страница — обычно страница входа
+                if attempt or not self.relogin(generation):
+                    logger.error("Получен HTML вместо торрент-файла")
+                    return None
+        except CircuitOpenError as e:
+            logger.debug(f"Торрент {topic_id} не запрошен: {e}")
+            return None
         except Exception as e:
             logger.error(f"Ошибка скачивания торрента {topic_id}: {e}")
-            return None
\ No newline at end of file
+            return None
+
+class RutrackerApiClient:
+    """Клиент API RuTracker для пакетного получения данных о раздачах."""
+
+    def __init__(self, base_url=RUTRACKER_API_URL, chunk_size=RUTRACKER_API_CHUNK_SIZE):
+        self.base_url = base_url
+        self.chunk_size = max(1, chunk_size)
+        # Запросы к API идут последовательно, большой пул не нужен
+        self.session = create_session(get_proxy_dict(), pool_size=2)
+        self.limiter = rutracker_limiter
+
+    @traced("api")
+    @timed(RUTRACKER_REQUEST_SECONDS)
+    def get_topics_data(self, topic_ids):
+        """
+        Получить время регистрации, info hash и размер для списка тем.
+
+        Args:
+            topic_ids: ID тем (строки или числа)
+
+        Returns:
+            dict: {topic_id (str): {"info_hash", "reg_time", "size"} или None, если тема не найдена}.
+                Темы из неудачных запросов в словарь не попадают.
+        """
+        ids = list(dict.fromkeys(str(topic_id) for topic_id in topic_ids if topic_id))
+        result = {}
+        for start in range(0, len(ids), self.chunk_size):
+            chunk = ids[start:start + self.chunk_size]
+            try:
+                self.limiter.acquire()
+                response = self.session.get(
+                    f"{self.base_url}/get_tor_topic_data",
+                    params={"by": "topic_id", "val": ",".join(chunk)},
+                    timeout=20
+                )
+                response.raise_for_status()
+                data = response.json().get("result") or {}
+            except Exception as e:
+                logger.error(f"Ошибка получения данных о раздачах через API: {e}")
+                continue
+            for topic_id in chunk:
+                topic = data.get(topic_id)
+                if topic:
+                    result[topic_id] = {
+                        "info_hash": (topic.get("info_hash") or "").lower() or None,
+                        "reg_time": topic.get("reg_time"),
+                        "size": topic.get("size"),
+                    }
+                else:
+                    result[topic_id] = None
+        logger.info(f"Получены данные API для {len(result)} из {len(ids)} тем")
+        return result
@@ -0,0 +1,161 @@
+import heapq
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from config import (
+    CHECK_INTERVAL, CHECK_MIN_INTERVAL, CHECK_MAX_INTERVAL, CHECK_JITTER,
+    CHECKER_ID, CHECK_LEASE_SECONDS, CHECK_BATCH_SIZE
+)
+from database import (
+    get_check_schedule, update_series_schedule, claim_due_series, claim_series_leases,
+    renew_series_leases, release_series_leases
+)
+
+logger = logging.getLogger(__name__)
+
+class CheckScheduler:
+    """
+    Приоритетная очередь проверок сериалов по времени следующей проверки.
+
+    Интервал проверки сериала сокращается после каждого обнаруженного обновления
+    и увеличивается, пока раздача не меняется. Случайный разброс (jitter)
+    распределяет проверки по времени, чтобы они не собирались в одну пачку.
+
+    Несколько процессов с общей базой не проверяют одни и те же сериалы: due-сериалы
+    берутся в аренду (lease) в базе данных, аренда снимается при перепланировании,
+    а аренду остановившегося процесса по истечении срока подхватывают другие.
+    """
+
+    def __init__(self, base_interval=CHECK_INTERVAL, min_interval=CHECK_MIN_INTERVAL,
+                 max_interval=CHECK_MAX_INTERVAL, jitter=CHECK_JITTER, owner=CHECKER_ID,
+                 lease_seconds=CHECK_LEASE_SECONDS, batch_size=CHECK_BATCH_SIZE):
+        self.base_interval = base_interval
+        self.min_interval = min(min_interval, base_interval)
+        self.max_interval = max(max_interval, base_interval)
+        self.jitter = jitter
+        self.owner = owner
+        self.lease_seconds = lease_seconds
+        self.batch_size = batch_size
+        self.heap = []
+        self.intervals = {}
+        # Наибольший загруженный ID и признак устаревшей очереди (нужна полная загрузка)
+        self.max_id = None
+        self.stale = True
+
+    def load(self):
+        """
+        Построить очередь по расписанию из базы данных (новые сериалы проверяются сразу).
+
+        Все расписание читается только при первом вызове и после того, как очередь устарела
+        (сериалы, которые по ней пора проверять, перепланировал или арендовал другой процесс);
+        иначе в очередь добавляются только сериалы, добавленные после предыдущей загрузки.
+        Сериалы, арендованные другим процессом, ставятся в очередь не раньше окончания аренды.
+        """
+        now = time.time()
+        if self.stale:
+            self.heap = []
+            self.intervals = {}
+            self.max_id = None
+        rows = get_check_schedule(self.max_id)
+        for series_id, next_check_at, check_interval, lease_owner, lease_expires_at in rows:
+            due_at = next_check_at if next_check_at is not None else now
+            if lease_owner and lease_owner != self.owner and lease_expires_at:
+                due_at = max(due_at, lease_expires_at)
+            self.heap.append((due_at, series_id))
+            self.intervals[series_id] = check_interval or self.base_interval
+            self.max_id = series_id if self.max_id is None else max(self.max_id, series_id)
+        heapq.heapify(self.heap)
+        if self.max_id is None:
+            self.max_id = 0
+        self.stale = False
+
+    def pop_due(self, now=None):
+        """
+        Взять в аренду сериалы, время проверки которых наступило, и вернуть их ID.
+
+        За один вызов берется не более batch_size сериалов; оставшиеся будут взяты следующим вызовом.
+        """
+        now = time.time() if now is None else now
+        if not self.heap or self.heap[0][0] > now:
+            return []
+        expected = sum(1 for due_at, _ in self.heap if due_at <= now)
+        due = claim_due_series(self.owner, now, self.lease_seconds, self.batch_size or None)
+        if len(due) < min(expected, self.batch_size or expected):
+            # Часть сериалов арендовали или перепланировали другие процессы:
+            # следующий load() перечитает расписание целиком
+            self.stale = True
+        if due:
+            claimed = set(due)
+            self.heap = [item for item in self.heap if item[1] not in claimed]
+            heapq.heapify(self.heap)
+        else:
+            while self.heap and self.heap[0][0] <= now:
+                heapq.heappop(self.heap)
+        return due
+
+    def claim(self, series_ids):
+        """Взять в аренду указанные сериалы вне расписания (для фоновых задач); возвращает ID арендованных."""
+        return claim_series_leases(self.owner, series_ids, time.time(), self.lease_seconds)
+
+    @contextmanager
+    def leased(self, series_ids):
+        """
+        Продлевать аренду сериалов, пока выполняется блок, и снять ее с непроверенных по выходе.
+
+        Проверенные сериалы освобождаются раньше — в reschedule.
+        """
+        series_ids = list(series_ids)
+        stop = threading.Event()
+
+        def renew():
+            while not stop.wait(self.lease_seconds / 3):
+                renewed = renew_series_leases(self.owner, series_ids, time.time() + self.lease_seconds)
+                logger.debug(f"Продлена аренда {renewed} из {len(series_ids)} сериалов")
+
+        thread = threading.Thread(target=renew, name="lease-renewer", daemon=True)
+        thread.start()
+        try:
+            yield series_ids
+        finally:
+            stop.set()
+            thread.join()
+            release_series_leases(self.owner, series_ids)
+
+    def seconds_until_next(self, now=None):
+        """Сколько секунд ждать до ближайшей проверки (None, если очередь пуста)."""
+        if not self.heap:
+            return None
+        now = time.time() if now is None else now
+        return max(0.0, self.heap[0][0] - now)
+
+    def next_interval(self, interval, changed):
+        """Новый интервал: чаще для обновляющихся раздач, реже для неактивных."""
+        if changed:
+            return max(self.min_interval, int(interval / 2))
+        return min(self.max_interval, int(interval * 1.5))
+
+    def next_check_time(self, interval, now=None):
+        """Время следующей проверки через interval секунд со случайным разбросом ±jitter."""
+        now = time.time() if now is None else now
+        return now + interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def reschedule(self, series_id, changed, now=None):
+        """
+        Запланировать следующую проверку сериала.
+
+        Args:
+            changed: True — обнаружено обновление, False — изменений нет,
+                None — проверка не удалась (интервал сохраняется)
+        """
+        now = time.time() if now is None else now
+        interval = self.intervals.get(series_id, self.base_interval)
+        if changed is not None:
+            interval = self.next_interval(interval, changed)
+        next_check_at = self.next_check_time(interval, now)
+        delay = next_check_at - now
+        self.intervals[series_id] = interval
+        heapq.heappush(self.heap, (next_check_at, series_id))
+        update_series_schedule(series_id, next_check_at, interval, self.owner, changed=bool(changed), checked_at=now)
+        logger.debug(f"Сериал {series_id}: следующая проверка через {int(delay)} сек (интервал {interval})")
@@ -0,0 +1,160 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from rate_limiter import TokenBucket
+from config import (
+    TELEGRAM_GLOBAL_RATE, TELEGRAM_CHAT_RATE, TELEGRAM_CHAT_BURST,
+    TELEGRAM_SENDER_WORKERS, TELEGRAM_MAX_RETRIES
+)
+
+logger = logging.getLogger(__name__)
+
+MAX_MESSAGE_LENGTH = 4096
+
+def get_retry_after(error):
+    """Пауза из ответа 429 Too Many Requests или None, если ошибка другая."""
+    if getattr(error, "error_code", None) != 429:
+        return None
+    result = getattr(error, "result_json", None) or {}
+    return (result.get("parameters") or {}).get("retry_after", 1)
+
+class OutgoingMessage:
+    def __init__(self, chat_id, text, kwargs, future=None):
+        self.chat_id = chat_id
+        self.text = text
+        self.kwargs = kwargs
+        self.future = future
+
+    @property
+    def mergeable(self):
+        """Простое текстовое сообщение без клавиатуры, результат которого никто не ждет."""
+        return not self.kwargs and self.future is None
+
+class TelegramSender:
+    """
+    Диспетчер исходящих запросов к Telegram с учетом ограничений Bot API.
+
+    Соблюдает общий лимит бота и лимит на чат (token bucket), при ответе 429
+    ждет retry_after и повторяет запрос. Сообщения ставятся в очередь чата и отправляются
+    рабочими потоками по порядку; идущие подряд простые текстовые сообщения одному чату
+    объединяются в одно.
+    """
+
+    def __init__(self, bot, global_rate=TELEGRAM_GLOBAL_RATE, chat_rate=TELEGRAM_CHAT_RATE,
+                 chat_burst=TELEGRAM_CHAT_BURST, workers=TELEGRAM_SENDER_WORKERS,
+                 max_retries=TELEGRAM_MAX_RETRIES):
+        self.bot = bot
+        self.global_limiter = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.chat_limiters = {}
+        self.workers = workers
+        self.max_retries = max_retries
+        self.paused_until = 0.0
+        self.pending = {}
+        self.ready = deque()
+        self.condition = threading.Condition()
+        self.threads = []
+
+    def chat_limiter(self, chat_id):
+        with self.condition:
+            limiter = self.chat_limiters.get(chat_id)
+            if limiter is None:
+                limiter = self.chat_limiters[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+            return limiter
+
+    def call(self, chat_id, method, *args, **kwargs):
+        """Выполнить метод Bot API в текущем потоке с ограничением частоты и повторами при 429."""
+        for attempt in range(self.max_retries + 1):
+            if chat_id is not None:
+                self.chat_limiter(chat_id).acquire()
+            self.global_limiter.acquire()
+            pause = self.paused_until - time.monotonic()
+            if pause > 0:
+                time.sleep(pause)
+            try:
+                return method(*args, **kwargs)
+            except Exception as e:
+                retry_after = get_retry_after(e)
+                if retry_after is None or attempt == self.max_retries:
+                    raise
+                logger.warning(f"Telegram: превышен лимит запросов, повтор через {retry_after} с")
+                # Flood control действует на весь бот, поэтому пауза общая для всех потоков
+                self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+
+    def send_message(self, chat_id, text, wait=False, **kwargs):
+        """
+        Поставить сообщение в очередь отправки.
+
+        Args:
+            wait: дождаться отправки и вернуть отправленное сообщение (такие сообщения не объединяются)
+
+        Returns:
+            Message при wait=True, иначе None
+        """
+        future = Future() if wait else None
+        self._enqueue(OutgoingMessage(chat_id, text, kwargs, future))
+        return future.result() if future else None
+
+    def edit_message_text(self, text, chat_id=None, message_id=None, **kwargs):
+        return self.call(chat_id, self.bot.edit_message_text, text, chat_id=chat_id, message_id=message_id, **kwargs)
+
+    def answer_callback_query(self, callback_query_id, text=None, **kwargs):
+        return self.call(None, self.bot.answer_callback_query, callback_query_id, text, **kwargs)
+
+    def _enqueue(self, message):
+        with self.condition:
+            if not self.threads:
+                self._start()
+            queue = self.pending.get(message.chat_id)
+            if queue is None:
+                queue = self.pending[message.chat_id] = deque()
+                self.ready.append(message.chat_id)
+                self.condition.notify()
+            queue.append(message)
+
+    def _start(self):
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"telegram-sender-{index}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def _take_batch(self, queue):
+        """Взять из очереди чата следующее сообщение, объединив с ним идущие подряд простые сообщения."""
+        first = queue.popleft()
+        if not first.mergeable:
+            return first, 1
+        texts = [first.text]
+        length = len(first.text)
+        while queue and queue[0].mergeable and length + 1 + len(queue[0].text) <= MAX_MESSAGE_LENGTH:
+            message = queue.popleft()
+            texts.append(message.text)
+            length += 1 + len(message.text)
+        return OutgoingMessage(first.chat_id, "\n".join(texts), {}), len(texts)
+
+    def _worker(self):
+        while True:
+            with self.condition:
+                while not self.ready:
+                    self.condition.wait()
+                # Очередь чата обрабатывается одним потоком, чтобы сохранить порядок сообщений
+                chat_id = self.ready.popleft()
+                message, count = self._take_batch(self.pending[chat_id])
+            if count > 1:
+                logger.debug(f"Telegram: объединено {count} сообщений для чата {chat_id}")
+            try:
+                result = self.call(chat_id, self.bot.send_message, chat_id, message.text, **message.kwargs)
+                if message.future:
+                    message.future.set_result(result)
+            except Exception as e:
+                logger.error(f"Не удалось отправить сообщение в чат {chat_id}: {e}")
+                if message.future:
+                    message.future.set_exception(e)
+            with self.condition:
+                if self.pending[chat_id]:
+                    self.ready.append(chat_id)
+                    self.condition.notify()
+                else:
+                    del self.pending[chat_id]
@@ -0,0 +1,124 @@
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Решения при обновлении торрента
+DECISION_ADD = "add"      # старого торрента нет, обычное добавление
+DECISION_SKIP = "skip"    # info hash не изменился, торрент не трогаем
+DECISION_FAST = "fast"    # данные идентичны, добавляем без перехеширования
+DECISION_FULL = "full"    # содержимое изменилось, qBittorrent проверит файлы
+
+class BencodeError(ValueError):
+    """Ошибка разбора bencode."""
+
+def _decode(data, index):
+    """Разобрать значение bencode начиная с позиции index. Возвращает (значение, следующая позиция)."""
+    try:
+        token = data[index:index + 1]
+        if token == b"i":
+            end = data.index(b"e", index)
+            return int(data[index + 1:end]), end + 1
+        if token == b"l":
+            index += 1
+            items = []
+            while data[index:index + 1] != b"e":
+                item, index = _decode(data, index)
+                items.append(item)
+            return items, index + 1
+        if token == b"d":
+            index += 1
+            result = {}
+            while data[index:index + 1] != b"e":
+                key, index = _decode(data, index)
+                value, index = _decode(data, index)
+                result[key] = value
+            return result, index + 1
+        if token.isdigit():
+            colon = data.index(b":", index)
+            length = int(data[index:colon])
+            start = colon + 1
+            if start + length > len(data):
+                raise BencodeError("Строка выходит за пределы данных")
+            return data[start:start + length], start + length
+    except ValueError as e:
+        raise BencodeError(f"Некорректные данные bencode в позиции {index}: {e}") from e
+    raise BencodeError(f"Неизвестный тип bencode в позиции {index}")
+
+def bdecode(data):
+    """Декодировать данные bencode."""
+    value, end = _decode(data, 0)
+    if end != len(data):
+        raise BencodeError("Лишние данные после значения bencode")
+    return value
+
+def _info_slice(data):
+    """Найти границы словаря info в торрент-файле (для вычисления info hash)."""
+    if data[:1] != b"d":
+        raise BencodeError("Торрент-файл должен быть словарем")
+    index = 1
+    while data[index:index + 1] != b"e":
+        key, index = _decode(data, index)
+        start = index
+        _, index = _decode(data, index)
+        if key == b"info":
+            return start, index
+    raise BencodeError("В торрент-файле нет словаря info")
+
+def _text(value):
+    return value.decode("utf-8", errors="replace") if isinstance(value, bytes) else str(value)
+
+def parse_torrent(torrent_data):
+    """
+    Разобрать торрент-файл.
+
+    Returns:
+        dict: info_hash, name, piece_size, pieces (список hex-хешей частей),
+            files (список (путь, размер) в формате qBittorrent)
+    """
+    start, end = _info_slice(torrent_data)
+    info = bdecode(torrent_data[start:end])
+    name = _text(info.get(b"name.utf-8", info.get(b"name", b"")))
+    pieces = info.get(b"pieces", b"")
+    if b"files" in info:
+        files = []
+        for entry in info[b"files"]:
+            path = entry.get(b"path.utf-8", entry.get(b"path", []))
+            files.append(("/".join([name] + [_text(part) for part in path]), entry[b"length"]))
+    else:
+        files = [(name, info.get(b"length", 0))]
+    return {
+        "info_hash": hashlib.sha1(torrent_data[start:end]).hexdigest(),
+        "name": name,
+        "piece_size": info.get(b"piece length"),
+        "pieces": [pieces[i:i + 20].hex() for i in range(0, len(pieces), 20)],
+        "files": files,
+    }
+
+def compare_torrents(old, new):
+    """
+    Сравнить торрент в qBittorrent с новым торрент-файлом.
+
+    Args:
+        old: описание текущего торрента (QBittorrentClient.get_torrent_layout) или None
+        new: результат parse_torrent для нового торрент-файла
+
+    Returns:
+        tuple: (решение DECISION_*, объем данных в байтах, которые совпадают по пути и размеру)
+    """
+    if not old:
+        return DECISION_ADD, 0
+    if old["info_hash"].lower() == new["info_hash"]:
+        return DECISION_SKIP, sum(size for _, size in new["files"])
+
+    old_files = dict(old["files"])
+    reused = sum(size for path, size in new["files"] if old_files.get(path) == size)
+    same_data = (
+        old["piece_size"] == new["piece_size"]
+        and [piece.lower() for piece in old["pieces"]] == new["pieces"]
+        and [tuple(item) for item in old["files"]] == new["files"]
+    )
+    # Пропустить проверку можно, только если старая раздача полностью скачана
+    if same_data and old.get("progress", 0) >= 1:
+        return DECISION_FAST, reused
+    return DECISION_FULL, reused
@@ -0,0 +1,146 @@
+"""
+Легковесная трассировка этапов проверки и обработчиков бота.
+
+Спаны (название этапа, длительность) пишутся в кольцевой буфер; команда /trace
+показывает сводку по этапам. При PROFILE_CYCLE=1 один полный цикл проверки
+выполняется под cProfile и tracemalloc, результаты сохраняются в PROFILE_DIR.
+"""
+import cProfile
+import logging
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import deque, namedtuple
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from config import TRACE_BUFFER_SIZE, PROFILE_CYCLE, PROFILE_DIR
+
+logger = logging.getLogger(__name__)
+
+Span = namedtuple("Span", "name started duration thread")
+
+_spans = deque(maxlen=TRACE_BUFFER_SIZE)
+_spans_lock = threading.Lock()
+
+@contextmanager
+def span(name):
+    """Записать длительность блока кода как этап name."""
+    started = time.time()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        with _spans_lock:
+            _spans.append(Span(name, started, duration, threading.current_thread().name))
+
+def traced(name=None):
+    """Декоратор: записать вызов функции как этап name (по умолчанию — имя функции)."""
+    def decorator(func):
+        stage = name or func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def get_spans(since=None):
+    """Спаны из буфера, начатые не раньше since (unix time)."""
+    with _spans_lock:
+        spans = list(_spans)
+    if since is not None:
+        spans = [item for item in spans if item.started >= since]
+    return spans
+
+def get_stage_breakdown(since=None):
+    """
+    Сводка по этапам.
+
+    Returns:
+        list: кортежи (этап, количество, суммарно с, среднее с, максимум с), по убыванию суммарного времени
+    """
+    stages = {}
+    for item in get_spans(since):
+        stats = stages.setdefault(item.name, [0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += item.duration
+        stats[2] = max(stats[2], item.duration)
+    rows = [(name, count, total, total / count, peak) for name, (count, total, peak) in stages.items()]
+    rows.sort(key=lambda row: row[2], reverse=True)
+    return rows
+
+def format_stage_breakdown(since=None, limit=30):
+    """Текстовая сводка по этапам для команды /trace."""
+    rows = get_stage_breakdown(since)
+    if not rows:
+        return "Нет данных трассировки."
+    lines = ["этап: количество, всего с, среднее мс, максимум мс"]
+    for name, count, total, average, peak in rows[:limit]:
+        lines.append(f"{name}: {count}, {total:.2f}, {average * 1000:.1f}, {peak * 1000:.1f}")
+    return "\n".join(lines)
+
+# Профилирование одного цикла: профили рабочих потоков собираются отдельно и объединяются
+_profiling = False
+_profiled_once = False
+_profiles = []
+_profiles_lock = threading.Lock()
+
+def profile_call(func, *args, **kwargs):
+    """Вызвать func; во время профилируемого цикла — под отдельным cProfile потока."""
+    if not _profiling:
+        return func(*args, **kwargs)
+    profile = cProfile.Profile()
+    try:
+        return profile.runcall(func, *args, **kwargs)
+    finally:
+        with _profiles_lock:
+            _profiles.append(profile)
+
+def profile_once(func, *args, **kwargs):
+    """
+    Выполнить func; первый вызов при PROFILE_CYCLE=1 профилируется.
+
+    В PROFILE_DIR сохраняются cycle-<время>.prof (pstats, включая рабочие потоки через profile_call)
+    и cycle-<время>.tracemalloc (снимок памяти) с текстовой сводкой cycle-<время>.txt.
+    """
+    global _profiling, _profiled_once
+    if not PROFILE_CYCLE or _profiled_once:
+        return func(*args, **kwargs)
+    _profiled_once = True
+    _profiling = True
+    tracemalloc.start(25)
+    profile = cProfile.Profile()
+    try:
+        return profile.runcall(func, *args, **kwargs)
+    finally:
+        _profiling = False
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        try:
+            save_profile(profile, snapshot)
+        except Exception as e:
+            logger.error(f"Не удалось сохранить профиль цикла: {e}")
+
+def save_profile(profile, snapshot):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, f"cycle-{datetime.now().strftime('%Y%m%d-%H%M%S')}")
+    stats = pstats.Stats(profile)
+    with _profiles_lock:
+        for worker_profile in _profiles:
+            stats.add(worker_profile)
+        _profiles.clear()
+    stats.dump_stats(f"{base}.prof")
+    snapshot.dump(f"{base}.tracemalloc")
+    with open(f"{base}.txt", "w", encoding="utf-8") as report:
+        stats.stream = report
+        report.write("cProfile, топ-50 по суммарному времени:\n")
+        stats.sort_stats("cumulative").print_stats(50)
+        report.write("\ntracemalloc, топ-30 по объему памяти:\n")
+        for stat in snapshot.statistics("lineno")[:30]:
+            report.write(f"{stat}\n")
+    logger.info(f"Профиль цикла проверки сохранен: {base}.prof, {base}.tracemalloc, {base}.txt")
@@ -0,0 +1,104 @@
+import hmac
+import json
+import logging
+import queue
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from telebot.types import Update
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_SIZE = 1024 * 1024
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+class WebhookServer:
+    """
+    Встроенный HTTP-сервер для приема обновлений Telegram через webhook.
+
+    Обновления проверяются по секретному токену и складываются в ограниченную очередь,
+    из которой их обрабатывают рабочие потоки. Если очередь заполнена, сервер отвечает 503,
+    и Telegram повторит доставку позже.
+    """
+
+    def __init__(self, bot, host, port, path, secret, workers=4, queue_size=1000):
+        self.bot = bot
+        if not secret:
+            raise ValueError("Для приема обновлений через webhook необходим секретный токен")
+        self.path = path or "/"
+        self.secret = secret
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.workers = workers
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self.threads = []
+
+    def _handler_class(self):
+        server = self
+
+        class WebhookHandler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                status = server.handle_request(self.path, self.headers, self.rfile)
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                logger.debug(f"Webhook {self.address_string()}: {format % args}")
+
+        return WebhookHandler
+
+    def handle_request(self, path, headers, body):
+        """Проверить и поставить обновление в очередь. Возвращает HTTP-статус ответа."""
+        if path.split("?", 1)[0] != self.path:
+            return 404
+        if not hmac.compare_digest(headers.get(SECRET_HEADER, ""), self.secret):
+            logger.warning("Webhook: запрос с неверным секретным токеном")
+            return 403
+        try:
+            length = int(headers.get("Content-Length", "0"))
+        except ValueError:
+            return 400
+        if length <= 0 or length > MAX_BODY_SIZE:
+            return 413 if length > MAX_BODY_SIZE else 400
+        try:
+            update = Update.de_json(json.loads(body.read(length)))
+        except Exception as e:
+            logger.error(f"Webhook: некорректное обновление: {e}")
+            return 400
+        try:
+            self.queue.put_nowait(update)
+        except queue.Full:
+            logger.warning("Webhook: очередь обновлений заполнена")
+            return 503
+        return 200
+
+    def _worker(self):
+        while True:
+            update = self.queue.get()
+            if update is None:
+                break
+            try:
+                self.bot.process_new_updates([update])
+            except Exception as e:
+                logger.error(f"Ошибка обработки обновления {update.update_id}: {e}")
+            finally:
+                self.queue.task_done()
+
+    def start(self):
+        """Запустить рабочие потоки и HTTP-сервер (в фоновом потоке)."""
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"webhook-worker-{index}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        thread = threading.Thread(target=self.httpd.serve_forever, name="webhook-server", daemon=True)
+        thread.start()
+        self.threads.append(thread)
+        host, port = self.httpd.server_address[:2]
+        logger.info(f"Webhook-сервер запущен на {host}:{port}{self.path}")
+
+    def stop(self):
+        """Остановить сервер и рабочие потоки."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        for _ in range(self.workers):
+            self.queue.put(None)